@@ -0,0 +1,13 @@
+from django.urls import path
+
+from accounts.views import (
+    AsyncEmployeeDetailAPIView,
+    AsyncEmployeeListAPIView,
+    AsyncEmployeeReportingLineAPIView,
+)
+
+urlpatterns = [
+    path('', AsyncEmployeeListAPIView.as_view(), name='async_employee_list'),
+    path('<int:user_id>/', AsyncEmployeeDetailAPIView.as_view(), name='async_employee_detail'),
+    path('<int:user_id>/hierarchy/', AsyncEmployeeReportingLineAPIView.as_view(), name='async_employee_reporting_line'),
+]
@@ -0,0 +1,95 @@
+from asgiref.sync import sync_to_async
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.cache import TokenStateCache, department_cache, role_cache
+from accounts.models import User
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    Builds ``request.user`` from the claims embedded by ``get_token`` instead
+    of loading the user row. Fields outside the claims are deferred and load
+    on first access. Tokens are rejected once the user is deactivated or
+    their ``token_version`` moves on, checked through ``TokenStateCache``.
+    Tokens issued without the claims fall back to the database lookup.
+    """
+    claim_fields = ('email', 'role_id', 'position', 'department_id', 'supervisor_id')
+
+    @classmethod
+    def get_token(cls, user):
+        refresh = RefreshToken.for_user(user)
+        for field in cls.claim_fields:
+            refresh[field] = getattr(user, field)
+        role = role_cache.get(user.role_id) if user.role_id else None
+        refresh['role'] = role.name if role else None
+        refresh['token_version'] = user.token_version
+        return refresh
+
+    def get_user_id(self, validated_token):
+        try:
+            return int(validated_token[api_settings.USER_ID_CLAIM])
+        except (KeyError, TypeError, ValueError):
+            raise AuthenticationFailed('Token contained no recognizable user identification', code='token_not_valid')
+
+    def build_user(self, validated_token, user_id, state):
+        if not state['is_active']:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        if state['token_version'] != validated_token['token_version']:
+            raise AuthenticationFailed('Token has been revoked', code='token_not_valid')
+
+        claims = {field: validated_token.get(field) for field in self.claim_fields}
+        claims.update(id=user_id, is_active=True, token_version=validated_token['token_version'])
+        # from_db expects the loaded values in model field order.
+        field_names = [field.attname for field in User._meta.concrete_fields if field.attname in claims]
+        return User.from_db(DEFAULT_DB_ALIAS, field_names, [claims[name] for name in field_names])
+
+    @staticmethod
+    def attach_reference_data(user, role, department):
+        # Same as AccountService.attach_reference_data, which this module
+        # cannot import without a cycle through accounts.serializers.
+        if role is not None:
+            user.role = role
+        if department is not None:
+            user.department = department
+        return user
+
+    def get_user(self, validated_token):
+        if 'token_version' not in validated_token:
+            return super().get_user(validated_token)
+
+        user_id = self.get_user_id(validated_token)
+        user = self.build_user(validated_token, user_id, TokenStateCache.get(user_id))
+        return self.attach_reference_data(
+            user,
+            role_cache.get(user.role_id) if user.role_id else None,
+            department_cache.get(user.department_id) if user.department_id else None,
+        )
+
+    async def aauthenticate(self, request):
+        """
+        ``authenticate`` for async views: the token state and the reference
+        data are read without blocking the event loop.
+        """
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+
+        if 'token_version' not in validated_token:
+            return await sync_to_async(super().get_user)(validated_token), validated_token
+
+        user_id = self.get_user_id(validated_token)
+        user = self.build_user(validated_token, user_id, await TokenStateCache.aget(user_id))
+        user = self.attach_reference_data(
+            user,
+            await role_cache.aget(user.role_id) if user.role_id else None,
+            await department_cache.aget(user.department_id) if user.department_id else None,
+        )
+        return user, validated_token
@@ -0,0 +1,41 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import make_password, verify_password
+
+from accounts.hashers import PasswordHashingPool
+
+UserModel = get_user_model()
+
+
+class PooledModelBackend(ModelBackend):
+    """
+    ModelBackend that checks the password on the PasswordHashingPool.
+    Only the hashing leaves the request thread; the user is read and the
+    upgraded hash is saved on the request's own database connection.
+    """
+
+    @staticmethod
+    def check_password(password, encoded):
+        is_correct, must_update = verify_password(password, encoded)
+        return is_correct, make_password(password) if is_correct and must_update else None
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Hash anyway, so unknown usernames take as long as wrong passwords.
+            PasswordHashingPool.run(make_password, password)
+            return None
+
+        is_correct, upgraded = PasswordHashingPool.run(self.check_password, password, user.password)
+        if not is_correct or not self.user_can_authenticate(user):
+            return None
+        if upgraded:
+            # Rehash on login, for hashes made with an older hasher or cost.
+            user.password = upgraded
+            user.save(update_fields=['password'])
+        return user
@@ -0,0 +1,153 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.base import DEFERRED
+
+from accounts.models import Role, Department, User
+from base.reference_data import ReferenceDataCache
+from base.routers import primary_reads
+from base.utils import loaded_field_values
+
+role_cache = ReferenceDataCache(Role)
+department_cache = ReferenceDataCache(Department)
+
+
+class HierarchyCache:
+    """
+    Versioned cache for the company hierarchy snapshot.
+
+    Snapshots are stored under the current version, so invalidating is a
+    matter of moving the version on; stale snapshots simply expire.
+    """
+    version_key = 'company-hierarchy:version'
+    snapshot_key = 'company-hierarchy:snapshot:{version}'
+    scope_key = 'company-hierarchy:scope:{version}:{user_id}'
+    tracked_fields = ('supervisor_id', 'role_id', 'department_id', 'is_active', 'email', 'position')
+
+    @classmethod
+    def _new_version(cls):
+        return uuid.uuid4().hex
+
+    @classmethod
+    def get_version(cls):
+        version = cache.get(cls.version_key)
+        if version is None:
+            cache.add(cls.version_key, cls._new_version(), timeout=None)
+            version = cache.get(cls.version_key)
+        return version
+
+    @classmethod
+    async def aget_version(cls):
+        version = await cache.aget(cls.version_key)
+        if version is None:
+            await cache.aadd(cls.version_key, cls._new_version(), timeout=None)
+            version = await cache.aget(cls.version_key)
+        return version
+
+    @classmethod
+    def invalidate(cls):
+        cache.set(cls.version_key, cls._new_version(), timeout=None)
+
+    @classmethod
+    def get_etag(cls, version):
+        return f'"company-hierarchy-{version}"'
+
+    @classmethod
+    def get_snapshot(cls, version, builder, key=None, timeout=None):
+        key = key or cls.snapshot_key.format(version=version)
+        snapshot = cache.get(key)
+        if snapshot is None:
+            with primary_reads():
+                snapshot = builder()
+            cache.set(key, snapshot, timeout=timeout or settings.HIERARCHY_CACHE_TIMEOUT)
+        return snapshot
+
+    @classmethod
+    async def aget_snapshot(cls, version, builder, key=None, timeout=None):
+        """
+        Same as ``get_snapshot`` for a coroutine function ``builder``.
+        """
+        key = key or cls.snapshot_key.format(version=version)
+        snapshot = await cache.aget(key)
+        if snapshot is None:
+            with primary_reads():
+                snapshot = await builder()
+            await cache.aset(key, snapshot, timeout=timeout or settings.HIERARCHY_CACHE_TIMEOUT)
+        return snapshot
+
+    @classmethod
+    def get_scope(cls, version, user_id, builder):
+        """
+        Cached visibility scope of one user under the given hierarchy version.
+        Scopes decide who may see what, so they are also kept for at most
+        ``VISIBILITY_SCOPE_CACHE_TTL`` seconds, in case an invalidation did
+        not reach this process.
+        """
+        return cls.get_snapshot(
+            version, builder, key=cls.scope_key.format(version=version, user_id=user_id),
+            timeout=settings.VISIBILITY_SCOPE_CACHE_TTL,
+        )
+
+    @classmethod
+    async def aget_scope(cls, version, user_id, builder):
+        return await cls.aget_snapshot(
+            version, builder, key=cls.scope_key.format(version=version, user_id=user_id),
+            timeout=settings.VISIBILITY_SCOPE_CACHE_TTL,
+        )
+
+    @classmethod
+    def tracked_values(cls, user):
+        return loaded_field_values(user, cls.tracked_fields)
+
+
+class TokenStateCache:
+    """
+    Short-lived cache of the fields that decide whether a user's tokens are
+    still accepted, so authenticating a request does not read the user row.
+    """
+    key = 'auth:token-state:{user_id}'
+    tracked_fields = ('password', 'is_active', 'email', 'role_id', 'position', 'department_id', 'supervisor_id')
+
+    @classmethod
+    def get(cls, user_id):
+        key = cls.key.format(user_id=user_id)
+        state = cache.get(key)
+        if state is None:
+            with primary_reads():
+                state = User.all_objects.filter(pk=user_id).values('token_version', 'is_active').first() or {
+                    'token_version': None, 'is_active': False,
+                }
+            cache.set(key, state, timeout=settings.TOKEN_STATE_CACHE_TTL)
+        return state
+
+    @classmethod
+    async def aget(cls, user_id):
+        key = cls.key.format(user_id=user_id)
+        state = await cache.aget(key)
+        if state is None:
+            with primary_reads():
+                state = await User.all_objects.filter(pk=user_id).values('token_version', 'is_active').afirst() or {
+                    'token_version': None, 'is_active': False,
+                }
+            await cache.aset(key, state, timeout=settings.TOKEN_STATE_CACHE_TTL)
+        return state
+
+    @classmethod
+    def invalidate(cls, user_id):
+        cache.delete(cls.key.format(user_id=user_id))
+
+    @classmethod
+    def tracked_values(cls, user):
+        return loaded_field_values(user, cls.tracked_fields)
+
+    @classmethod
+    def has_changed(cls, previous_values, user):
+        # A new hash of the same password (an upgrade on login) is not a
+        # password change; set_password leaves the raw password on _password.
+        values = cls.tracked_values(user)
+        return any(
+            value is not DEFERRED and values[field] != value
+            for field, value in previous_values.items()
+            if field != 'password' or user._password is not None
+        )
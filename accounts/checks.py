@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+PROCESS_LOCAL_CACHES = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    The hierarchy version, the cached snapshots and visibility scopes and
+    the token states live in the default cache. In a per-process cache a
+    change made through one worker is not seen by the others until their
+    entries expire, so they go on serving outdated reporting lines and
+    visibility scopes.
+    """
+    backend = settings.CACHES['default']['BACKEND']
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Error(
+        f'The default cache ({backend}) is not shared between processes.',
+        hint=(
+            'Set CACHE_BACKEND and CACHE_LOCATION to a shared cache such as Redis or Memcached. A deployment '
+            'running a single process may silence this check with SILENCED_SYSTEM_CHECKS.'
+        ),
+        id='accounts.E001',
+    )]
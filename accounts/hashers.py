@@ -0,0 +1,89 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, ScryptPasswordHasher
+from rest_framework.exceptions import Throttled
+
+
+class TunedScryptPasswordHasher(ScryptPasswordHasher):
+    """
+    Scrypt with the cost taken from settings, by default Django's N=2^14,
+    r=8, p=5, the OWASP minimum at that memory cost. Hashes made with a
+    lower cost are upgraded on the next login; costlier ones are kept, so
+    lowering the settings never weakens stored hashes.
+    """
+    work_factor = settings.PASSWORD_SCRYPT_WORK_FACTOR
+    block_size = settings.PASSWORD_SCRYPT_BLOCK_SIZE
+    parallelism = settings.PASSWORD_SCRYPT_PARALLELISM
+
+    def must_update(self, encoded):
+        decoded = self.decode(encoded)
+        cost = decoded['work_factor'] * decoded['block_size'] * decoded['parallelism']
+        return cost < self.work_factor * self.block_size * self.parallelism
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """
+    Argon2id with the cost taken from settings, by default the 19 MiB,
+    two pass profile OWASP recommends instead of Django's 100 MiB one.
+    Needs argon2-cffi. As with scrypt, costlier hashes are not rehashed.
+    """
+    time_cost = settings.PASSWORD_ARGON2_TIME_COST
+    memory_cost = settings.PASSWORD_ARGON2_MEMORY_COST
+    parallelism = settings.PASSWORD_ARGON2_PARALLELISM
+
+    def must_update(self, encoded):
+        params = self.decode(encoded)['params']
+        if params.memory_cost * params.time_cost > self.memory_cost * self.time_cost:
+            return False
+        return super().must_update(encoded)
+
+
+class PasswordHashingPool:
+    """
+    Runs password hashing on a fixed number of threads, so a burst of
+    logins cannot take every CPU of the process away from other requests.
+    Callers wait for a free slot for up to PASSWORD_HASHING_QUEUE_TIMEOUT
+    seconds and are throttled after that.
+    """
+    _executor = None
+    _slots = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def _get_executor(cls):
+        with cls._lock:
+            if cls._executor is None:
+                workers = settings.PASSWORD_HASHING_WORKERS
+                cls._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hashing')
+                cls._slots = threading.BoundedSemaphore(workers + settings.PASSWORD_HASHING_MAX_PENDING)
+        return cls._executor
+
+    @classmethod
+    def run(cls, func, *args, **kwargs):
+        executor = cls._get_executor()
+        timeout = settings.PASSWORD_HASHING_QUEUE_TIMEOUT
+        if not cls._slots.acquire(timeout=timeout):
+            raise Throttled(wait=timeout, detail='Too many logins in progress, please try again shortly.')
+        try:
+            return executor.submit(func, *args, **kwargs).result()
+        finally:
+            cls._slots.release()
+
+    @classmethod
+    def map(cls, func, iterable):
+        """
+        Runs ``func`` over ``iterable`` on the pool's threads, for bulk work
+        such as an import. At most one item per thread is queued at a time,
+        so a login waits behind one hash at most, not the whole batch.
+        """
+        executor = cls._get_executor()
+        in_flight = threading.BoundedSemaphore(settings.PASSWORD_HASHING_WORKERS)
+        futures = []
+        for item in iterable:
+            in_flight.acquire()
+            future = executor.submit(func, item)
+            future.add_done_callback(lambda _: in_flight.release())
+            futures.append(future)
+        return [future.result() for future in futures]
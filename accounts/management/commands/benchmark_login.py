@@ -0,0 +1,51 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import verify_password
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+from accounts.authentication import ClaimsJWTAuthentication
+from accounts.models import User
+
+PASSWORD = 'Benchmark@Password1'
+
+
+class Command(BaseCommand):
+    help = 'Measure the CPU cost of a login (password check and token) for each configured password hasher'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=50, help='Logins to time per hasher')
+        parser.add_argument('--workers', type=int, default=settings.PASSWORD_HASHING_WORKERS)
+        parser.add_argument('--hasher', action='append', help='Hasher algorithm to time, all configured by default')
+
+    def login(self, encoded, user):
+        is_correct, _ = verify_password(PASSWORD, encoded, preferred=encoded.split('$', 1)[0])
+        assert is_correct
+        return str(ClaimsJWTAuthentication.get_token(user).access_token)
+
+    def handle(self, *args, **options):
+        logins, workers = options['logins'], options['workers']
+        cores = min(workers, os.cpu_count() or 1)
+        # A detached user; nothing here touches the database.
+        user = User(id=0, email='benchmark@email.com', position='')
+        self.stdout.write(f'{logins} logins per hasher on {workers} threads, {cores} cores.')
+        for path in settings.PASSWORD_HASHERS:
+            hasher = import_string(path)()
+            if options['hasher'] and hasher.algorithm not in options['hasher']:
+                continue
+            try:
+                encoded = hasher.encode(PASSWORD, hasher.salt())
+            except ValueError as error:
+                self.stdout.write(f'{hasher.algorithm:>14}: skipped ({error})')
+                continue
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                started = time.perf_counter()
+                list(executor.map(lambda _: self.login(encoded, user), range(logins)))
+                elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'{hasher.algorithm:>14}: {logins / elapsed:8.1f} logins/s, '
+                f'{logins / elapsed / cores:8.1f} logins/s per core, {elapsed / logins * 1000:7.1f} ms per login'
+            )
@@ -0,0 +1,36 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+
+from accounts.services import EmployeeImportService
+
+
+class Command(BaseCommand):
+    help = 'Import employees in bulk from a CSV or JSONL file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSONL file with one employee per row')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='File format, inferred from the extension by default')
+        parser.add_argument('--dry-run', action='store_true', help='Validate the file without creating any employee')
+        parser.add_argument('--chunk-size', type=int, default=EmployeeImportService.chunk_size)
+
+    def handle(self, *args, **options):
+        try:
+            file_format = options['format'] or EmployeeImportService.get_file_format(options['path'])
+            with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+                rows = EmployeeImportService.read_rows(stream, file_format)
+        except (OSError, ValidationError) as e:
+            raise CommandError(f'Unable to read {options["path"]}: {e}')
+
+        report = EmployeeImportService.import_rows(
+            rows, dry_run=options['dry_run'], chunk_size=options['chunk_size']
+        )
+        for error in report['errors']:
+            self.stderr.write(self.style.ERROR(f'Row {error["row"]}: {json.dumps(error["errors"])}'))
+
+        summary = f'{report["valid"]} of {report["total"]} rows valid, {report["created"]} employees created.'
+        if report['errors']:
+            self.stdout.write(self.style.WARNING(summary))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
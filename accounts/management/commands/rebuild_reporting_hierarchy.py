@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from accounts.services import ReportingHierarchyService
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the reporting hierarchy closure table from the employee supervisor links'
+
+    def handle(self, *args, **kwargs):
+        links = ReportingHierarchyService.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Reporting hierarchy rebuilt with {links} links.'))
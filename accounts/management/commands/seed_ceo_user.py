@@ -1,6 +1,7 @@
 import os
 from django.core.management.base import BaseCommand
 from accounts.models import Role, User
+from accounts.services import ReportingHierarchyService
 from base.constants import EmployeeRoles
 
 
@@ -24,6 +25,7 @@ class Command(BaseCommand):
             ceo.is_superuser = True
             ceo.is_staff = True
             ceo.save()
+            ReportingHierarchyService.add_user(ceo)
 
         self.stdout.write(self.style.SUCCESS('Successfully created CEO user'))
 
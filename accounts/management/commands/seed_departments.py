@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.db.utils import IntegrityError
 
+from accounts.cache import department_cache
 from accounts.models import Department
 from base.constants import EmployeeDepartments
 
@@ -15,6 +16,7 @@ class Command(BaseCommand):
         ]
         try:
             Department.active_objects.bulk_create(roles, ignore_conflicts=True)
+            department_cache.invalidate()
             self.stdout.write(self.style.SUCCESS("Department seeded successfully."))
         except IntegrityError as e:
             self.stderr.write(self.style.ERROR(f"Error seeding Departments: {e}"))
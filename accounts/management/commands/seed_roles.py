@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.db.utils import IntegrityError
 
+from accounts.cache import role_cache
 from accounts.models import Role
 from base.constants import EmployeeRoles
 
@@ -17,6 +18,7 @@ class Command(BaseCommand):
 
         try:
             Role.active_objects.bulk_create(roles, ignore_conflicts=True)
+            role_cache.invalidate()
             self.stdout.write(self.style.SUCCESS("Roles seeded successfully."))
         except IntegrityError as e:
             self.stderr.write(self.style.ERROR(f"Error seeding roles: {e}"))
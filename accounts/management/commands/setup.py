@@ -8,11 +8,10 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         try:
             self.stdout.write(self.style.NOTICE('App installation Starting...'))
+            call_command('migrate')
             call_command('seed_roles')
             call_command('seed_departments')
             call_command('seed_ceo_user')
-            call_command('makemigrations')
-            call_command('migrate')
             self.stdout.write(self.style.SUCCESS('App installation completed successfully.'))
         except CommandError as e:
             self.stderr.write(self.style.ERROR(f'Error during app installation: {str(e)}'))
\ No newline at end of file
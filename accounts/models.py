@@ -33,12 +33,27 @@ class User(BaseModel, AbstractUser):
     )
     supervisor = models.ForeignKey('self', null=True, blank=True, on_delete=models.SET_NULL, related_name='reportees')
     department = models.ForeignKey(Department, on_delete=models.SET_NULL, null=True, blank=True)
+    token_version = models.PositiveIntegerField(
+        default=0, help_text='Bumped whenever issued tokens must stop being accepted.'
+    )
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["username"]
     objects = UserManager()
     active_objects = ActiveManager()
 
+    class Meta(BaseModel.Meta):
+        indexes = [
+            models.Index(
+                fields=['-created_at', '-id'], name='user_active_created_idx', condition=models.Q(is_active=True)
+            ),
+            models.Index(
+                fields=['supervisor'], name='user_active_supervisor_idx', condition=models.Q(is_active=True)
+            ),
+            models.Index(fields=['role'], name='user_active_role_idx', condition=models.Q(is_active=True)),
+            models.Index(fields=['updated_at'], name='user_updated_at_idx'),
+        ]
+
     def __str__(self):
         return self.email
 
@@ -53,5 +68,26 @@ class User(BaseModel, AbstractUser):
         return complete_name.strip()
 
 
+class ReportingHierarchy(models.Model):
+    """
+    Closure table for the ``User.supervisor`` reporting line.
 
+    Every user has one row per ancestor (including a depth 0 row pointing at
+    itself), so "all ancestors" and "all descendants" of a user are a single
+    indexed lookup however deep the org chart is. Maintained by
+    ``accounts.services.ReportingHierarchyService``.
+    """
+    ancestor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='descendant_links')
+    descendant = models.ForeignKey(User, on_delete=models.CASCADE, related_name='ancestor_links')
+    depth = models.PositiveIntegerField()
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['ancestor', 'descendant'], name='unique_reporting_hierarchy_link'),
+        ]
+        indexes = [
+            models.Index(fields=['descendant', 'depth'], name='reporting_hier_desc_depth_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.ancestor_id} -> {self.descendant_id} ({self.depth})'
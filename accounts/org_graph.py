@@ -0,0 +1,300 @@
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+from accounts.cache import HierarchyCache
+from accounts.models import User
+from base.routers import primary_reads
+
+
+class OrgGraph:
+    """
+    Read-only snapshot of the reporting lines of the active users, kept in
+    flat arrays indexed by each user's position in the sorted ``ids``:
+
+    * ``parents`` holds the position of the supervisor, -1 at the top;
+    * the direct reports of position ``i`` are
+      ``children[child_offsets[i]:child_offsets[i + 1]]`` (CSR layout);
+    * ``preorder`` is a depth-first walk of the trees, so the subtree of
+      ``i`` is ``preorder[enter[i]:exit[i]]`` and "is in subtree" is two
+      comparisons;
+    * ``role_codes`` and ``department_codes`` index the interned
+      ``role_ids`` and ``department_ids``.
+
+    That is about 50 bytes per user, where a ``User`` instance takes one or
+    two kilobytes. Users caught in a reporting cycle are left out of the
+    walk: they have no subtree and belong to no other user's.
+    """
+    __slots__ = (
+        'ids', 'supervisor_ids', 'role_codes', 'department_codes', 'role_ids', 'department_ids', 'parents',
+        'child_offsets', 'children', 'preorder', 'enter', 'exit', 'depths', 'role_members',
+    )
+
+    def __init__(self, rows):
+        """
+        ``rows`` are ``(id, supervisor_id, role_id, department_id)`` tuples
+        sorted by ``id``.
+        """
+        self.ids = array('l')
+        self.supervisor_ids = array('l')
+        self.role_codes = array('H')
+        self.department_codes = array('H')
+        roles = {}
+        departments = {}
+        for user_id, supervisor_id, role_id, department_id in rows:
+            self.ids.append(user_id)
+            self.supervisor_ids.append(supervisor_id or 0)
+            self.role_codes.append(roles.setdefault(role_id, len(roles)))
+            self.department_codes.append(departments.setdefault(department_id, len(departments)))
+        self.role_ids = tuple(roles)
+        self.department_ids = tuple(departments)
+        self._link()
+
+    def _link(self):
+        size = len(self.ids)
+        self.parents = array('i', [-1]) * size
+        self.child_offsets = array('i', [0]) * (size + 1)
+        for position, supervisor_id in enumerate(self.supervisor_ids):
+            parent = self._position(supervisor_id) if supervisor_id else None
+            if parent is not None and parent != position:
+                self.parents[position] = parent
+                self.child_offsets[parent + 1] += 1
+        for position in range(size):
+            self.child_offsets[position + 1] += self.child_offsets[position]
+
+        self.children = array('i', [0]) * size
+        cursors = array('i', self.child_offsets)
+        for position, parent in enumerate(self.parents):
+            if parent >= 0:
+                self.children[cursors[parent]] = position
+                cursors[parent] += 1
+
+        self.preorder = array('i')
+        self.enter = array('i', [-1]) * size
+        self.exit = array('i', [-1]) * size
+        self.depths = array('H', [0]) * size
+        for root in range(size):
+            if self.parents[root] >= 0:
+                continue
+            # A negative entry marks the end of the subtree of ~entry.
+            stack = [root]
+            while stack:
+                position = stack.pop()
+                if position < 0:
+                    self.exit[~position] = len(self.preorder)
+                    continue
+                self.enter[position] = len(self.preorder)
+                self.preorder.append(position)
+                stack.append(~position)
+                reports = self.children[self.child_offsets[position]:self.child_offsets[position + 1]]
+                for child in reversed(reports):
+                    self.depths[child] = self.depths[position] + 1
+                    stack.append(child)
+
+        self.role_members = {code: array('i') for code in range(len(self.role_ids))}
+        for position, code in enumerate(self.role_codes):
+            self.role_members[code].append(position)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, user_id):
+        return self._position(user_id) is not None
+
+    @property
+    def nbytes(self):
+        arrays = [getattr(self, name) for name in self.__slots__ if isinstance(getattr(self, name), array)]
+        return sum(len(values) * values.itemsize for values in arrays + list(self.role_members.values()))
+
+    def _position(self, user_id):
+        position = bisect_left(self.ids, user_id)
+        if position < len(self.ids) and self.ids[position] == user_id:
+            return position
+        return None
+
+    def rows(self):
+        for position, user_id in enumerate(self.ids):
+            yield (
+                user_id,
+                self.supervisor_ids[position] or None,
+                self.role_ids[self.role_codes[position]],
+                self.department_ids[self.department_codes[position]],
+            )
+
+    def apply(self, changes):
+        """
+        Returns a new graph with ``changes``, ``{id: row or None}``, merged
+        in; ``None`` removes the user.
+        """
+        changed_ids = sorted(changes)
+        merged = []
+        next_change = 0
+        for row in self.rows():
+            # Both sides are sorted by id, so one pass merges them.
+            while next_change < len(changed_ids) and changed_ids[next_change] < row[0]:
+                merged.append(changes[changed_ids[next_change]])
+                next_change += 1
+            if next_change < len(changed_ids) and changed_ids[next_change] == row[0]:
+                merged.append(changes[row[0]])
+                next_change += 1
+            else:
+                merged.append(row)
+        merged.extend(changes[user_id] for user_id in changed_ids[next_change:])
+        return OrgGraph(row for row in merged if row is not None)
+
+    def get_supervisor_id(self, user_id):
+        position = self._position(user_id)
+        if position is None or self.parents[position] < 0:
+            return None
+        return self.ids[self.parents[position]]
+
+    def get_role_id(self, user_id):
+        position = self._position(user_id)
+        return None if position is None else self.role_ids[self.role_codes[position]]
+
+    def get_department_id(self, user_id):
+        position = self._position(user_id)
+        return None if position is None else self.department_ids[self.department_codes[position]]
+
+    def get_depth(self, user_id):
+        position = self._position(user_id)
+        return None if position is None else self.depths[position]
+
+    def get_span_of_control(self, user_id):
+        """
+        Number of direct reports.
+        """
+        position = self._position(user_id)
+        if position is None:
+            return 0
+        return self.child_offsets[position + 1] - self.child_offsets[position]
+
+    def get_subtree_size(self, user_id):
+        """
+        Number of users in the reporting line of ``user_id``, themselves included.
+        """
+        position = self._position(user_id)
+        if position is None or self.enter[position] < 0:
+            return 0
+        return self.exit[position] - self.enter[position]
+
+    def get_ancestor_ids(self, user_id, include_self=False):
+        """
+        The reporting chain of a user, nearest supervisor first.
+        """
+        position = self._position(user_id)
+        if position is None:
+            return []
+        ancestor_ids = [user_id] if include_self else []
+        # Bounded by the depth, so a reporting cycle cannot loop forever.
+        for _ in range(self.depths[position]):
+            position = self.parents[position]
+            ancestor_ids.append(self.ids[position])
+        return ancestor_ids
+
+    def get_descendant_ids(self, user_id, include_self=False):
+        """
+        Everyone in the reporting line of a user, in depth-first order.
+        """
+        position = self._position(user_id)
+        if position is None or self.enter[position] < 0:
+            return []
+        start = self.enter[position] if include_self else self.enter[position] + 1
+        return [self.ids[descendant] for descendant in self.preorder[start:self.exit[position]]]
+
+    def is_in_subtree(self, user_id, root_id):
+        position = self._position(user_id)
+        root = self._position(root_id)
+        if position is None or root is None:
+            return False
+        return position == root or self.enter[root] <= self.enter[position] < self.exit[root]
+
+    def get_ids_with_role(self, role_id):
+        if role_id not in self.role_ids:
+            return []
+        return [self.ids[position] for position in self.role_members[self.role_ids.index(role_id)]]
+
+
+class OrgGraphCache:
+    """
+    Process-wide ``OrgGraph`` of the active users.
+
+    Loaded in full every ``ORG_GRAPH_TTL`` seconds. In between, when the
+    hierarchy version moves on (see ``HierarchyCache``), and at least every
+    ``VISIBILITY_SCOPE_CACHE_TTL`` seconds in case a change made by another
+    process did not move it here, only the users saved since the previous
+    refresh are read and merged in; a count of the active users catches
+    rows removed without a save, which forces a full load.
+    """
+    fields = ('id', 'supervisor_id', 'role_id', 'department_id')
+    # Rows written by a transaction still open at the previous refresh carry
+    # an earlier updated_at, so each refresh looks back this far.
+    overlap = timedelta(seconds=60)
+    chunk_size = 5000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._graph = None
+        self._version = None
+        self._since = None
+        self._expires_at = 0
+        self._recheck_at = 0
+
+    def _is_stale(self, version):
+        return self._graph is None or version != self._version or time.monotonic() >= self._recheck_at
+
+    def _load(self):
+        users = User.active_objects.order_by('id').values_list(*self.fields)
+        graph = OrgGraph(users.iterator(chunk_size=self.chunk_size))
+        self._expires_at = time.monotonic() + settings.ORG_GRAPH_TTL
+        return graph
+
+    def _load_changes(self):
+        changes = {
+            row[0]: row[:-1] if row[-1] else None
+            for row in User.all_objects.filter(updated_at__gte=self._since).values_list(*self.fields, 'is_active')
+        }
+        graph = self._graph.apply(changes) if changes else self._graph
+        if len(graph) != User.active_objects.count():
+            return self._load()
+        return graph
+
+    def _refresh(self, version):
+        with self._lock:
+            if not self._is_stale(version):
+                return
+            started = timezone.now()
+            with primary_reads():
+                if self._graph is None or time.monotonic() >= self._expires_at:
+                    graph = self._load()
+                else:
+                    graph = self._load_changes()
+            self._graph = graph
+            self._version = version
+            self._since = started - self.overlap
+            self._recheck_at = time.monotonic() + settings.VISIBILITY_SCOPE_CACHE_TTL
+
+    def get(self):
+        version = HierarchyCache.get_version()
+        if self._is_stale(version):
+            self._refresh(version)
+        return self._graph
+
+    async def aget(self):
+        version = await HierarchyCache.aget_version()
+        if self._is_stale(version):
+            await sync_to_async(self._refresh)(version)
+        return self._graph
+
+    def invalidate(self):
+        with self._lock:
+            self._graph = None
+
+
+org_graph = OrgGraphCache()
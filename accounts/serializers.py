@@ -1,8 +1,12 @@
 from django.contrib.auth import authenticate
+from phonenumber_field.serializerfields import PhoneNumberField
 from rest_framework import serializers
-from rest_framework_simplejwt.tokens import RefreshToken
 
+from accounts.authentication import ClaimsJWTAuthentication
 from accounts.models import User, Role, Department
+from base.constants import EmployeePositions
+from base.exports import ExportWriter
+from base.serializers import EagerLoadingMixin
 
 
 class RoleSerializer(serializers.ModelSerializer):
@@ -25,7 +29,7 @@ class LoginSerializer(serializers.Serializer):
         if not user:
             raise serializers.ValidationError("Invalid username or password.")
 
-        refresh = RefreshToken.for_user(user)
+        refresh = ClaimsJWTAuthentication.get_token(user)
         return {
             "refresh": str(refresh),
             "access": str(refresh.access_token),
@@ -37,7 +41,8 @@ class LoginSerializer(serializers.Serializer):
         }
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('supervisor', 'role', 'department')
     supervisor_id = serializers.IntegerField(write_only=True)
     role_id = serializers.IntegerField(write_only=True)
     department_id = serializers.IntegerField(write_only=True, required=False, allow_null=True)
@@ -64,8 +69,9 @@ class UserSerializer(serializers.ModelSerializer):
         return representation
 
 
-class ReportingChainSerializer(serializers.ModelSerializer):
-    supervisor_id = serializers.IntegerField(source='supervisor.id', required=False)
+class ReportingChainSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('role',)
+    supervisor_id = serializers.IntegerField(required=False)
     role = serializers.CharField(source='role.name')
     position = serializers.CharField()
 
@@ -74,21 +80,38 @@ class ReportingChainSerializer(serializers.ModelSerializer):
         fields = ['id', 'first_name', 'last_name', 'email', 'role', 'position', 'supervisor_id']
 
 
-class UserHierarchySerializer(serializers.ModelSerializer):
-    reports = serializers.SerializerMethodField()
 
-    class Meta:
-        model = User
-        fields = [
-            'id',
-            'email',
-            'position',
-            'department',
-            'reports'
-        ]
+class EmployeeImportRowSerializer(serializers.Serializer):
+    email = serializers.EmailField()
+    username = serializers.CharField(max_length=150, required=False, allow_null=True)
+    first_name = serializers.CharField(max_length=150)
+    middle_name = serializers.CharField(max_length=200, required=False, allow_null=True)
+    last_name = serializers.CharField(max_length=150)
+    phone_number = PhoneNumberField(required=False, allow_null=True)
+    position = serializers.ChoiceField(choices=EmployeePositions.choices)
+    role_id = serializers.IntegerField()
+    department_id = serializers.IntegerField(required=False, allow_null=True)
+    supervisor_id = serializers.IntegerField(required=False, allow_null=True)
+    supervisor_email = serializers.EmailField(required=False, allow_null=True)
+    password = serializers.CharField(required=False, allow_null=True, write_only=True)
+
+    def validate_email(self, value):
+        return User.objects.normalize_email(value)
+
+    def validate_supervisor_email(self, value):
+        return User.objects.normalize_email(value) if value else value
+
+    def validate(self, data):
+        if data.get('supervisor_id') and data.get('supervisor_email'):
+            raise serializers.ValidationError("Provide either supervisor_id or supervisor_email, not both.")
+        return data
+
+
+class EmployeeExportQuerySerializer(serializers.Serializer):
+    file_format = serializers.ChoiceField(choices=ExportWriter.file_formats, default='csv')
+
 
-    def get_reports(self, obj):
-        reportees = obj.reportees.all()
-        if not reportees:
-            return []
-        return UserHierarchySerializer(reportees, many=True).data
\ No newline at end of file
+class EmployeeImportSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    format = serializers.ChoiceField(choices=['csv', 'jsonl'], required=False)
+    dry_run = serializers.BooleanField(default=False)
@@ -1,70 +1,386 @@
-from django.db.models import Prefetch
+import csv
+import json
+import os
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import F, Q
 from rest_framework.exceptions import ValidationError
 
-from accounts.models import User, Role, Department
+from accounts.cache import HierarchyCache, role_cache, department_cache
+from accounts.hashers import PasswordHashingPool
+from accounts.models import Role, User, ReportingHierarchy
+from accounts.org_graph import org_graph
+from accounts.serializers import EmployeeImportRowSerializer
 from base.constants import EmployeeRoles
+from base.request_cache import RequestCache
+
+
+class ReportingHierarchyService:
+    """
+    Maintains and queries the ``ReportingHierarchy`` closure table.
+
+    Only active users are tracked; ``rebuild`` recomputes the table from the
+    ``supervisor`` foreign keys.
+    """
+    batch_size = 1000
+
+    @classmethod
+    def get_ancestor_ids(cls, user_id, include_self=False):
+        links = ReportingHierarchy.objects.filter(descendant_id=user_id)
+        if not include_self:
+            links = links.filter(depth__gt=0)
+        return list(links.order_by('depth').values_list('ancestor_id', flat=True))
+
+    @classmethod
+    def get_descendant_ids(cls, user_id, include_self=False):
+        links = ReportingHierarchy.objects.filter(ancestor_id=user_id)
+        if not include_self:
+            links = links.filter(depth__gt=0)
+        return list(links.values_list('descendant_id', flat=True))
+
+    @classmethod
+    def get_ancestors(cls, user_id, include_self=False):
+        """
+        Returns the reporting chain of a user, nearest supervisor first.
+        """
+        ancestors = User.objects.filter(descendant_links__descendant_id=user_id)
+        if not include_self:
+            ancestors = ancestors.filter(descendant_links__depth__gt=0)
+        return ancestors.order_by('descendant_links__depth')
+
+    @classmethod
+    def get_descendants(cls, user_id, include_self=False):
+        descendants = User.active_objects.filter(ancestor_links__ancestor_id=user_id)
+        if not include_self:
+            descendants = descendants.filter(ancestor_links__depth__gt=0)
+        return descendants
+
+    @classmethod
+    def get_link(cls, user_id, root_id):
+        return ReportingHierarchy.objects.filter(ancestor_id=root_id, descendant_id=user_id)
+
+    @classmethod
+    def is_in_subtree(cls, user_id, root_id):
+        return cls.get_link(user_id, root_id).exists()
+
+    @classmethod
+    def add_user(cls, user):
+        cls.add_users([user])
+
+    @classmethod
+    def add_users(cls, users):
+        """
+        Adds links for newly created users whose supervisors are already
+        part of the hierarchy.
+        """
+        supervisor_ids = {user.supervisor_id for user in users if user.supervisor_id}
+        supervisor_links = {}
+        for ancestor_id, descendant_id, depth in ReportingHierarchy.objects.filter(
+            descendant_id__in=supervisor_ids
+        ).values_list('ancestor_id', 'descendant_id', 'depth'):
+            supervisor_links.setdefault(descendant_id, []).append((ancestor_id, depth))
+
+        links = []
+        for user in users:
+            links.append(ReportingHierarchy(ancestor_id=user.id, descendant_id=user.id, depth=0))
+            links.extend(
+                ReportingHierarchy(ancestor_id=ancestor_id, descendant_id=user.id, depth=depth + 1)
+                for ancestor_id, depth in supervisor_links.get(user.supervisor_id, [])
+            )
+        ReportingHierarchy.objects.bulk_create(links, batch_size=cls.batch_size)
+
+    @classmethod
+    def move_user(cls, user):
+        """
+        Re-attaches a user, together with everyone reporting to them, under
+        ``user.supervisor_id``.
+        """
+        subtree = list(ReportingHierarchy.objects.filter(ancestor_id=user.id).values_list('descendant_id', 'depth'))
+        if not subtree:
+            return cls.add_user(user)
+
+        subtree_ids = ReportingHierarchy.objects.filter(ancestor_id=user.id).values('descendant_id')
+        ReportingHierarchy.objects.filter(descendant_id__in=subtree_ids).exclude(ancestor_id__in=subtree_ids).delete()
+        if not user.supervisor_id:
+            return
+
+        supervisor_links = list(
+            ReportingHierarchy.objects.filter(descendant_id=user.supervisor_id).values_list('ancestor_id', 'depth')
+        )
+        ReportingHierarchy.objects.bulk_create(
+            [
+                ReportingHierarchy(
+                    ancestor_id=ancestor_id,
+                    descendant_id=descendant_id,
+                    depth=ancestor_depth + descendant_depth + 1,
+                )
+                for ancestor_id, ancestor_depth in supervisor_links
+                for descendant_id, descendant_depth in subtree
+            ],
+            batch_size=cls.batch_size,
+        )
+
+    @classmethod
+    def remove_user(cls, user_id):
+        ReportingHierarchy.objects.filter(Q(ancestor_id=user_id) | Q(descendant_id=user_id)).delete()
+
+    @classmethod
+    def rebuild(cls):
+        supervisors = dict(User.active_objects.values_list('id', 'supervisor_id'))
+        chains = {}
+
+        def chain_for(user_id):
+            # Walk up until a user whose chain is already known, then unwind.
+            pending = []
+            current = user_id
+            while current in supervisors and current not in chains and current not in pending:
+                pending.append(current)
+                current = supervisors[current]
+            known = chains.get(current, [])
+            for pending_id in reversed(pending):
+                known = [pending_id] + known
+                chains[pending_id] = known
+            return chains[user_id]
+
+        links = [
+            ReportingHierarchy(ancestor_id=ancestor_id, descendant_id=user_id, depth=depth)
+            for user_id in supervisors
+            for depth, ancestor_id in enumerate(chain_for(user_id))
+        ]
+        with transaction.atomic():
+            ReportingHierarchy.objects.all().delete()
+            ReportingHierarchy.objects.bulk_create(links, batch_size=cls.batch_size)
+        HierarchyCache.invalidate()
+        return len(links)
+
+
+class VisibilityScopeService:
+    """
+    Resolves whose records a user may see: everyone for the CEO, otherwise
+    the user and their whole reporting subtree.
+
+    Subtrees up to ``max_listed_ids`` people are read from the org graph
+    and cached per user as an ID list under the hierarchy version, so any
+    reporting line change invalidates them. Larger subtrees are filtered with a subquery on the
+    closure table instead of a long ``IN`` list.
+    """
+    max_listed_ids = 1000
+
+    @classmethod
+    def _build_scope(cls, graph, user_id):
+        if graph.get_subtree_size(user_id) > cls.max_listed_ids:
+            return {'ids': None}
+        return {'ids': sorted(set(graph.get_descendant_ids(user_id)) | {user_id})}
+
+    @classmethod
+    def _load_scope(cls, user_id):
+        return cls._build_scope(org_graph.get(), user_id)
+
+    @classmethod
+    def is_unrestricted(cls, user):
+        role = AccountService.get_user_role(user)
+        return bool(role and role.name == EmployeeRoles.CEO)
+
+    @classmethod
+    def _get_listed_ids(cls, user):
+        version = HierarchyCache.get_version()
+        return HierarchyCache.get_scope(version, user.id, lambda: cls._load_scope(user.id))['ids']
+
+    @classmethod
+    async def _aload_scope(cls, user_id):
+        return cls._build_scope(await org_graph.aget(), user_id)
+
+    @classmethod
+    async def ais_unrestricted(cls, user):
+        role = await AccountService.aget_user_role(user)
+        return bool(role and role.name == EmployeeRoles.CEO)
+
+    @classmethod
+    async def _aget_listed_ids(cls, user):
+        version = await HierarchyCache.aget_version()
+        return (await HierarchyCache.aget_scope(version, user.id, lambda: cls._aload_scope(user.id)))['ids']
+
+    @classmethod
+    def get_visible_user_ids(cls, user):
+        """
+        Returns the sorted IDs of the users visible to ``user``, or None when
+        the scope is unrestricted or too large to list.
+        """
+        if cls.is_unrestricted(user):
+            return None
+        return cls._get_listed_ids(user)
+
+    @classmethod
+    def get_scope_filter(cls, user, field='employee_id'):
+        if cls.is_unrestricted(user):
+            return Q()
+        visible_ids = cls._get_listed_ids(user)
+        if visible_ids is not None:
+            return Q(**{f'{field}__in': visible_ids})
+        return cls._get_subtree_filter(user, field)
+
+    @classmethod
+    async def aget_scope_filter(cls, user, field='employee_id'):
+        if await cls.ais_unrestricted(user):
+            return Q()
+        visible_ids = await cls._aget_listed_ids(user)
+        if visible_ids is not None:
+            return Q(**{f'{field}__in': visible_ids})
+        return cls._get_subtree_filter(user, field)
+
+    @classmethod
+    def _get_subtree_filter(cls, user, field):
+        subtree = ReportingHierarchy.objects.filter(ancestor_id=user.id).values('descendant_id')
+        return Q(**{f'{field}__in': subtree}) | Q(**{field: user.id})
 
 
 class AccountService:
+    """
+    Users are memoized for the duration of the current request through
+    ``RequestCache``; roles and departments come from the process-wide
+    reference data caches.
+    """
 
     @classmethod
     def get_user(cls, user_id):
+        return RequestCache.get_or_load('user', user_id, lambda: cls._load_user(user_id))
+
+    @classmethod
+    def get_employees(cls):
+        return User.active_objects.all()
+
+    @classmethod
+    def _get_user_queryset(cls, user_id):
+        return User.active_objects.filter(pk=user_id)
+
+    @classmethod
+    def _load_user(cls, user_id):
         try:
-            return User.active_objects.get(pk=user_id)
+            user = cls._get_user_queryset(user_id).get()
         except User.DoesNotExist:
             raise ValidationError(f'User with ID {user_id} does not exist')
+        return cls.attach_reference_data(user)
 
     @classmethod
-    def _get_role(cls, role_id):
+    def attach_reference_data(cls, user):
+        """
+        Fills the role and department relations of a user from the reference
+        data caches, so reading them does not cost a query.
+        """
+        if user.role_id and not User.role.is_cached(user):
+            role = role_cache.get(user.role_id)
+            if role is not None:
+                user.role = role
+        if user.department_id and not User.department.is_cached(user):
+            department = department_cache.get(user.department_id)
+            if department is not None:
+                user.department = department
+        return user
+
+    @classmethod
+    async def aget_user(cls, user_id):
+        return await RequestCache.aget_or_load('user', user_id, lambda: cls._aload_user(user_id))
+
+    @classmethod
+    async def _aload_user(cls, user_id):
+        # The supervisor is loaded up front, async code cannot load it lazily.
         try:
-            return Role.active_objects.get(id=role_id)
-        except Role.DoesNotExist:
+            user = await User.active_objects.select_related('supervisor').aget(pk=user_id)
+        except User.DoesNotExist:
+            raise ValidationError(f'User with ID {user_id} does not exist')
+        return await cls.aattach_reference_data(user)
+
+    @classmethod
+    async def aattach_reference_data(cls, user):
+        if user.role_id and not User.role.is_cached(user):
+            role = await role_cache.aget(user.role_id)
+            if role is not None:
+                user.role = role
+        if user.department_id and not User.department.is_cached(user):
+            department = await department_cache.aget(user.department_id)
+            if department is not None:
+                user.department = department
+        return user
+
+    @classmethod
+    def get_user_role(cls, user):
+        return cls.attach_reference_data(user).role
+
+    @classmethod
+    async def aget_user_role(cls, user):
+        user = await cls.aattach_reference_data(user)
+        if user.role_id and not User.role.is_cached(user):
+            # Not among the cached active roles.
+            return await Role.all_objects.filter(pk=user.role_id).afirst()
+        return user.role
+
+    @classmethod
+    def _get_role(cls, role_id):
+        role = role_cache.get(role_id)
+        if role is None:
             raise ValidationError(f'Role with ID {role_id} does not exist')
+        return role
 
     @classmethod
     def _get_department(cls, department_id):
-        try:
-            return Department.active_objects.get(pk=department_id)
-        except Department.DoesNotExist:
+        department = department_cache.get(department_id)
+        if department is None:
             raise ValidationError(f'Department with ID {department_id} does not exist')
+        return department
 
     @classmethod
     def _validate_duplicate_ceo_employee(self, role_id, user_id=None):
         role = self._get_role(role_id)
 
-        if role.name == EmployeeRoles.CEO:
-            duplicate_ceo = User.active_objects.filter(role__name=EmployeeRoles.CEO)
-            if user_id:
-                duplicate_ceo = duplicate_ceo.exclude(pk=user_id)
-
-            if duplicate_ceo.exists():
-                raise ValidationError({"Role": "An active account with ceo role already exists"})
+        # Read from the database, not the org graph: another process may
+        # have just saved a CEO.
+        if role.name == EmployeeRoles.CEO and self._get_duplicate_ceos(role.id, user_id).exists():
+            raise ValidationError({"Role": "An active account with ceo role already exists"})
 
+    @classmethod
+    def _get_duplicate_ceos(cls, role_id, user_id=None):
+        duplicate_ceo = User.active_objects.filter(role_id=role_id)
+        if user_id:
+            duplicate_ceo = duplicate_ceo.exclude(pk=user_id)
+        return duplicate_ceo
 
     @classmethod
-    def _validate_unique_email(self, email, user_id=None):
+    def _get_duplicate_emails(cls, email, user_id=None):
         duplicate_emails = User.active_objects.filter(email=email)
         if user_id:
             duplicate_emails = duplicate_emails.exclude(pk=user_id)
+        return duplicate_emails
 
-        if duplicate_emails.exists():
+    @classmethod
+    def _validate_unique_email(self, email, user_id=None):
+        if self._get_duplicate_emails(email, user_id).exists():
             raise ValidationError({"email": "An active account with this email already exists"})
 
+    supervisor_allowed_roles = {
+        EmployeeRoles.EMPLOYEE: [EmployeeRoles.MANAGER, EmployeeRoles.DIRECTOR, EmployeeRoles.CEO],
+        EmployeeRoles.MANAGER: [EmployeeRoles.DIRECTOR, EmployeeRoles.CEO],
+        EmployeeRoles.DIRECTOR: [EmployeeRoles.CEO]
+    }
+
+    @classmethod
+    def _validate_supervisor_role(cls, role_name, supervisor_role_name):
+        if role_name in cls.supervisor_allowed_roles:
+            if supervisor_role_name not in cls.supervisor_allowed_roles[role_name]:
+                raise ValidationError({
+                    "supervisor_id": f"{role_name} can only report to {' or '.join(cls.supervisor_allowed_roles[role_name])}"
+                })
+
     @classmethod
     def validate_selected_supervisor(cls, supervisor_id, role_id):
         role = cls._get_role(role_id)
         supervisor = cls.get_user(supervisor_id)
-        supervisor_allowed_roles = {
-            EmployeeRoles.EMPLOYEE: [EmployeeRoles.MANAGER, EmployeeRoles.DIRECTOR, EmployeeRoles.CEO],
-            EmployeeRoles.MANAGER: [EmployeeRoles.DIRECTOR, EmployeeRoles.CEO],
-            EmployeeRoles.DIRECTOR: [EmployeeRoles.CEO]
-        }
+        cls._validate_supervisor_role(role.name, supervisor.role.name if supervisor.role else None)
 
-        if role.name in supervisor_allowed_roles:
-            if supervisor.role.name not in supervisor_allowed_roles[role.name]:
-                raise ValidationError({
-                    "supervisor_id": f"{role.name} can only report to {' or '.join(supervisor_allowed_roles[role.name])}"
-                })
+    @classmethod
+    def _validate_reporting_line_cycle(cls, supervisor_id, user_id):
+        if ReportingHierarchyService.is_in_subtree(supervisor_id, user_id):
+            raise ValidationError({"supervisor_id": "An employee cannot report to themselves or to their own reportee"})
 
     @classmethod
     def _validate_payload(cls, payload, user_id=None):
@@ -75,31 +391,52 @@ class AccountService:
         if payload['department_id']:
             cls._get_department(payload['department_id'])
         cls.validate_selected_supervisor(payload['supervisor_id'], payload['role_id'])
+        if user_id:
+            cls._validate_reporting_line_cycle(payload['supervisor_id'], user_id)
 
     @classmethod
     def create_user(cls, payload):
         password = payload.pop('password', None)
-        cls._validate_payload(payload)
-        user = User.objects.create_user(**payload)
-        user.set_password(password)
-        user.save()
-        return user
+        # Validated in the write transaction, so the checks see the rows
+        # written by other processes up to this point.
+        with transaction.atomic():
+            cls._validate_payload(payload)
+            user = User.objects.create_user(password=password, **payload)
+            ReportingHierarchyService.add_user(user)
+        return cls._attach_validated_relations(user)
+
+    @classmethod
+    def _attach_validated_relations(cls, user):
+        # The supervisor was loaded during validation; reuse it instead of
+        # letting the serializer fetch it again.
+        supervisor = RequestCache.peek('user', user.supervisor_id)
+        if supervisor is not None:
+            user.supervisor = supervisor
+        return cls.attach_reference_data(user)
 
     @classmethod
     def update_user(cls, payload, employee):
         password = payload.pop('password', None)
-        cls._validate_payload(payload, employee.id)
-        for key, value in payload.items():
-            setattr(employee, key, value)
-        employee.save()
-        if password:
-            employee.set_password(password)
+        with transaction.atomic():
+            cls._validate_payload(payload, employee.id)
+            previous_supervisor_id = employee.supervisor_id
+            for key, value in payload.items():
+                setattr(employee, key, value)
             employee.save()
-        return employee
+            if password:
+                employee.set_password(password)
+                employee.save()
+            if employee.supervisor_id != previous_supervisor_id:
+                ReportingHierarchyService.move_user(employee)
+        return cls._attach_validated_relations(employee)
+
+    @classmethod
+    def _get_active_reportees(cls, employee_id):
+        return User.active_objects.filter(supervisor_id=employee_id)
 
     @classmethod
     def _validate_employee_existing_reportees(cls, employee_id):
-        if User.active_objects.filter(supervisor_id=employee_id).exists():
+        if cls._get_active_reportees(employee_id).exists():
             raise ValidationError(
                 'Selected staff is a supervisor to active staff. kindly modify reporting line'
             )
@@ -108,47 +445,355 @@ class AccountService:
     def delete_user(cls, employee_id):
         employee=cls.get_user(employee_id)
         cls._validate_employee_existing_reportees(employee_id)
-        employee.soft_delete()
+        with transaction.atomic():
+            employee.soft_delete()
+            ReportingHierarchyService.remove_user(employee.id)
+        RequestCache.discard('user', employee_id)
 
 
 class ReportingLineService(AccountService):
+    hierarchy_fields = ('id', 'email', 'position', 'department')
 
     @classmethod
     def get_employee_reporting_line(cls, user_id):
         employee = cls.get_user(user_id)
-        reporting_chain = []
-        current_user = employee
+        return ReportingHierarchyService.get_ancestors(employee.id, include_self=True)
+
+    @classmethod
+    def get_full_company_hierarchy(cls, request):
+        """
+        Builds the reporting tree under the CEO from a single query of all
+        active users, linking nodes through an ``id -> children`` map so the
+        tree has no depth limit.
+        """
+        return cls._build_company_hierarchy(cls.get_hierarchy_rows())
 
-        while current_user:
-            reporting_chain.append(current_user)
+    @classmethod
+    def get_hierarchy_rows(cls):
+        return User.active_objects.values(*cls.hierarchy_fields, 'supervisor_id', 'role__name')
+
+    @classmethod
+    async def aget_employee_reporting_line(cls, user_id):
+        employee = await cls.aget_user(user_id)
+        return ReportingHierarchyService.get_ancestors(employee.id, include_self=True)
+
+    @classmethod
+    async def aget_full_company_hierarchy(cls):
+        return cls._build_company_hierarchy([user async for user in cls.get_hierarchy_rows()])
 
-            if current_user.supervisor:
-                current_user = current_user.supervisor
+    @classmethod
+    def _build_company_hierarchy(cls, users):
+        children = {}
+        root = None
+        for user in users:
+            supervisor_id = user.pop('supervisor_id')
+            role_name = user.pop('role__name')
+            user['reports'] = children.setdefault(user['id'], [])
+            if root is None and role_name == EmployeeRoles.CEO:
+                root = user
             else:
-                break
+                children.setdefault(supervisor_id, []).append(user)
+
+        return root or {}
+
+
+class EmployeeImportService(AccountService):
+    """
+    Imports employees in bulk. The checks of ``create_user`` are applied to
+    the whole batch against lookups loaded once, supervisors listed in the
+    same file are created before their reportees, and users are inserted with
+    ``bulk_create``. Rows without a password get an unusable one.
+    """
+    file_formats = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}
+    chunk_size = 500
+
+    @classmethod
+    def get_file_format(cls, filename):
+        file_format = cls.file_formats.get(os.path.splitext(filename)[1].lower())
+        if not file_format:
+            raise ValidationError({"file": "Unsupported file type, upload a .csv or .jsonl file"})
+        return file_format
 
-        return reporting_chain
+    @classmethod
+    def read_rows(cls, stream, file_format):
+        # The upload is decoded while it is read, so a bad file only shows up here.
+        try:
+            return cls._read_rows(stream, file_format)
+        except UnicodeDecodeError:
+            raise ValidationError({"file": "The file is not UTF-8 encoded"})
+        except csv.Error as exc:
+            raise ValidationError({"file": f"The file is not a valid CSV file: {exc}"})
 
     @classmethod
-    def get_full_company_hierarchy(cls, request, max_depth=5):
-        user = User.active_objects.filter(role__name=EmployeeRoles.CEO).first()
-        hierarchy = (
-            User.objects
-            .filter(id=user.id)
-            .prefetch_related(cls._build_prefetch(0, max_depth))
-            .first()
+    def _read_rows(cls, stream, file_format):
+        if file_format == 'csv':
+            return [
+                {key.strip(): value if value != '' else None for key, value in row.items() if key}
+                for row in csv.DictReader(stream)
+            ]
+
+        rows = []
+        for line in stream:
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            if not isinstance(row, dict):
+                raise ValidationError({"file": f"Row {len(rows) + 1} is not a valid JSON object"})
+            rows.append(row)
+        return rows
+
+    @classmethod
+    def import_rows(cls, rows, dry_run=False, chunk_size=None):
+        errors = {}
+        payloads = {}
+        for row_number, row in enumerate(rows, start=1):
+            serializer = EmployeeImportRowSerializer(data=row)
+            if serializer.is_valid():
+                payloads[row_number] = serializer.validated_data
+            else:
+                errors[row_number] = serializer.errors
+
+        lookups = cls._preload_import_lookups(payloads)
+        for row_number, payload in payloads.items():
+            row_errors = cls._validate_import_row(payload, lookups)
+            if row_errors:
+                errors[row_number] = row_errors
+
+        levels = cls._order_by_reporting_line(payloads, lookups, errors)
+        created = 0
+        if not dry_run:
+            passwords = cls._hash_import_passwords(levels, payloads)
+            created = cls._insert_levels(levels, payloads, lookups, passwords, chunk_size or cls.chunk_size)
+
+        return {
+            "total": len(rows),
+            "valid": len(rows) - len(errors),
+            "created": created,
+            "dry_run": dry_run,
+            "errors": [{"row": row_number, "errors": errors[row_number]} for row_number in sorted(errors)],
+        }
+
+    @classmethod
+    def _preload_import_lookups(cls, payloads):
+        roles = {role.id: role.name for role in role_cache.all()}
+        rows_by_email = {}
+        rows_by_username = {}
+        for row_number, payload in payloads.items():
+            rows_by_email.setdefault(payload['email'], []).append(row_number)
+            rows_by_username.setdefault(cls._get_import_username(payload), []).append(row_number)
+
+        supervisor_ids = {payload['supervisor_id'] for payload in payloads.values() if payload.get('supervisor_id')}
+        supervisor_emails = {
+            payload['supervisor_email'] for payload in payloads.values() if payload.get('supervisor_email')
+        }
+        supervisors = list(
+            User.active_objects.filter(
+                Q(id__in=supervisor_ids) | Q(email__in=supervisor_emails - set(rows_by_email))
+            ).values_list('id', 'email', 'role__name')
         )
 
-        return hierarchy
+        return {
+            "roles": roles,
+            "departments": {department.id for department in department_cache.all()},
+            "taken_emails": set(User.objects.filter(email__in=list(rows_by_email)).values_list('email', flat=True)),
+            "taken_usernames": set(
+                User.objects.filter(username__in=list(rows_by_username)).values_list('username', flat=True)
+            ),
+            "ceo_exists": User.active_objects.filter(role__name=EmployeeRoles.CEO).exists(),
+            "ceo_rows": [
+                row_number for row_number, payload in payloads.items()
+                if roles.get(payload['role_id']) == EmployeeRoles.CEO
+            ],
+            "supervisors_by_id": {user_id: role_name for user_id, _, role_name in supervisors},
+            "supervisors_by_email": {email: (user_id, role_name) for user_id, email, role_name in supervisors},
+            "row_roles": {row_number: roles.get(payload['role_id']) for row_number, payload in payloads.items()},
+            "rows_by_email": rows_by_email,
+            "rows_by_username": rows_by_username,
+        }
 
     @classmethod
-    def _build_prefetch(cls, current_depth, max_depth):
-        if current_depth >= max_depth:
-            return None
+    def _get_import_username(cls, payload):
+        return payload.get('username') or payload['email']
 
-        return Prefetch(
-            'reportees',
-            queryset=User.objects.prefetch_related(
-                cls._build_prefetch(current_depth + 1, max_depth)
-            )
+    @classmethod
+    def _get_import_supervisor(cls, payload, lookups):
+        """
+        Returns ``(supervisor_id, in_file_row, role_name)`` for the supervisor
+        of a row, or ``None`` when it cannot be resolved.
+        """
+        if payload.get('supervisor_id'):
+            if payload['supervisor_id'] not in lookups['supervisors_by_id']:
+                return None
+            return payload['supervisor_id'], None, lookups['supervisors_by_id'][payload['supervisor_id']]
+
+        supervisor_email = payload.get('supervisor_email')
+        if supervisor_email in lookups['rows_by_email']:
+            supervisor_row = lookups['rows_by_email'][supervisor_email][0]
+            return None, supervisor_row, lookups['row_roles'].get(supervisor_row)
+        if supervisor_email in lookups['supervisors_by_email']:
+            supervisor_id, role_name = lookups['supervisors_by_email'][supervisor_email]
+            return supervisor_id, None, role_name
+        return None
+
+    @classmethod
+    def _validate_import_row(cls, payload, lookups):
+        errors = {}
+        email = payload['email']
+        username = cls._get_import_username(payload)
+        if email in lookups['taken_emails']:
+            errors['email'] = ["An account with this email already exists"]
+        elif len(lookups['rows_by_email'][email]) > 1:
+            errors['email'] = ["This email appears more than once in the file"]
+        if username in lookups['taken_usernames']:
+            errors['username'] = ["An account with this username already exists"]
+        elif len(lookups['rows_by_username'][username]) > 1:
+            errors['username'] = ["This username appears more than once in the file"]
+
+        role_name = lookups['roles'].get(payload['role_id'])
+        if role_name is None:
+            errors['role_id'] = [f"Role with ID {payload['role_id']} does not exist"]
+        if payload.get('department_id') and payload['department_id'] not in lookups['departments']:
+            errors['department_id'] = [f"Department with ID {payload['department_id']} does not exist"]
+
+        if role_name == EmployeeRoles.CEO and (lookups['ceo_exists'] or len(lookups['ceo_rows']) > 1):
+            errors['role_id'] = ["An active account with ceo role already exists"]
+
+        if not payload.get('supervisor_id') and not payload.get('supervisor_email'):
+            if role_name != EmployeeRoles.CEO:
+                errors['supervisor_id'] = ["A supervisor_id or supervisor_email is required"]
+            return errors
+
+        supervisor = cls._get_import_supervisor(payload, lookups)
+        if supervisor is None:
+            field = 'supervisor_id' if payload.get('supervisor_id') else 'supervisor_email'
+            errors[field] = ["Supervisor does not exist"]
+        elif role_name:
+            try:
+                cls._validate_supervisor_role(role_name, supervisor[2])
+            except ValidationError as exc:
+                errors.update(exc.detail)
+        return errors
+
+    @classmethod
+    def _order_by_reporting_line(cls, payloads, lookups, errors):
+        """
+        Groups valid rows into levels so that supervisors listed in the file
+        are inserted before their reportees. Rows whose in-file supervisor is
+        invalid, or that form a reporting cycle, are added to ``errors``.
+        """
+        parents = {}
+        for row_number, payload in payloads.items():
+            if row_number not in errors:
+                supervisor = cls._get_import_supervisor(payload, lookups)
+                if supervisor and supervisor[1]:
+                    parents[row_number] = supervisor[1]
+
+        levels = {}
+        for row_number in payloads:
+            path = []
+            current = row_number
+            while current is not None and current not in levels and current not in errors and current not in path:
+                path.append(current)
+                current = parents.get(current)
+
+            if current in path:
+                for cycle_row in path[path.index(current):]:
+                    errors[cycle_row] = {"supervisor_email": ["Reporting lines in the file form a cycle"]}
+            level = -1 if current is None else levels.get(current)
+            for path_row in reversed(path):
+                if path_row in errors:
+                    level = None
+                elif level is None:
+                    errors[path_row] = {
+                        "supervisor_email": [f"Supervisor in row {parents[path_row]} could not be imported"]
+                    }
+                else:
+                    level += 1
+                    levels[path_row] = level
+
+        grouped = {}
+        for row_number, level in levels.items():
+            grouped.setdefault(level, []).append(row_number)
+        return [sorted(grouped[level]) for level in sorted(grouped)]
+
+    @classmethod
+    def _hash_import_passwords(cls, levels, payloads):
+        """
+        Hashes the passwords of the rows to insert on the password hashing
+        threads, before the write transaction opens, so hashing thousands of
+        them does not hold the database write lock.
+        """
+        row_numbers = [
+            row_number for level in levels for row_number in level if payloads[row_number].get('password')
+        ]
+        hashes = PasswordHashingPool.map(
+            make_password, [payloads[row_number]['password'] for row_number in row_numbers]
+        )
+        return dict(zip(row_numbers, hashes))
+
+    @classmethod
+    def _build_import_user(cls, payload, supervisor_id, password):
+        return User(
+            email=payload['email'],
+            username=cls._get_import_username(payload),
+            first_name=payload['first_name'],
+            middle_name=payload.get('middle_name'),
+            last_name=payload['last_name'],
+            phone_number=payload.get('phone_number') or '',
+            position=payload['position'],
+            role_id=payload['role_id'],
+            department_id=payload.get('department_id'),
+            supervisor_id=supervisor_id,
+            password=password or make_password(None),
+        )
+
+    @classmethod
+    def _insert_levels(cls, levels, payloads, lookups, passwords, chunk_size):
+        user_ids = {}
+        with transaction.atomic():
+            for level in levels:
+                for start in range(0, len(level), chunk_size):
+                    chunk = level[start:start + chunk_size]
+                    users = []
+                    for row_number in chunk:
+                        supervisor = cls._get_import_supervisor(payloads[row_number], lookups)
+                        supervisor_id = None
+                        if supervisor:
+                            supervisor_id = supervisor[0] or user_ids[supervisor[1]]
+                        users.append(
+                            cls._build_import_user(payloads[row_number], supervisor_id, passwords.get(row_number))
+                        )
+
+                    User.objects.bulk_create(users)
+                    ReportingHierarchyService.add_users(users)
+                    user_ids.update(zip(chunk, (user.id for user in users)))
+
+            if user_ids:
+                transaction.on_commit(HierarchyCache.invalidate)
+        return len(user_ids)
+
+
+class EmployeeExportService:
+    """
+    Full extract of the active employees, read with a chunked iterator over
+    plain values so memory stays flat however many rows there are.
+    """
+    columns = (
+        'id', 'email', 'username', 'first_name', 'middle_name', 'last_name', 'phone_number', 'position',
+        'role_name', 'department_name', 'supervisor_id', 'supervisor_email', 'created_at',
+    )
+    chunk_size = 2000
+
+    @classmethod
+    def iter_rows(cls, chunk_size=None):
+        users = User.active_objects.order_by('id').values(
+            'id', 'email', 'username', 'first_name', 'middle_name', 'last_name', 'phone_number', 'position',
+            'supervisor_id', 'created_at',
+            role_name=F('role__name'), department_name=F('department__name'), supervisor_email=F('supervisor__email'),
         )
+        for user in users.iterator(chunk_size=chunk_size or cls.chunk_size):
+            user['phone_number'] = str(user['phone_number']) if user['phone_number'] else None
+            yield user
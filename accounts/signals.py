@@ -0,0 +1,58 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from accounts.cache import HierarchyCache, TokenStateCache, role_cache, department_cache
+from accounts.models import User, Role, Department
+
+
+def invalidate_hierarchy():
+    # Again once the transaction commits, so nothing cached from reads made
+    # before the commit (such as a visibility scope) outlives it.
+    HierarchyCache.invalidate()
+    transaction.on_commit(HierarchyCache.invalidate)
+
+
+@receiver(post_init, sender=User)
+def remember_hierarchy_values(sender, instance, **kwargs):
+    instance._hierarchy_values = HierarchyCache.tracked_values(instance)
+    instance._token_state_values = TokenStateCache.tracked_values(instance)
+
+
+@receiver(post_save, sender=User)
+def invalidate_hierarchy_on_save(sender, instance, created, **kwargs):
+    values = HierarchyCache.tracked_values(instance)
+    if created or values != instance._hierarchy_values:
+        invalidate_hierarchy()
+    instance._hierarchy_values = values
+
+
+@receiver(post_save, sender=User)
+def revoke_tokens_on_save(sender, instance, created, **kwargs):
+    # Tokens carry the email, role, position, department and supervisor as claims,
+    # so any change to them (or to the password or active flag) retires
+    # every token issued before it.
+    if not created and TokenStateCache.has_changed(instance._token_state_values, instance):
+        User.all_objects.filter(pk=instance.pk).update(token_version=F('token_version') + 1)
+        instance.token_version += 1
+        TokenStateCache.invalidate(instance.pk)
+        transaction.on_commit(lambda: TokenStateCache.invalidate(instance.pk))
+    instance._token_state_values = TokenStateCache.tracked_values(instance)
+
+
+@receiver(post_delete, sender=User)
+def invalidate_hierarchy_on_delete(sender, instance, **kwargs):
+    invalidate_hierarchy()
+
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+def invalidate_role_cache(sender, **kwargs):
+    role_cache.invalidate()
+
+
+@receiver(post_save, sender=Department)
+@receiver(post_delete, sender=Department)
+def invalidate_department_cache(sender, **kwargs):
+    department_cache.invalidate()
@@ -1,3 +1,822 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import time
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher, make_password
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connections
+from django.test import AsyncClient, SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from accounts.authentication import ClaimsJWTAuthentication
+from accounts.cache import HierarchyCache, role_cache, department_cache
+from accounts.checks import check_shared_cache
+from accounts.hashers import PasswordHashingPool, TunedScryptPasswordHasher
+from accounts.models import Role, User, Department, ReportingHierarchy
+from accounts.org_graph import OrgGraph, org_graph
+from accounts.services import (
+    AccountService,
+    ReportingHierarchyService,
+    ReportingLineService,
+    EmployeeImportService,
+    VisibilityScopeService,
+)
+from base.constants import EmployeeRoles, EmployeePositions
+
+
+class AccountTestMixin:
+
+    def setUp(self):
+        # Cached versions would otherwise outlive the rolled back test data.
+        cache.clear()
+        org_graph.invalidate()
+        super().setUp()
+
+    @classmethod
+    def create_roles(cls):
+        return {
+            role: Role.active_objects.create(name=role, description=f"{role} role in the organization")
+            for role in EmployeeRoles.values
+        }
+
+    @classmethod
+    def create_ceo(cls, roles):
+        ceo = User.objects.create_user(
+            email='ceo@email.com',
+            username='ceo@email.com',
+            first_name='Chief',
+            last_name='Executive',
+            role=roles[EmployeeRoles.CEO],
+            position=EmployeePositions.CEO,
+        )
+        ReportingHierarchyService.add_user(ceo)
+        return ceo
+
+    @classmethod
+    def create_employee(cls, email, role, supervisor, department=None, position=EmployeePositions.Software_Developer,
+                        password=None):
+        return AccountService.create_user({
+            'email': email,
+            'username': email,
+            'first_name': email.split('@')[0],
+            'last_name': 'Staff',
+            'role_id': role.id,
+            'position': position,
+            'supervisor_id': supervisor.id,
+            'department_id': department.id if department else None,
+            'password': password,
+        })
+
+
+class ReportingHierarchyServiceTest(AccountTestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.roles = cls.create_roles()
+        cls.department = Department.active_objects.create(name='Operations')
+        cls.ceo = cls.create_ceo(cls.roles)
+        cls.director = cls.create_employee('director@email.com', cls.roles[EmployeeRoles.DIRECTOR], cls.ceo)
+        cls.manager = cls.create_employee('manager@email.com', cls.roles[EmployeeRoles.MANAGER], cls.director)
+        cls.employee = cls.create_employee('employee@email.com', cls.roles[EmployeeRoles.EMPLOYEE], cls.manager)
+
+    def test_ancestors_are_ordered_from_nearest_supervisor(self):
+        self.assertEqual(
+            ReportingHierarchyService.get_ancestor_ids(self.employee.id),
+            [self.manager.id, self.director.id, self.ceo.id],
+        )
+
+    def test_descendants_at_any_depth(self):
+        self.assertCountEqual(
+            ReportingHierarchyService.get_descendant_ids(self.ceo.id),
+            [self.director.id, self.manager.id, self.employee.id],
+        )
+
+    def test_ancestors_take_one_query(self):
+        with self.assertNumQueries(1):
+            list(ReportingHierarchyService.get_ancestors(self.employee.id, include_self=True))
+
+    def test_reporting_line_includes_employee(self):
+        chain = ReportingLineService.get_employee_reporting_line(self.employee.id)
+        self.assertEqual(
+            [user.id for user in chain],
+            [self.employee.id, self.manager.id, self.director.id, self.ceo.id],
+        )
+
+    def test_moving_supervisor_moves_subtree(self):
+        other_director = self.create_employee('director2@email.com', self.roles[EmployeeRoles.DIRECTOR], self.ceo)
+        AccountService.update_user({
+            'email': self.manager.email,
+            'role_id': self.roles[EmployeeRoles.MANAGER].id,
+            'supervisor_id': other_director.id,
+            'department_id': None,
+        }, self.manager)
+
+        self.assertEqual(
+            ReportingHierarchyService.get_ancestor_ids(self.employee.id),
+            [self.manager.id, other_director.id, self.ceo.id],
+        )
+        self.assertEqual(ReportingHierarchyService.get_descendant_ids(self.director.id), [])
+
+    def test_supervisor_cannot_be_own_reportee(self):
+        with self.assertRaises(ValidationError):
+            AccountService.update_user({
+                'email': self.director.email,
+                'role_id': self.roles[EmployeeRoles.MANAGER].id,
+                'supervisor_id': self.director.id,
+                'department_id': None,
+            }, self.director)
+
+    def test_delete_user_removes_links(self):
+        AccountService.delete_user(self.employee.id)
+        self.assertFalse(
+            ReportingHierarchy.objects.filter(descendant_id=self.employee.id).exists()
+        )
+        self.assertNotIn(self.employee.id, ReportingHierarchyService.get_descendant_ids(self.ceo.id))
+
+    def test_rebuild_matches_maintained_links(self):
+        maintained = set(ReportingHierarchy.objects.values_list('ancestor_id', 'descendant_id', 'depth'))
+        ReportingHierarchyService.rebuild()
+        rebuilt = set(ReportingHierarchy.objects.values_list('ancestor_id', 'descendant_id', 'depth'))
+        self.assertEqual(maintained, rebuilt)
+
+
+class CompanyHierarchyTest(AccountTestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.roles = cls.create_roles()
+        cls.ceo = cls.create_ceo(cls.roles)
+        supervisor = cls.ceo
+        cls.chain = []
+        for level in range(8):
+            supervisor = User.objects.create_user(
+                email=f'level{level}@email.com',
+                username=f'level{level}@email.com',
+                role=cls.roles[EmployeeRoles.EMPLOYEE],
+                position=EmployeePositions.Software_Developer,
+                supervisor=supervisor,
+            )
+            cls.chain.append(supervisor)
+
+    def test_hierarchy_is_loaded_in_one_query(self):
+        with self.assertNumQueries(1):
+            ReportingLineService.get_full_company_hierarchy(None)
+
+    def test_hierarchy_has_no_depth_limit(self):
+        node = ReportingLineService.get_full_company_hierarchy(None)
+        self.assertEqual(node['id'], self.ceo.id)
+        for user in self.chain:
+            self.assertEqual(len(node['reports']), 1)
+            node = node['reports'][0]
+            self.assertEqual(node['id'], user.id)
+        self.assertEqual(node['reports'], [])
+        self.assertEqual(set(node), {'id', 'email', 'position', 'department', 'reports'})
+
+
+class CompanyHierarchyCacheTest(AccountTestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.roles = cls.create_roles()
+        cls.ceo = cls.create_ceo(cls.roles)
+        cls.director = cls.create_employee('director@email.com', cls.roles[EmployeeRoles.DIRECTOR], cls.ceo)
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.ceo)
+        self.url = reverse('company_hierarchy')
+
+    def test_unchanged_hierarchy_returns_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_snapshot_is_served_from_cache(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['reports'][0]['id'], self.director.id)
+
+    def test_reporting_line_change_invalidates_snapshot(self):
+        etag = self.client.get(self.url)['ETag']
+        manager = self.create_employee('manager@email.com', self.roles[EmployeeRoles.MANAGER], self.director)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['reports'][0]['reports'][0]['id'], manager.id)
+
+    def test_untracked_field_change_keeps_snapshot(self):
+        version = HierarchyCache.get_version()
+        director = User.active_objects.get(pk=self.director.id)
+        director.first_name = 'Renamed'
+        director.save()
+        self.assertEqual(HierarchyCache.get_version(), version)
+
+        director.soft_delete()
+        self.assertNotEqual(HierarchyCache.get_version(), version)
+
+
+class VisibilityScopeServiceTest(AccountTestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.roles = cls.create_roles()
+        cls.ceo = cls.create_ceo(cls.roles)
+        cls.director = cls.create_employee('director@email.com', cls.roles[EmployeeRoles.DIRECTOR], cls.ceo)
+        cls.manager = cls.create_employee('manager@email.com', cls.roles[EmployeeRoles.MANAGER], cls.director)
+        cls.employee = cls.create_employee('employee@email.com', cls.roles[EmployeeRoles.EMPLOYEE], cls.manager)
+        cls.other_director = cls.create_employee('other@email.com', cls.roles[EmployeeRoles.DIRECTOR], cls.ceo)
+
+    def test_scope_covers_the_whole_subtree(self):
+        self.assertIsNone(VisibilityScopeService.get_visible_user_ids(self.ceo))
+        self.assertEqual(
+            VisibilityScopeService.get_visible_user_ids(self.director),
+            sorted([self.director.id, self.manager.id, self.employee.id]),
+        )
+        self.assertEqual(VisibilityScopeService.get_visible_user_ids(self.employee), [self.employee.id])
+
+    def test_scope_is_cached_until_the_reporting_line_changes(self):
+        VisibilityScopeService.get_visible_user_ids(self.director)
+        with self.assertNumQueries(0):
+            VisibilityScopeService.get_visible_user_ids(self.director)
+
+        manager = User.active_objects.get(pk=self.manager.id)
+        manager.supervisor_id = self.other_director.id
+        manager.save()
+        ReportingHierarchyService.move_user(manager)
+        self.assertEqual(VisibilityScopeService.get_visible_user_ids(self.director), [self.director.id])
+        self.assertEqual(
+            VisibilityScopeService.get_visible_user_ids(self.other_director),
+            sorted([self.other_director.id, self.manager.id, self.employee.id]),
+        )
+
+    def test_scope_expires_when_an_invalidation_is_missed(self):
+        VisibilityScopeService.get_visible_user_ids(self.director)
+        # Moved by another process, whose version change this one did not see.
+        User.active_objects.filter(pk=self.manager.id).update(
+            supervisor_id=self.other_director.id, updated_at=timezone.now()
+        )
+        self.assertEqual(len(VisibilityScopeService.get_visible_user_ids(self.director)), 3)
+
+        later = settings.VISIBILITY_SCOPE_CACHE_TTL + 1
+        with mock.patch('time.time', return_value=time.time() + later), \
+                mock.patch('time.monotonic', return_value=time.monotonic() + later):
+            self.assertEqual(VisibilityScopeService.get_visible_user_ids(self.director), [self.director.id])
+
+    def test_large_scope_is_filtered_with_a_subquery(self):
+        with mock.patch.object(VisibilityScopeService, 'max_listed_ids', 2):
+            self.assertIsNone(VisibilityScopeService.get_visible_user_ids(self.director))
+            scope_filter = VisibilityScopeService.get_scope_filter(self.director, field='id')
+        self.assertEqual(
+            sorted(User.active_objects.filter(scope_filter).values_list('id', flat=True)),
+            sorted([self.director.id, self.manager.id, self.employee.id]),
+        )
+
+
+class OrgGraphTest(AccountTestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.roles = cls.create_roles()
+        cls.ceo = cls.create_ceo(cls.roles)
+        cls.director = cls.create_employee('director@email.com', cls.roles[EmployeeRoles.DIRECTOR], cls.ceo)
+        cls.manager = cls.create_employee('manager@email.com', cls.roles[EmployeeRoles.MANAGER], cls.director)
+        cls.employee = cls.create_employee('employee@email.com', cls.roles[EmployeeRoles.EMPLOYEE], cls.manager)
+        cls.other_director = cls.create_employee('other@email.com', cls.roles[EmployeeRoles.DIRECTOR], cls.ceo)
+
+    def test_graph_matches_the_closure_table(self):
+        graph = org_graph.get()
+        self.assertEqual(len(graph), 5)
+        for user in [self.ceo, self.director, self.manager, self.employee, self.other_director]:
+            self.assertCountEqual(
+                graph.get_descendant_ids(user.id), ReportingHierarchyService.get_descendant_ids(user.id)
+            )
+            self.assertEqual(graph.get_ancestor_ids(user.id), ReportingHierarchyService.get_ancestor_ids(user.id))
+        self.assertEqual(graph.get_depth(self.employee.id), 3)
+        self.assertEqual(graph.get_span_of_control(self.ceo.id), 2)
+        self.assertEqual(graph.get_subtree_size(self.director.id), 3)
+        self.assertTrue(graph.is_in_subtree(self.employee.id, self.director.id))
+        self.assertFalse(graph.is_in_subtree(self.employee.id, self.other_director.id))
+        self.assertCountEqual(
+            graph.get_ids_with_role(self.roles[EmployeeRoles.DIRECTOR].id), [self.director.id, self.other_director.id]
+        )
+
+    def test_unchanged_hierarchy_reuses_the_graph(self):
+        graph = org_graph.get()
+        with self.assertNumQueries(0):
+            self.assertIs(org_graph.get(), graph)
+
+    def test_move_is_merged_without_a_full_load(self):
+        org_graph.get()
+        AccountService.update_user({
+            'email': self.manager.email,
+            'role_id': self.roles[EmployeeRoles.MANAGER].id,
+            'supervisor_id': self.other_director.id,
+            'department_id': None,
+        }, self.manager)
+
+        # The saved rows, then the count of the active users.
+        with self.assertNumQueries(2):
+            graph = org_graph.get()
+        self.assertEqual(graph.get_supervisor_id(self.manager.id), self.other_director.id)
+        self.assertTrue(graph.is_in_subtree(self.employee.id, self.other_director.id))
+        self.assertEqual(graph.get_subtree_size(self.director.id), 1)
+
+    def test_deactivated_user_leaves_the_graph(self):
+        org_graph.get()
+        AccountService.delete_user(self.employee.id)
+
+        graph = org_graph.get()
+        self.assertNotIn(self.employee.id, graph)
+        self.assertEqual(graph.get_descendant_ids(self.manager.id), [])
+
+    def test_write_checks_read_the_database(self):
+        org_graph.get()
+        # Saved by another process: the graph of this one has not seen it.
+        User.active_objects.filter(pk=self.other_director.id).update(role=self.roles[EmployeeRoles.CEO])
+
+        with self.assertRaises(ValidationError):
+            self.create_employee('ceo2@email.com', self.roles[EmployeeRoles.CEO], self.ceo)
+        self.create_employee('manager2@email.com', self.roles[EmployeeRoles.MANAGER], self.other_director)
+
+    def test_apply_merges_changes_in_id_order(self):
+        graph = OrgGraph([(1, None, 1, None), (2, 1, 2, 10), (3, 2, 3, 10), (5, 2, 3, 11)])
+        graph = graph.apply({3: None, 4: (4, 1, 2, 11), 5: (5, 4, 3, 11), 6: (6, 5, 3, 10)})
+        self.assertEqual(list(graph.ids), [1, 2, 4, 5, 6])
+        self.assertEqual(graph.get_ancestor_ids(6), [5, 4, 1])
+        self.assertEqual(graph.get_descendant_ids(1), [2, 4, 5, 6])
+        self.assertEqual(graph.get_department_id(6), 10)
+
+    def test_memory_stays_under_sixty_bytes_per_user(self):
+        rows = [(1, None, 0, 0)] + [
+            (user_id, user_id // 10 or 1, user_id % 4, user_id % 7) for user_id in range(2, 100001)
+        ]
+        graph = OrgGraph(rows)
+        self.assertEqual(graph.get_subtree_size(1), 100000)
+        self.assertLess(graph.nbytes, 60 * len(rows))
+
+
+class SharedCacheCheckTest(SimpleTestCase):
+
+    def test_per_process_cache_is_reported(self):
+        with self.settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertEqual([error.id for error in check_shared_cache(None)], ['accounts.E001'])
+        with self.settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}}):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+class EmployeeImportTest(AccountTestMixin, TestCase):
+    header = 'email,first_name,last_name,position,role_id,supervisor_id,supervisor_email,department_id\n'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.roles = cls.create_roles()
+        cls.department = Department.active_objects.create(name='Operations')
+        cls.ceo = cls.create_ceo(cls.roles)
+
+    def csv_rows(self, *lines):
+        return EmployeeImportService.read_rows(io.StringIO(self.header + '\n'.join(lines)), 'csv')
+
+    def test_supervisors_in_file_are_created_first(self):
+        rows = self.csv_rows(
+            f'dev@email.com,Dev,One,Software Developer,{self.roles["Employee"].id},,manager@email.com,',
+            f'manager@email.com,Man,Ager,Software Developer,{self.roles["Manager"].id},,director@email.com,',
+            f'director@email.com,Dir,Ector,Software Developer,{self.roles["Director"].id},{self.ceo.id},,{self.department.id}',
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            report = EmployeeImportService.import_rows(rows)
+
+        self.assertEqual(report['errors'], [])
+        self.assertEqual(report['created'], 3)
+        developer = User.active_objects.get(email='dev@email.com')
+        self.assertEqual(developer.supervisor.email, 'manager@email.com')
+        self.assertFalse(developer.has_usable_password())
+        self.assertEqual(
+            ReportingHierarchyService.get_ancestor_ids(developer.id),
+            [developer.supervisor_id, developer.supervisor.supervisor_id, self.ceo.id],
+        )
+
+    def test_invalid_rows_are_reported(self):
+        rows = self.csv_rows(
+            f'ceo@email.com,Dup,Licate,Software Developer,{self.roles["Employee"].id},{self.ceo.id},,',
+            f'orphan@email.com,Or,Phan,Software Developer,{self.roles["Employee"].id},,missing@email.com,',
+            f'dev@email.com,Dev,One,Software Developer,{self.roles["Employee"].id},,lead@email.com,',
+            f'lead@email.com,Le,Ad,Software Developer,{self.roles["Employee"].id},{self.ceo.id},,',
+            f'loop1@email.com,Lo,Op,Software Developer,{self.roles["Manager"].id},,loop2@email.com,',
+            f'loop2@email.com,Lo,Op,Software Developer,{self.roles["Manager"].id},,loop1@email.com,',
+            f'bad@email.com,Bad,Position,Janitor,{self.roles["Employee"].id},{self.ceo.id},,999',
+        )
+        report = EmployeeImportService.import_rows(rows)
+
+        errors = {error['row']: error['errors'] for error in report['errors']}
+        self.assertEqual(set(errors), {1, 2, 3, 5, 6, 7})
+        self.assertIn('email', errors[1])
+        self.assertIn('supervisor_email', errors[2])
+        self.assertIn('supervisor_id', errors[3])
+        self.assertIn('supervisor_id', errors[5])
+        self.assertIn('position', errors[7])
+        self.assertEqual(report['created'], 1)
+        self.assertTrue(User.active_objects.filter(email='lead@email.com').exists())
+
+    def test_passwords_are_hashed_before_the_transaction(self):
+        rows = [
+            {
+                'email': f'director{index}@email.com', 'first_name': 'Dir', 'last_name': 'Ector',
+                'position': 'Software Developer', 'role_id': self.roles['Director'].id, 'supervisor_id': self.ceo.id,
+                'password': f'Password@{index}',
+            }
+            for index in range(3)
+        ]
+        # Hashing runs on other threads: look at the connection of this one.
+        database = connections['default']
+        atomic_blocks = len(database.atomic_blocks)
+        hashed_in = []
+
+        def hash_password(password):
+            hashed_in.append(len(database.atomic_blocks))
+            return make_password(password)
+
+        with mock.patch('accounts.services.make_password', hash_password):
+            report = EmployeeImportService.import_rows(rows)
+        self.assertEqual(report['created'], 3)
+        self.assertEqual(hashed_in, [atomic_blocks] * 3)
+        self.assertTrue(User.active_objects.get(email='director2@email.com').check_password('Password@2'))
+
+    def test_dry_run_creates_nothing(self):
+        rows = self.csv_rows(
+            f'director@email.com,Dir,Ector,Software Developer,{self.roles["Director"].id},{self.ceo.id},,',
+        )
+        report = EmployeeImportService.import_rows(rows, dry_run=True)
+        self.assertEqual((report['valid'], report['created']), (1, 0))
+        self.assertFalse(User.objects.filter(email='director@email.com').exists())
+
+    def test_query_count_does_not_grow_with_rows(self):
+        lines = [
+            f'director{index}@email.com,Dir,Ector,Software Developer,{self.roles["Director"].id},{self.ceo.id},,'
+            for index in range(50)
+        ]
+        # SQLite's variable limit splits the user insert into two statements.
+        with self.assertNumQueries(12):
+            EmployeeImportService.import_rows(self.csv_rows(*lines))
+
+    def test_import_endpoint_accepts_jsonl(self):
+        client = APIClient()
+        client.force_authenticate(self.ceo)
+        content = (
+            '{"email": "director@email.com", "first_name": "Dir", "last_name": "Ector", '
+            f'"position": "Software Developer", "role_id": {self.roles["Director"].id}, "supervisor_id": {self.ceo.id}}}\n'
+        )
+        response = client.post(
+            reverse('employee_import'),
+            {'file': SimpleUploadedFile('employees.jsonl', content.encode())},
+            format='multipart',
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 1)
+
+    def test_import_endpoint_rejects_a_file_that_is_not_utf8(self):
+        client = APIClient()
+        client.force_authenticate(self.ceo)
+        content = 'email,first_name,last_name\nrene@email.com,René,Müller\n'.encode('latin-1')
+        response = client.post(
+            reverse('employee_import'),
+            {'file': SimpleUploadedFile('employees.csv', content)},
+            format='multipart',
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['file'], 'The file is not UTF-8 encoded')
+        self.assertFalse(User.objects.filter(email='rene@email.com').exists())
+
+
+class AccountEndpointQueryCountTest(AccountTestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.roles = cls.create_roles()
+        cls.department = Department.active_objects.create(name='Operations')
+        cls.ceo = cls.create_ceo(cls.roles)
+        cls.ceo.set_password('Password@1')
+        cls.ceo.save()
+        cls.director = cls.create_employee('director@email.com', cls.roles[EmployeeRoles.DIRECTOR], cls.ceo)
+        cls.manager = cls.create_employee('manager@email.com', cls.roles[EmployeeRoles.MANAGER], cls.director)
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(User.active_objects.get(pk=self.ceo.pk))
+
+    def test_login(self):
+        client = APIClient()
+        role_cache.get(self.ceo.role_id)
+        with self.assertNumQueries(1):
+            response = client.post(reverse('login'), {'email': self.ceo.email, 'password': 'Password@1'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_employee_list(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('employee_list_create'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_employee_create(self):
+        payload = {
+            'email': 'employee@email.com',
+            'username': 'employee@email.com',
+            'first_name': 'Em',
+            'last_name': 'Ployee',
+            'password': 'Password@1',
+            'position': EmployeePositions.Software_Developer,
+            'role_id': self.roles[EmployeeRoles.EMPLOYEE].id,
+            'supervisor_id': self.manager.id,
+            'department_id': self.department.id,
+        }
+        with self.assertNumQueries(10):
+            response = self.client.post(reverse('employee_list_create'), payload)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_employee_reporting_line(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('employee_detail', args=[self.manager.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_company_hierarchy(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('company_hierarchy'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_role_list(self):
+        self.client.get(reverse('role-list'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('role-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_department_list(self):
+        self.client.get(reverse('department-list'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('department-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class ClaimsJWTAuthenticationTest(AccountTestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.roles = cls.create_roles()
+        cls.ceo = cls.create_ceo(cls.roles)
+        cls.director = cls.create_employee(
+            'director@email.com', cls.roles[EmployeeRoles.DIRECTOR], cls.ceo, password='Password@1'
+        )
+
+    def login(self):
+        client = APIClient()
+        response = client.post(reverse('login'), {'email': self.director.email, 'password': 'Password@1'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        return client
+
+    def test_login_embeds_claims(self):
+        token = ClaimsJWTAuthentication.get_token(self.director)
+        self.assertEqual(token['role'], EmployeeRoles.DIRECTOR)
+        self.assertEqual(token['supervisor_id'], self.ceo.id)
+        self.assertEqual(token['token_version'], 0)
+
+    def test_authenticated_request_does_not_read_the_user(self):
+        client = self.login()
+        client.get(reverse('company_hierarchy'))
+        with self.assertNumQueries(0):
+            response = client.get(reverse('company_hierarchy'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_user_is_built_from_claims(self):
+        token = ClaimsJWTAuthentication.get_token(self.director).access_token
+        with self.assertNumQueries(1):
+            user = ClaimsJWTAuthentication().get_user(token)
+        with self.assertNumQueries(0):
+            self.assertEqual(user.role.name, EmployeeRoles.DIRECTOR)
+            self.assertEqual(user.supervisor_id, self.ceo.id)
+
+    def test_deactivated_user_is_rejected(self):
+        client = self.login()
+        self.director.is_active = False
+        self.director.save()
+        response = client.get(reverse('company_hierarchy'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_role_change_revokes_issued_tokens(self):
+        client = self.login()
+        self.director.role = self.roles[EmployeeRoles.MANAGER]
+        self.director.save()
+        self.director.refresh_from_db()
+        self.assertEqual(self.director.token_version, 1)
+        response = client.get(reverse('company_hierarchy'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_email_change_revokes_issued_tokens(self):
+        client = self.login()
+        self.director.email = 'renamed@email.com'
+        self.director.save()
+        self.director.refresh_from_db()
+        self.assertEqual(self.director.token_version, 1)
+        response = client.get(reverse('company_hierarchy'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_untracked_change_keeps_tokens(self):
+        client = self.login()
+        self.director.first_name = 'Renamed'
+        self.director.save()
+        response = client.get(reverse('company_hierarchy'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class PasswordHashingTest(AccountTestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.roles = cls.create_roles()
+        cls.ceo = cls.create_ceo(cls.roles)
+        cls.director = cls.create_employee(
+            'director@email.com', cls.roles[EmployeeRoles.DIRECTOR], cls.ceo, password='Password@1'
+        )
+
+    def login(self, password='Password@1'):
+        return APIClient().post(reverse('login'), {'email': self.director.email, 'password': password})
+
+    def test_new_passwords_use_the_preferred_hasher(self):
+        self.assertTrue(self.director.password.startswith(f'{get_hasher().algorithm}$'))
+
+    def test_hashes_are_only_rehashed_to_a_higher_cost(self):
+        hasher = TunedScryptPasswordHasher()
+        with mock.patch.object(TunedScryptPasswordHasher, 'parallelism', hasher.parallelism + 1):
+            stronger = hasher.encode('Password@1', hasher.salt())
+        with mock.patch.object(TunedScryptPasswordHasher, 'parallelism', 1):
+            weaker = hasher.encode('Password@1', hasher.salt())
+        self.assertFalse(hasher.must_update(stronger))
+        self.assertTrue(hasher.must_update(weaker))
+
+    def test_login_upgrades_old_hashes(self):
+        User.all_objects.filter(pk=self.director.pk).update(
+            password=make_password('Password@1', hasher='pbkdf2_sha256')
+        )
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+        self.director.refresh_from_db()
+        self.assertTrue(self.director.password.startswith(f'{get_hasher().algorithm}$'))
+        # A rehash is not a password change, so tokens stay valid.
+        self.assertEqual(self.director.token_version, 0)
+
+    def test_wrong_password_is_rejected(self):
+        self.assertEqual(self.login('Wrong@1').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_login_is_throttled_when_the_pool_is_full(self):
+        with mock.patch.object(PasswordHashingPool, '_slots') as slots, \
+                mock.patch.object(PasswordHashingPool, '_executor', mock.Mock()):
+            slots.acquire.return_value = False
+            response = self.login()
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+
+class EmployeeExportTest(AccountTestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.roles = cls.create_roles()
+        cls.department = Department.active_objects.create(name='Operations')
+        cls.ceo = cls.create_ceo(cls.roles)
+        cls.director = cls.create_employee(
+            'director@email.com', cls.roles[EmployeeRoles.DIRECTOR], cls.ceo, department=cls.department
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.ceo)
+
+    def test_csv_export(self):
+        response = self.client.get(reverse('employee_export'))
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="employees.csv"')
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([row['email'] for row in rows], [self.ceo.email, self.director.email])
+        self.assertEqual(rows[1]['supervisor_email'], self.ceo.email)
+        self.assertEqual(rows[1]['department_name'], 'Operations')
+        self.assertEqual(rows[1]['role_name'], EmployeeRoles.DIRECTOR)
+
+    def test_jsonl_export(self):
+        response = self.client.get(reverse('employee_export'), {'file_format': 'jsonl'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(rows[1]['supervisor_id'], self.ceo.id)
+
+    def test_unknown_format_is_rejected(self):
+        response = self.client.get(reverse('employee_export'), {'file_format': 'xlsx'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AsyncEndpointTest(AccountTestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.roles = cls.create_roles()
+        cls.ceo = cls.create_ceo(cls.roles)
+        cls.director = cls.create_employee('director@email.com', cls.roles[EmployeeRoles.DIRECTOR], cls.ceo)
+        cls.manager = cls.create_employee('manager@email.com', cls.roles[EmployeeRoles.MANAGER], cls.director)
+
+    def setUp(self):
+        super().setUp()
+        # Issued up front, issuing a token reads the roles synchronously.
+        self.tokens = {
+            user.id: ClaimsJWTAuthentication.get_token(user).access_token
+            for user in (self.ceo, self.director, self.manager)
+        }
+
+    async def get(self, user, url, data=None, headers=None):
+        headers = {'Authorization': f'Bearer {self.tokens[user.id]}', **(headers or {})}
+        return await AsyncClient().get(url, data, headers=headers)
+
+    async def test_employee_list_matches_sync_view(self):
+        response = await self.get(self.ceo, reverse('async_employee_list'), {'page_size': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        sync_client = APIClient()
+        sync_client.force_authenticate(self.ceo)
+        expected = await sync_to_async(sync_client.get)(reverse('employee_list_create'), {'page_size': 2})
+        self.assertEqual(response.json()['results'], expected.json()['results'])
+
+    async def test_employee_list_keyset_pagination(self):
+        response = await self.get(
+            self.ceo, reverse('async_employee_list'), {'pagination': 'keyset', 'page_size': 2, 'count': 'exact'}
+        )
+        self.assertEqual(response.json()['count'], 3)
+        self.assertEqual(len(response.json()['results']), 2)
+        self.assertIsNotNone(response.json()['next'])
+
+    async def test_employee_list_requires_role(self):
+        response = await self.get(self.manager, reverse('async_employee_list'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    async def test_employee_detail(self):
+        response = await self.get(self.ceo, reverse('async_employee_detail', args=[self.manager.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['supervisor'], self.director.get_complete_name)
+        self.assertEqual(response.json()['role'], EmployeeRoles.MANAGER)
+
+    async def test_reporting_line(self):
+        response = await self.get(self.ceo, reverse('async_employee_reporting_line', args=[self.manager.id]))
+        self.assertEqual(
+            [row['id'] for row in response.json()], [self.manager.id, self.director.id, self.ceo.id]
+        )
+
+    async def test_company_hierarchy_honours_etag(self):
+        response = await self.get(self.director, reverse('async_company_hierarchy'))
+        self.assertEqual(response.json()['id'], self.ceo.id)
+        response = await self.get(
+            self.director, reverse('async_company_hierarchy'), headers={'If-None-Match': response['ETag']}
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    async def test_missing_token_is_rejected(self):
+        response = await AsyncClient().get(reverse('async_company_hierarchy'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class ListQueryCountRegressionTest(AccountTestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.roles = cls.create_roles()
+        cls.department = Department.active_objects.create(name='Operations')
+        cls.ceo = cls.create_ceo(cls.roles)
+        supervisor = cls.create_employee('director@email.com', cls.roles[EmployeeRoles.DIRECTOR], cls.ceo)
+        supervisor = cls.create_employee('manager@email.com', cls.roles[EmployeeRoles.MANAGER], supervisor)
+        for index in range(30):
+            cls.create_employee(
+                f'employee{index}@email.com', cls.roles[EmployeeRoles.EMPLOYEE], supervisor, cls.department
+            )
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(User.active_objects.get(pk=self.ceo.pk))
+        role_cache.all()
+        department_cache.all()
+
+    def test_employee_list_query_count_does_not_grow_with_page_size(self):
+        for page_size in (5, 30):
+            with self.assertNumQueries(2):
+                response = self.client.get(reverse('employee_list_create'), {'page_size': page_size})
+            self.assertEqual(len(response.data['results']), page_size)
+            self.assertIsNotNone(response.data['results'][0]['role'])
+
+    def test_reporting_line_query_count_does_not_grow_with_depth(self):
+        employee = User.active_objects.get(email='employee0@email.com')
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('employee_detail', args=[employee.id]))
+        self.assertEqual([row['role'] for row in response.data], ['Employee', 'Manager', 'Director', 'CEO'])
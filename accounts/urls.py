@@ -2,6 +2,8 @@ from django.urls import path
 
 from accounts.views import (
     DepartmentListAPIView,
+    EmployeeExportAPIView,
+    EmployeeImportAPIView,
     EmployeeListCreateView,
     EmployeeReportingLineAPIView,
     LoginAPIView,
@@ -11,6 +13,8 @@ from accounts.views import (
 urlpatterns = [
     path('login/', LoginAPIView.as_view(), name='login'),
     path('', EmployeeListCreateView.as_view(), name='employee_list_create'),
+    path('import/', EmployeeImportAPIView.as_view(), name='employee_import'),
+    path('export/', EmployeeExportAPIView.as_view(), name='employee_export'),
     path('<int:user_id>/hierarchy/', EmployeeReportingLineAPIView.as_view(), name='employee_detail'),
     path('roles/', RoleListAPIView.as_view(), name='role-list'),
     path('departments/', DepartmentListAPIView.as_view(), name='department-list'),
@@ -1,13 +1,18 @@
+import io
+
 from rest_framework.generics import ListAPIView
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, permissions
-from accounts.models import User, Role, Department
-from accounts.serializers import LoginSerializer, ReportingChainSerializer, UserSerializer, UserHierarchySerializer, \
-    RoleSerializer, DepartmentSerializer
-from accounts.services import AccountService, ReportingLineService
+from django.utils.http import parse_etags
+from accounts.cache import HierarchyCache, role_cache, department_cache
+from accounts.serializers import LoginSerializer, ReportingChainSerializer, UserSerializer, RoleSerializer, \
+    DepartmentSerializer, EmployeeImportSerializer, EmployeeExportQuerySerializer
+from accounts.services import AccountService, ReportingLineService, EmployeeImportService, EmployeeExportService
 from base.constants import EmployeeRoles, EmployeePositions
-from base.pagination import CustomPagination
+from base.exports import ExportWriter
+from base.pagination import CustomPagination, get_paginator
+from base.views import AsyncAPIView
 from base.role_permission import role_position_required
 
 
@@ -22,16 +27,20 @@ class LoginAPIView(APIView):
 
 class RoleListAPIView(ListAPIView):
     permission_classes = (permissions.IsAuthenticated,)
-    queryset = Role.active_objects.all()
     serializer_class = RoleSerializer
     pagination_class = CustomPagination
 
+    def get_queryset(self):
+        return role_cache.all()
+
 class DepartmentListAPIView(ListAPIView):
     permission_classes = (permissions.IsAuthenticated,)
-    queryset = Department.active_objects.all()
     serializer_class = DepartmentSerializer
     pagination_class = CustomPagination
 
+    def get_queryset(self):
+        return department_cache.all()
+
 
 class EmployeeListCreateView(APIView):
     serializer_class = UserSerializer
@@ -55,13 +64,51 @@ class EmployeeListCreateView(APIView):
         allowed_positions=[EmployeePositions.Human_Resources_Manager.value]
     )
     def get(self, request, *args, **kwargs):
-        employees = User.active_objects.all()
-        paginator = self.pagination_class()
+        employees = self.serializer_class.setup_eager_loading(AccountService.get_employees())
+        paginator = get_paginator(self, request)
         paginated_employees = paginator.paginate_queryset(employees, request, view=self)
         serializer = self.serializer_class(paginated_employees, many=True)
         return paginator.get_paginated_response(serializer.data)
 
 
+class EmployeeImportAPIView(APIView):
+    serializer_class = EmployeeImportSerializer
+    permission_classes = (permissions.IsAuthenticated,)
+
+    @role_position_required(
+        allowed_roles=[EmployeeRoles.CEO.value],
+        allowed_positions=[EmployeePositions.Human_Resources_Manager.value]
+    )
+    def post(self, request, *args, **kwargs):
+        serializer = self.serializer_class(data=request.data)
+        if serializer.is_valid():
+            upload = serializer.validated_data['file']
+            file_format = serializer.validated_data.get('format') or EmployeeImportService.get_file_format(upload.name)
+            stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+            rows = EmployeeImportService.read_rows(stream, file_format)
+            report = EmployeeImportService.import_rows(rows, dry_run=serializer.validated_data['dry_run'])
+            return Response(report, status=status.HTTP_200_OK)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class EmployeeExportAPIView(APIView):
+    serializer_class = EmployeeExportQuerySerializer
+    permission_classes = (permissions.IsAuthenticated,)
+
+    @role_position_required(
+        allowed_roles=[EmployeeRoles.CEO.value],
+        allowed_positions=[EmployeePositions.Human_Resources_Manager.value]
+    )
+    def get(self, request, *args, **kwargs):
+        serializer = self.serializer_class(data=request.query_params)
+        if serializer.is_valid():
+            return ExportWriter.streaming_response(
+                serializer.validated_data['file_format'], 'employees',
+                EmployeeExportService.columns, EmployeeExportService.iter_rows(),
+            )
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
 class EmployeeDetailAPIView(APIView):
     permission_classes = (permissions.IsAuthenticated,)
 
@@ -100,7 +147,7 @@ class EmployeeReportingLineAPIView(APIView):
     permission_classes = (permissions.IsAuthenticated,)
 
     def get(self, request, user_id, *args, **kwargs):
-        data =ReportingLineService().get_employee_reporting_line(user_id)
+        data = self.serializer_class.setup_eager_loading(ReportingLineService().get_employee_reporting_line(user_id))
         return Response(data=self.serializer_class(data, many=True).data, status=status.HTTP_200_OK)
 
 
@@ -108,11 +155,66 @@ class CompanyHierarchyView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        hierarchy = ReportingLineService().get_full_company_hierarchy(request)
-        serializer = UserHierarchySerializer(hierarchy)
-        return Response(serializer.data)
+        version = HierarchyCache.get_version()
+        headers = {'ETag': HierarchyCache.get_etag(version), 'Cache-Control': 'private, no-cache'}
+        if headers['ETag'] in parse_etags(request.headers.get('If-None-Match', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
 
+        hierarchy = HierarchyCache.get_snapshot(
+            version, lambda: ReportingLineService().get_full_company_hierarchy(request)
+        )
+        return Response(hierarchy, headers=headers)
 
 
+class AsyncEmployeeListAPIView(AsyncAPIView):
+    serializer_class = UserSerializer
+    permission_classes = (permissions.IsAuthenticated,)
+    pagination_class = CustomPagination
+
+    @role_position_required(
+        allowed_roles=[EmployeeRoles.CEO.value],
+        allowed_positions=[EmployeePositions.Human_Resources_Manager.value]
+    )
+    async def get(self, request, *args, **kwargs):
+        employees = self.serializer_class.setup_eager_loading(AccountService.get_employees())
+        paginator = get_paginator(self, request)
+        paginated_employees = await paginator.apaginate_queryset(employees, request, view=self)
+        serializer = self.serializer_class(paginated_employees, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+
+class AsyncEmployeeDetailAPIView(AsyncAPIView):
+    permission_classes = (permissions.IsAuthenticated,)
+
+    @role_position_required(
+        allowed_roles=[EmployeeRoles.CEO],
+        allowed_positions=[EmployeePositions.Human_Resources_Manager]
+    )
+    async def get(self, request, user_id, *args, **kwargs):
+        employee = await AccountService.aget_user(user_id)
+        return Response(UserSerializer(employee).data)
+
+
+class AsyncEmployeeReportingLineAPIView(AsyncAPIView):
+    serializer_class = ReportingChainSerializer
+    permission_classes = (permissions.IsAuthenticated,)
+
+    async def get(self, request, user_id, *args, **kwargs):
+        queryset = self.serializer_class.setup_eager_loading(
+            await ReportingLineService.aget_employee_reporting_line(user_id)
+        )
+        data = [employee async for employee in queryset]
+        return Response(data=self.serializer_class(data, many=True).data, status=status.HTTP_200_OK)
+
+
+class AsyncCompanyHierarchyView(AsyncAPIView):
+    permission_classes = [permissions.IsAuthenticated]
 
+    async def get(self, request):
+        version = await HierarchyCache.aget_version()
+        headers = {'ETag': HierarchyCache.get_etag(version), 'Cache-Control': 'private, no-cache'}
+        if headers['ETag'] in parse_etags(request.headers.get('If-None-Match', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
 
+        hierarchy = await HierarchyCache.aget_snapshot(version, ReportingLineService.aget_full_company_hierarchy)
+        return Response(hierarchy, headers=headers)
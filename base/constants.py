@@ -28,3 +28,24 @@ class LeaveApprovalStatus(TextChoices):
     APPROVED = 'Approved'
     DECLINED = 'Declined'
     PENDING = 'Pending'
+
+
+class ApprovalQueueStatus(TextChoices):
+    WAITING = 'Waiting'
+    PENDING = 'Pending'
+    ACTIONED = 'Actioned'
+    CLOSED = 'Closed'
+
+
+class OutboxEventStatus(TextChoices):
+    PENDING = 'Pending'
+    PROCESSING = 'Processing'
+    DELIVERED = 'Delivered'
+    DEAD = 'Dead'
+
+
+class LeaveEventTopics(TextChoices):
+    SUBMITTED = 'leave_request.submitted'
+    DECISION_RECORDED = 'leave_request.decision_recorded'
+    APPROVED = 'leave_request.approved'
+    DECLINED = 'leave_request.declined'
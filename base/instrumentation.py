@@ -0,0 +1,188 @@
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_WHITESPACE = re.compile(r'\s+')
+_current_recorder = ContextVar('query_recorder', default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """
+    Raised when a view runs more queries than its budget in
+    ``QUERY_BUDGETS`` and ``QUERY_BUDGET_ACTION`` is ``'raise'``.
+    """
+
+
+def fingerprint(sql):
+    """
+    The shape of a query: parameters are already placeholders, ``IN`` lists
+    of any length collapse to one, so the queries of an N+1 loop share it.
+    """
+    return _IN_LIST.sub('IN (...)', _WHITESPACE.sub(' ', sql).strip())
+
+
+def dispatch_query(execute, sql, params, many, context):
+    recorder = _current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install_query_dispatcher(connection):
+    """
+    Adds ``dispatch_query`` to a connection (see ``base.signals``).
+    Connections belong to a thread, so the recorder of a request is found
+    through a context variable rather than installed per request.
+    """
+    if dispatch_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(dispatch_query)
+
+
+class QueryRecorder:
+    """
+    Database execute wrapper counting and timing the queries of a request.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    @contextmanager
+    def record(self):
+        """
+        Makes this the recorder of the queries run in the current context,
+        including the threads async code runs its queries in.
+        """
+        token = _current_recorder.set(self)
+        try:
+            yield self
+        finally:
+            _current_recorder.reset(token)
+
+    @property
+    def duplicates(self):
+        return {sql: count for sql, count in self.fingerprints.items() if count > 1}
+
+    @property
+    def duplicate_count(self):
+        return sum(count - 1 for count in self.duplicates.values())
+
+
+class ViewMetrics:
+    __slots__ = ('requests', 'duration', 'buckets', 'db_duration', 'queries', 'max_queries', 'duplicates',
+                 'over_budget')
+
+    def __init__(self, bucket_count):
+        self.requests = 0
+        self.duration = 0.0
+        self.buckets = [0] * bucket_count
+        self.db_duration = 0.0
+        self.queries = 0
+        self.max_queries = 0
+        self.duplicates = 0
+        self.over_budget = 0
+
+
+class MetricsRegistry:
+    """
+    Per-process totals by view, rendered in the Prometheus text format.
+    Every worker process keeps its own totals, the way the Prometheus
+    client library does without its multiprocess mode.
+    """
+    duration_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, view, duration, recorder, over_budget):
+        with self._lock:
+            metrics = self._views.get(view)
+            if metrics is None:
+                metrics = self._views[view] = ViewMetrics(len(self.duration_buckets))
+            metrics.requests += 1
+            metrics.duration += duration
+            for index, bound in enumerate(self.duration_buckets):
+                if duration <= bound:
+                    metrics.buckets[index] += 1
+            metrics.db_duration += recorder.duration
+            metrics.queries += recorder.count
+            metrics.max_queries = max(metrics.max_queries, recorder.count)
+            metrics.duplicates += recorder.duplicate_count
+            metrics.over_budget += over_budget
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                view: {slot: getattr(metrics, slot) for slot in ViewMetrics.__slots__}
+                for view, metrics in self._views.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+    def render_prometheus(self):
+        views = sorted(self.snapshot().items())
+        lines = []
+
+        def family(name, metric_type, help_text, samples):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            lines.extend(samples)
+
+        def label(view, **extra):
+            labels = {'view': view, **extra}
+            return '{' + ','.join(f'{key}="{value}"' for key, value in labels.items()) + '}'
+
+        family('http_view_requests_total', 'counter', 'Requests handled by the view.', [
+            f'http_view_requests_total{label(view)} {metrics["requests"]}' for view, metrics in views
+        ])
+        duration_samples = []
+        for view, metrics in views:
+            for bound, count in zip(self.duration_buckets, metrics['buckets']):
+                duration_samples.append(f'http_view_duration_seconds_bucket{label(view, le=bound)} {count}')
+            duration_samples.extend([
+                f'http_view_duration_seconds_bucket{label(view, le="+Inf")} {metrics["requests"]}',
+                f'http_view_duration_seconds_sum{label(view)} {metrics["duration"]:.6f}',
+                f'http_view_duration_seconds_count{label(view)} {metrics["requests"]}',
+            ])
+        family('http_view_duration_seconds', 'histogram', 'Wall time of the view, middleware included.',
+               duration_samples)
+        family('http_view_db_duration_seconds_total', 'counter', 'Time spent in database queries.', [
+            f'http_view_db_duration_seconds_total{label(view)} {metrics["db_duration"]:.6f}' for view, metrics in views
+        ])
+        family('http_view_db_queries_total', 'counter', 'Database queries run by the view.', [
+            f'http_view_db_queries_total{label(view)} {metrics["queries"]}' for view, metrics in views
+        ])
+        family('http_view_db_queries_max', 'gauge', 'Most queries run by a single request.', [
+            f'http_view_db_queries_max{label(view)} {metrics["max_queries"]}' for view, metrics in views
+        ])
+        family('http_view_duplicate_queries_total', 'counter',
+               'Queries repeating the fingerprint of an earlier query of the same request.', [
+                   f'http_view_duplicate_queries_total{label(view)} {metrics["duplicates"]}' for view, metrics in views
+               ])
+        family('http_view_query_budget_exceeded_total', 'counter', 'Requests over the query budget of the view.', [
+            f'http_view_query_budget_exceeded_total{label(view)} {metrics["over_budget"]}' for view, metrics in views
+        ])
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
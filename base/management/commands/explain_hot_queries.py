@@ -0,0 +1,119 @@
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+
+from accounts.models import User
+from accounts.services import AccountService, ReportingHierarchyService, ReportingLineService
+from accounts.views import EmployeeListCreateView
+from base.constants import EmployeeRoles
+from leave_management.models import LeaveRequest
+from leave_management.services import (
+    LeaveApprovalQueueService,
+    LeaveBalanceService,
+    LeaveCalendarService,
+    LeaveOverlapService,
+    LeaveRequestService,
+    LeaveTypeService,
+)
+from leave_management.views import LeaveApprovalInboxAPIView, LeaveRequestCreateAPIView
+
+
+class Command(BaseCommand):
+    help = 'Print the database query plan of the queries issued by the account and leave services'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--analyze', action='store_true', help='Run the queries too (PostgreSQL only)')
+
+    def as_exists(self, queryset):
+        # What exists() runs: no ordering, one row.
+        return queryset.order_by()[:1]
+
+    def get_hot_queries(self):
+        """
+        The querysets are built by the same service methods the endpoints
+        call, so the plans follow any change to the queries.
+        """
+        user = User.active_objects.exclude(role__name=EmployeeRoles.CEO).first() or User.active_objects.first()
+        user = user or User(id=0, email='', supervisor_id=0)
+        leave_request = LeaveRequest.active_objects.first() or LeaveRequest(
+            id=0, employee_id=0, leave_type_id=0, start_date=date.today(), end_date=date.today()
+        )
+        request = SimpleNamespace(user=user)
+        page_size = 10
+
+        return [
+            ('AccountService.get_user', AccountService._get_user_queryset(user.id)),
+            (
+                'AccountService._validate_unique_email',
+                self.as_exists(AccountService._get_duplicate_emails(user.email, user.id)),
+            ),
+            (
+                'AccountService._validate_duplicate_ceo_employee',
+                self.as_exists(AccountService._get_duplicate_ceos(user.role_id, user.id)),
+            ),
+            (
+                'AccountService._validate_employee_existing_reportees',
+                self.as_exists(AccountService._get_active_reportees(user.id)),
+            ),
+            (
+                'AccountService._validate_reporting_line_cycle',
+                self.as_exists(ReportingHierarchyService.get_link(user.supervisor_id, user.id)),
+            ),
+            (
+                'EmployeeListCreateView.get',
+                EmployeeListCreateView.serializer_class.setup_eager_loading(AccountService.get_employees())[
+                    :page_size
+                ],
+            ),
+            (
+                'ReportingHierarchyService.get_ancestors',
+                ReportingHierarchyService.get_ancestors(user.id, include_self=True).select_related('role'),
+            ),
+            ('ReportingHierarchyService.get_descendants', ReportingHierarchyService.get_descendants(user.id)),
+            ('ReportingLineService.get_full_company_hierarchy', ReportingLineService.get_hierarchy_rows()),
+            (
+                'LeaveRequestService.get_leave_request',
+                LeaveRequestService._get_leave_request_queryset(leave_request.id),
+            ),
+            (
+                'LeaveRequestService.get_leave_requests',
+                LeaveRequestCreateAPIView.serializer_class.setup_eager_loading(
+                    LeaveRequestService.get_leave_requests(request)
+                )[:page_size],
+            ),
+            (
+                'LeaveOverlapService.get_overlapping_requests',
+                LeaveOverlapService.get_overlapping_requests(user.id, leave_request.start_date, leave_request.end_date),
+            ),
+            (
+                'LeaveRequestService._get_approval_flows',
+                LeaveRequestService._get_approval_flow_queryset([leave_request.id]),
+            ),
+            (
+                'LeaveTypeService.delete_leave_type',
+                self.as_exists(LeaveTypeService.get_open_leave_requests(leave_request.leave_type_id)),
+            ),
+            (
+                'LeaveCalendarService.get_calendar',
+                LeaveCalendarService.get_calendar_rows(
+                    LeaveCalendarService.get_scope_filter(request), date.today(), date.today() + timedelta(days=30)
+                ),
+            ),
+            ('LeaveBalanceService.get_balances', LeaveBalanceService.get_days_used(user.id, date.today().year)),
+            (
+                'LeaveApprovalQueueService.get_inbox',
+                LeaveApprovalInboxAPIView.serializer_class.setup_eager_loading(
+                    LeaveApprovalQueueService.get_inbox(user)
+                )[:page_size],
+            ),
+        ]
+
+    def handle(self, *args, **options):
+        explain_options = {'analyze': True} if options['analyze'] else {}
+        for name, queryset in self.get_hot_queries():
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            if options['verbosity'] > 1:
+                self.stdout.write(str(queryset.query))
+            self.stdout.write(queryset.explain(**explain_options))
+            self.stdout.write('')
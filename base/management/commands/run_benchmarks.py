@@ -0,0 +1,225 @@
+import io
+import json
+import platform
+import statistics
+import time
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.authentication import ClaimsJWTAuthentication
+from accounts.cache import HierarchyCache
+from accounts.models import User
+from base.constants import ApprovalQueueStatus, EmployeeRoles, LeaveApprovalStatus
+from base.instrumentation import QueryRecorder
+from leave_management.models import LeaveApprovalQueue
+
+PASSWORD = 'Benchmark@Password1'
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a synthetic organisation in a throwaway test database at each size and report the latency and '
+        'queries per request of the main endpoints, compared with the stored baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                            help='Numbers of employees to benchmark with')
+        parser.add_argument('--iterations', type=int, default=30, help='Timed requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=3, help='Untimed requests per endpoint first')
+        parser.add_argument('--scenario', action='append', help='Endpoint to benchmark, all by default')
+        parser.add_argument('--depth', type=int, default=4, help='Levels of the synthetic reporting tree')
+        parser.add_argument('--leave-per-employee', type=int, default=4)
+        parser.add_argument('--baseline', default=str(settings.BASE_DIR / 'benchmarks' / 'baseline.json'))
+        parser.add_argument('--save-baseline', action='store_true', help='Store the results as the new baseline')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Slowdown of the p95 latency over the baseline reported as a regression')
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        baseline = self.load_baseline(options['baseline'])
+        results = {}
+        setup_test_environment()
+        # A configured replica becomes a mirror of the test primary.
+        old_config = setup_databases(verbosity=0, interactive=False, serialized_aliases=set())
+        try:
+            for size in options['sizes']:
+                results[str(size)] = self.run_size(size, options)
+                self.report(size, results[str(size)], baseline.get('results', {}).get(str(size), {}), options)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        regressions = [
+            f'{size} employees, {name}: {message}'
+            for size, scenarios in results.items()
+            for name, result in scenarios.items()
+            for message in self.get_regressions(result, baseline.get('results', {}).get(size, {}).get(name), options)
+        ]
+        if options['save_baseline']:
+            self.save_baseline(options['baseline'], baseline, results)
+            self.stdout.write(self.style.SUCCESS(f'Baseline saved to {options["baseline"]}.'))
+        if regressions:
+            for regression in regressions:
+                self.stderr.write(self.style.ERROR(f'Regression: {regression}'))
+            if options['fail_on_regression']:
+                raise CommandError(f'{len(regressions)} regressions against {options["baseline"]}')
+
+    def run_size(self, size, options):
+        call_command('flush', interactive=False, verbosity=0)
+        cache.clear()
+        started = time.perf_counter()
+        call_command(
+            'seed_synthetic_org', employees=size, depth=options['depth'],
+            leave_per_employee=options['leave_per_employee'], password=PASSWORD, stdout=io.StringIO(),
+        )
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{size} employees (seeded in {time.perf_counter() - started:.1f}s)'
+        ))
+
+        scenarios = self.get_scenarios(options['iterations'] + options['warmup'])
+        results = {}
+        for name, (before, send) in scenarios.items():
+            if options['scenario'] and name not in options['scenario']:
+                continue
+            results[name] = self.measure(name, before, send, options['iterations'], options['warmup'])
+        return results
+
+    def get_scenarios(self, requests):
+        """
+        ``{name: (before, send)}``: ``send(iteration)`` makes one request;
+        ``before(iteration)``, when set, runs untimed ahead of it.
+        """
+        client = Client()
+        ceo = User.active_objects.get(role__name=EmployeeRoles.CEO)
+        branch_head = User.active_objects.filter(supervisor=ceo).order_by('id').first()
+        employee = User.active_objects.filter(role__name=EmployeeRoles.EMPLOYEE).order_by('-id').first()
+        approvals = list(
+            LeaveApprovalQueue.objects.filter(status=ApprovalQueueStatus.PENDING, step=1)
+            .order_by('leave_request_id').values_list('leave_request_id', 'approver_id')[:requests]
+        )
+        if not approvals:
+            raise CommandError('The synthetic organisation has no pending leave request to approve')
+        approvers = User.active_objects.in_bulk({approver_id for _, approver_id in approvals})
+        headers = {
+            user.id: {'Authorization': f'Bearer {ClaimsJWTAuthentication.get_token(user).access_token}'}
+            for user in [ceo, branch_head, *approvers.values()]
+        }
+
+        def approve(iteration):
+            # Once every request is decided, flip the decisions on the next rounds.
+            leave_request_id, approver_id = approvals[iteration % len(approvals)]
+            approval_status = [LeaveApprovalStatus.APPROVED, LeaveApprovalStatus.DECLINED][
+                iteration // len(approvals) % 2
+            ]
+            return client.put(
+                reverse('leave-request-approval', args=[leave_request_id]), {'approval_status': approval_status},
+                content_type='application/json', headers=headers[approver_id],
+            )
+
+        return {
+            'login': (None, lambda iteration: client.post(
+                reverse('login'), {'email': employee.email, 'password': PASSWORD}, content_type='application/json'
+            )),
+            'employee list': (None, lambda iteration: client.get(
+                reverse('employee_list_create'), headers=headers[ceo.id]
+            )),
+            'reporting line': (None, lambda iteration: client.get(
+                reverse('employee_detail', args=[employee.id]), headers=headers[ceo.id]
+            )),
+            'company hierarchy': (None, lambda iteration: client.get(
+                reverse('company_hierarchy'), headers=headers[ceo.id]
+            )),
+            'company hierarchy (cold)': (lambda iteration: HierarchyCache.invalidate(), lambda iteration: client.get(
+                reverse('company_hierarchy'), headers=headers[ceo.id]
+            )),
+            'leave list': (None, lambda iteration: client.get(
+                reverse('leave-request-create'), headers=headers[branch_head.id]
+            )),
+            'leave approval': (None, approve),
+        }
+
+    def measure(self, name, before, send, iterations, warmup):
+        durations = []
+        queries = []
+        for iteration in range(warmup + iterations):
+            if before:
+                before(iteration)
+            recorder = QueryRecorder()
+            with ExitStack() as stack:
+                # Reads may go to a replica.
+                for database in connections.all():
+                    stack.enter_context(database.execute_wrapper(recorder))
+                started = time.perf_counter()
+                response = send(iteration)
+                duration = time.perf_counter() - started
+            if response.status_code >= 400:
+                raise CommandError(f'{name} returned {response.status_code}: {response.content[:500]!r}')
+            if iteration >= warmup:
+                durations.append(duration * 1000)
+                queries.append(recorder.count)
+
+        cut_points = statistics.quantiles(durations, n=20, method='inclusive') if len(durations) > 1 else durations
+        return {
+            'p50_ms': round(statistics.median(durations), 2),
+            'p95_ms': round(cut_points[-1], 2),
+            'queries': round(statistics.mean(queries), 1),
+            'max_queries': max(queries),
+        }
+
+    def get_regressions(self, result, baseline, options):
+        if not baseline:
+            return []
+        regressions = []
+        if result['p95_ms'] > baseline['p95_ms'] * (1 + options['tolerance']):
+            regressions.append(f'p95 {result["p95_ms"]:.1f}ms, baseline {baseline["p95_ms"]:.1f}ms')
+        if result['max_queries'] > baseline['max_queries']:
+            regressions.append(f'{result["max_queries"]} queries, baseline {baseline["max_queries"]}')
+        return regressions
+
+    def report(self, size, results, baseline, options):
+        self.stdout.write(f'{"endpoint":<26}{"p50 ms":>10}{"p95 ms":>10}{"queries":>9}{"max":>5}{"baseline p95":>14}')
+        for name, result in results.items():
+            previous = baseline.get(name)
+            line = (
+                f'{name:<26}{result["p50_ms"]:>10.1f}{result["p95_ms"]:>10.1f}'
+                f'{result["queries"]:>9.1f}{result["max_queries"]:>5}'
+                f'{previous["p95_ms"] if previous else "-":>14}'
+            )
+            if self.get_regressions(result, previous, options):
+                line = self.style.ERROR(line)
+            self.stdout.write(line)
+
+    def load_baseline(self, path):
+        try:
+            with open(path, encoding='utf-8') as stream:
+                return json.load(stream)
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            raise CommandError(f'Unable to read the baseline {path}: {e}')
+
+    def save_baseline(self, path, baseline, results):
+        """
+        Replaces the baseline of the sizes just measured and keeps the others.
+        """
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        baseline = {
+            'recorded_at': timezone.now().isoformat(timespec='seconds'),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'results': {**baseline.get('results', {}), **results},
+        }
+        with open(path, 'w', encoding='utf-8') as stream:
+            json.dump(baseline, stream, indent=2, sort_keys=True)
+            stream.write('\n')
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from base.outbox import OutboxWorker
+
+
+class Command(BaseCommand):
+    help = 'Deliver the outbox events to the configured sinks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Stop once the outbox is drained')
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--workers', type=int, default=4, help='Threads delivering the events of a batch')
+        parser.add_argument('--max-attempts', type=int, default=None)
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to wait when the outbox is empty')
+        parser.add_argument('--dead-letters', action='store_true', help='List the dead events and exit')
+
+    def handle(self, *args, **options):
+        if options['dead_letters']:
+            for event in OutboxWorker.get_dead_letters():
+                self.stdout.write(f'#{event.id} {event.topic} after {event.attempts} attempts: {event.last_error}')
+            return
+
+        worker = OutboxWorker(
+            batch_size=options['batch_size'],
+            max_workers=options['workers'],
+            max_attempts=options['max_attempts'],
+        )
+        try:
+            while True:
+                delivered, retried, dead = worker.process_batch()
+                if delivered or retried or dead:
+                    self.stdout.write(
+                        f'Outbox batch: {len(delivered)} delivered, {len(retried)} to retry, {len(dead)} dead.'
+                    )
+                for event in dead:
+                    self.stderr.write(self.style.ERROR(
+                        f'Dead letter #{event.id} {event.topic} after {event.attempts} attempts: {event.last_error}'
+                    ))
+                if delivered or retried or dead:
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS('Outbox worker stopped.'))
@@ -0,0 +1,232 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.cache import department_cache, role_cache
+from accounts.models import User
+from accounts.services import ReportingHierarchyService
+from base.constants import EmployeePositions, EmployeeRoles, LeaveApprovalStatus
+from leave_management.cache import leave_type_cache
+from leave_management.models import LeaveApprovalFlow, LeaveRequest, LeaveType
+from leave_management.services import LeaveApprovalQueueService, LeaveBalanceService, LeaveCalendarService
+
+FIRST_NAMES = ('Ada', 'Bola', 'Chidi', 'Dami', 'Efe', 'Funmi', 'Gbenga', 'Hauwa', 'Ife', 'Jide', 'Kemi', 'Lola')
+LAST_NAMES = ('Adeyemi', 'Bello', 'Chukwu', 'Danjuma', 'Eze', 'Fashola', 'Garba', 'Hassan', 'Ibrahim', 'Okafor')
+LEAVE_TYPES = (('Annual Leave', 20), ('Sick Leave', None), ('Casual Leave', 5))
+
+
+class Command(BaseCommand):
+    help = 'Generate a synthetic organisation with a reporting tree and leave history, for benchmarks'
+
+    # Reporting levels from the top for each supported depth; deeper trees
+    # would break the supervisor role rules.
+    level_roles = {
+        2: (EmployeeRoles.CEO, EmployeeRoles.EMPLOYEE),
+        3: (EmployeeRoles.CEO, EmployeeRoles.MANAGER, EmployeeRoles.EMPLOYEE),
+        4: (EmployeeRoles.CEO, EmployeeRoles.DIRECTOR, EmployeeRoles.MANAGER, EmployeeRoles.EMPLOYEE),
+    }
+    role_positions = {
+        EmployeeRoles.CEO: (EmployeePositions.CEO,),
+        EmployeeRoles.DIRECTOR: (EmployeePositions.Human_Resources_Manager, EmployeePositions.Marketing_Manager),
+        EmployeeRoles.MANAGER: (EmployeePositions.Human_Resources_Manager, EmployeePositions.Marketing_Manager),
+        EmployeeRoles.EMPLOYEE: (
+            EmployeePositions.Software_Developer, EmployeePositions.Customer_Service_Representative,
+        ),
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=1000, help='Employees to create below the CEO')
+        parser.add_argument('--depth', type=int, choices=sorted(self.level_roles), default=4,
+                            help='Levels of the reporting tree, the CEO included')
+        parser.add_argument('--leave-per-employee', type=int, default=4, help='Leave requests per employee')
+        parser.add_argument('--pending-ratio', type=float, default=0.25,
+                            help='Share of employees whose latest leave request is still pending')
+        parser.add_argument('--email-domain', default='synthetic.example')
+        parser.add_argument('--password', default='Synthetic@Password1', help='Password of every generated user')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, for reproducible data')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['employees'] < options['depth'] - 1:
+            raise CommandError(f'--employees must be at least {options["depth"] - 1} to fill {options["depth"]} levels')
+        domain = options['email_domain']
+        if User.objects.filter(email__endswith=f'@{domain}').exists():
+            raise CommandError(f'Users @{domain} already exist; flush the database or pick another --email-domain')
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.domain = domain
+        self.password = make_password(options['password'])
+        call_command('seed_roles', stdout=self.stdout)
+        call_command('seed_departments', stdout=self.stdout)
+        self.roles = {role.name: role.id for role in role_cache.all()}
+        self.department_ids = sorted(department.id for department in department_cache.all())
+
+        with transaction.atomic():
+            users = self.create_users(options['employees'], self.level_roles[options['depth']])
+            links = ReportingHierarchyService.rebuild()
+            leave_requests = self.create_leave_history(
+                users, options['leave_per_employee'], options['pending_ratio']
+            )
+            leave_days = LeaveCalendarService.rebuild()
+            LeaveBalanceService.rebuild()
+            queue_entries = LeaveApprovalQueueService.rebuild()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(users) - 1} employees over {options["depth"]} levels ({links} reporting links) and '
+            f'{leave_requests} leave requests ({leave_days} leave days, {queue_entries} inbox entries).'
+        ))
+
+    def get_level_sizes(self, employees, levels):
+        """
+        Splits the employees over the levels below the CEO with the same span
+        of control at each level, the last level taking the rest.
+        """
+        span = max(2, round(employees ** (1 / levels)))
+        sizes = []
+        remaining = employees
+        for level in range(1, levels):
+            size = min(span ** level, remaining - (levels - level))
+            sizes.append(max(1, size))
+            remaining -= sizes[-1]
+        return sizes + [remaining]
+
+    def build_user(self, index, role_name, supervisor, department_id):
+        email = f'user{index}@{self.domain}'
+        return User(
+            email=email,
+            username=email,
+            first_name=self.rng.choice(FIRST_NAMES),
+            last_name=self.rng.choice(LAST_NAMES),
+            position=self.rng.choice(self.role_positions[role_name]),
+            role_id=self.roles[role_name],
+            department_id=department_id,
+            supervisor_id=supervisor.id if supervisor else None,
+            password=self.password,
+        )
+
+    def get_ceo(self):
+        ceo = User.active_objects.filter(role_id=self.roles[EmployeeRoles.CEO]).first()
+        if ceo is None:
+            ceo = self.build_user(0, EmployeeRoles.CEO, None, None)
+            ceo.is_staff = ceo.is_superuser = True
+            ceo.save()
+        ceo.role_name = EmployeeRoles.CEO
+        return ceo
+
+    def create_users(self, employees, level_roles):
+        """
+        Returns the CEO and the created users, each with ``role_name``. Every
+        branch below the CEO belongs to one department.
+        """
+        ceo = self.get_ceo()
+        users = [ceo]
+        parents = [ceo]
+        index = 0
+        for role_name, size in zip(level_roles[1:], self.get_level_sizes(employees, len(level_roles) - 1)):
+            level = []
+            for position in range(size):
+                index += 1
+                supervisor = parents[position % len(parents)]
+                department_id = getattr(supervisor, 'branch_department_id', None) or self.department_ids[
+                    position % len(self.department_ids)
+                ]
+                user = self.build_user(index, role_name, supervisor, department_id)
+                user.role_name = role_name
+                user.branch_department_id = department_id
+                level.append(user)
+            for start in range(0, len(level), self.batch_size):
+                User.objects.bulk_create(level[start:start + self.batch_size])
+            users.extend(level)
+            parents = level
+        return users
+
+    def get_leave_types(self):
+        leave_types = list(LeaveType.active_objects.order_by('id'))
+        if not leave_types:
+            leave_types = LeaveType.active_objects.bulk_create(
+                [LeaveType(name=name, annual_entitlement=entitlement) for name, entitlement in LEAVE_TYPES]
+            )
+            leave_type_cache.invalidate()
+        return leave_types
+
+    def build_leave_requests(self, user, count, pending_ratio, leave_types, today):
+        """
+        Non-overlapping requests going back in time from today; only the
+        latest one may still be pending.
+        """
+        leave_requests = []
+        end_date = today + timedelta(days=self.rng.randint(7, 60))
+        for number in range(count):
+            start_date = end_date - timedelta(days=self.rng.randint(0, 4))
+            if number == 0 and self.rng.random() < pending_ratio:
+                approval_status, action_on = LeaveApprovalStatus.PENDING, None
+            else:
+                approval_status = (
+                    LeaveApprovalStatus.APPROVED if self.rng.random() < 0.85 else LeaveApprovalStatus.DECLINED
+                )
+                action_on = timezone.now() - timedelta(days=(today - start_date).days + 3)
+            leave_requests.append(LeaveRequest(
+                employee_id=user.id,
+                leave_type_id=self.rng.choice(leave_types).id,
+                start_date=start_date,
+                end_date=end_date,
+                approval_status=approval_status,
+                action_on=action_on,
+                reason='Synthetic leave',
+            ))
+            end_date = start_date - timedelta(days=self.rng.randint(14, 120))
+        return leave_requests
+
+    def build_approval_flows(self, leave_request, user, users_by_id):
+        """
+        The decisions that led to the status of a decided request, following
+        the approval rules of ``LeaveRequestService.decide_approval``.
+        """
+        supervisor = users_by_id[user.supervisor_id]
+        approvers = [(supervisor, leave_request.approval_status)]
+        if user.role_name == EmployeeRoles.EMPLOYEE and supervisor.role_name == EmployeeRoles.MANAGER:
+            approvers = [
+                (supervisor, LeaveApprovalStatus.APPROVED),
+                (users_by_id[supervisor.supervisor_id], leave_request.approval_status),
+            ]
+        return [
+            LeaveApprovalFlow(
+                leave_request_id=leave_request.id,
+                approval_officer_id=approver.id,
+                role=approver.role_name,
+                approval_status=approval_status,
+                comment='Synthetic decision',
+            )
+            for approver, approval_status in approvers
+        ]
+
+    def create_leave_history(self, users, count, pending_ratio):
+        if count < 1:
+            return 0
+        leave_types = self.get_leave_types()
+        users_by_id = {user.id: user for user in users}
+        today = timezone.localdate()
+        created = 0
+        employees = [user for user in users if user.supervisor_id]
+        per_batch = max(1, self.batch_size // count)
+        for start in range(0, len(employees), per_batch):
+            batch = employees[start:start + per_batch]
+            leave_requests = []
+            for user in batch:
+                leave_requests.extend(self.build_leave_requests(user, count, pending_ratio, leave_types, today))
+            LeaveRequest.active_objects.bulk_create(leave_requests)
+            flows = [
+                flow
+                for leave_request in leave_requests
+                if leave_request.approval_status != LeaveApprovalStatus.PENDING
+                for flow in self.build_approval_flows(leave_request, users_by_id[leave_request.employee_id], users_by_id)
+            ]
+            LeaveApprovalFlow.active_objects.bulk_create(flows, batch_size=self.batch_size)
+            created += len(leave_requests)
+        return created
@@ -0,0 +1,156 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from base.instrumentation import QueryBudgetExceeded, QueryRecorder, logger, metrics
+from base.request_cache import RequestCache
+from base.routers import RecentWrites, reads_from
+
+
+class RequestCacheMiddleware:
+    """
+    Opens a fresh ``RequestCache`` for each request and drops it once the
+    response is ready. Runs natively under both WSGI and ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = RequestCache.start()
+        try:
+            return self.get_response(request)
+        finally:
+            RequestCache.end(token)
+
+    async def __acall__(self, request):
+        token = RequestCache.start()
+        try:
+            return await self.get_response(request)
+        finally:
+            RequestCache.end(token)
+
+
+class InstrumentationMiddleware:
+    """
+    Records the wall time, database time, query count and repeated query
+    fingerprints of each request under the name of the view that handled
+    it, such as ``EmployeeListCreateView.get``.
+
+    The totals are served by ``/api/_metrics`` and each response carries
+    them in a ``Server-Timing`` header. A view running more queries than its
+    ``QUERY_BUDGETS`` entry is logged, or fails the request when
+    ``QUERY_BUDGET_ACTION`` is ``'raise'`` (the default under tests).
+    Only enabled with ``INSTRUMENTATION_ENABLED``; the body of a streaming
+    response is produced after it has been measured.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.INSTRUMENTATION_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with recorder.record():
+            response = self.get_response(request)
+        return self.finish(request, response, recorder, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with recorder.record():
+            response = await self.get_response(request)
+        return self.finish(request, response, recorder, time.perf_counter() - started)
+
+    @staticmethod
+    def get_view_name(request):
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return 'unresolved'
+        view_class = getattr(match.func, 'view_class', None)
+        if view_class is None:
+            return match.func.__name__
+        return f'{view_class.__name__}.{request.method.lower()}'
+
+    def finish(self, request, response, recorder, duration):
+        view = self.get_view_name(request)
+        budget = settings.QUERY_BUDGETS.get(view)
+        over_budget = budget is not None and recorder.count > budget
+        metrics.record(view, duration, recorder, over_budget)
+
+        timing = (
+            f'app;dur={duration * 1000:.1f}, '
+            f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries"'
+        )
+        response['Server-Timing'] = f"{response['Server-Timing']}, {timing}" if response.has_header(
+            'Server-Timing'
+        ) else timing
+
+        if over_budget:
+            repeated = '; '.join(
+                f'{count}x {sql}' for sql, count in sorted(recorder.duplicates.items(), key=lambda item: -item[1])[:3]
+            )
+            message = f'{view} ran {recorder.count} queries, its budget is {budget}.'
+            if repeated:
+                message = f'{message} Repeated: {repeated}'
+            if settings.QUERY_BUDGET_ACTION == 'raise':
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Sends the reads of GET, HEAD and OPTIONS requests to the
+    ``REPLICA_DATABASE``, except for clients that sent a write request in the
+    last ``REPLICA_STICKY_SECONDS`` (see ``RecentWrites``), whose reads stay
+    on the primary. Only enabled when a replica is configured.
+    """
+    sync_capable = True
+    async_capable = True
+    safe_methods = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        if not settings.REPLICA_DATABASE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if request.method in self.safe_methods:
+            alias = None if RecentWrites.is_recent(request) else settings.REPLICA_DATABASE
+            with reads_from(alias):
+                return self.get_response(request)
+        try:
+            return self.get_response(request)
+        finally:
+            RecentWrites.mark(request)
+
+    async def __acall__(self, request):
+        if request.method in self.safe_methods:
+            alias = None if await RecentWrites.ais_recent(request) else settings.REPLICA_DATABASE
+            with reads_from(alias):
+                return await self.get_response(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            await RecentWrites.amark(request)
@@ -1,5 +1,7 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.utils import timezone
+from base.constants import OutboxEventStatus
 from base.managers import ActiveManager, DeletedManager
 
 
@@ -28,3 +30,27 @@ class BaseModel(models.Model):
     def force_delete(self):
         return super().delete()
 
+
+class OutboxEvent(models.Model):
+    """
+    A side effect to run after a change, written in the same transaction as
+    the change itself and delivered later by ``manage.py run_outbox_worker``.
+    ``available_at`` is when the event may next be claimed: after a retry
+    backoff, or once the lease of a worker that claimed it has run out.
+    """
+    topic = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=20, choices=OutboxEventStatus.choices, default=OutboxEventStatus.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='outbox_event_claim_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.topic} #{self.pk} ({self.status})'
@@ -0,0 +1,135 @@
+import json
+import logging
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from base.constants import OutboxEventStatus
+from base.models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+_file_sink_lock = threading.Lock()
+
+
+def console_sink(event):
+    sys.stdout.write(json.dumps(event, default=str) + '\n')
+
+
+def file_sink(event):
+    with _file_sink_lock, open(settings.OUTBOX_FILE_SINK_PATH, 'a', encoding='utf-8') as sink_file:
+        sink_file.write(json.dumps(event, default=str) + '\n')
+
+
+class OutboxService:
+    """
+    Records side effects as ``OutboxEvent`` rows. Call it inside the
+    transaction of the change the event describes, so both commit or roll
+    back together; nothing slow runs on the request thread.
+    """
+
+    @classmethod
+    def publish(cls, topic, payload):
+        return OutboxEvent.objects.create(topic=topic, payload=payload)
+
+    @classmethod
+    def publish_many(cls, events):
+        """
+        Records ``(topic, payload)`` pairs with a single insert.
+        """
+        return OutboxEvent.objects.bulk_create([OutboxEvent(topic=topic, payload=payload) for topic, payload in events])
+
+
+class OutboxWorker:
+    """
+    Drains the outbox in batches. Claimed events are leased for
+    ``lease_seconds`` so a crashed worker's batch is picked up again; sinks
+    run on a thread pool, failures are retried with exponential backoff and
+    events that keep failing are marked dead.
+    """
+
+    def __init__(self, sinks=None, batch_size=100, max_workers=4, max_attempts=None, lease_seconds=300,
+                 retry_delay_seconds=2):
+        self.sinks = [import_string(sink) if isinstance(sink, str) else sink for sink in (sinks or settings.OUTBOX_SINKS)]
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts or settings.OUTBOX_MAX_ATTEMPTS
+        self.lease_seconds = lease_seconds
+        self.retry_delay_seconds = retry_delay_seconds
+
+    def claim_batch(self):
+        now = timezone.now()
+        with transaction.atomic():
+            candidates = OutboxEvent.objects.filter(
+                status__in=[OutboxEventStatus.PENDING, OutboxEventStatus.PROCESSING],
+                available_at__lte=now,
+            ).order_by('available_at', 'id')
+            if connection.features.has_select_for_update_skip_locked:
+                candidates = candidates.select_for_update(skip_locked=True)
+            events = list(candidates[:self.batch_size])
+            OutboxEvent.objects.filter(id__in=[event.id for event in events]).update(
+                status=OutboxEventStatus.PROCESSING,
+                available_at=now + timedelta(seconds=self.lease_seconds),
+            )
+        return events
+
+    def deliver(self, event):
+        message = {
+            'id': event.id,
+            'topic': event.topic,
+            'payload': event.payload,
+            'created_at': event.created_at.isoformat(),
+            'attempt': event.attempts + 1,
+        }
+        for sink in self.sinks:
+            sink(message)
+
+    def _deliver_safely(self, event):
+        try:
+            self.deliver(event)
+        except Exception as exc:
+            logger.warning('Outbox event %s (%s) failed: %s', event.id, event.topic, exc)
+            return f'{type(exc).__name__}: {exc}'
+        return None
+
+    def process_batch(self):
+        """
+        Claims and delivers one batch. Returns ``(delivered, retried, dead)``
+        lists of events.
+        """
+        events = self.claim_batch()
+        if not events:
+            return [], [], []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            errors = list(executor.map(self._deliver_safely, events))
+
+        now = timezone.now()
+        delivered, retried, dead = [], [], []
+        for event, error in zip(events, errors):
+            event.attempts += 1
+            event.processed_at = now
+            event.last_error = error
+            if error is None:
+                event.status = OutboxEventStatus.DELIVERED
+                delivered.append(event)
+            elif event.attempts >= self.max_attempts:
+                event.status = OutboxEventStatus.DEAD
+                dead.append(event)
+            else:
+                event.status = OutboxEventStatus.PENDING
+                event.available_at = now + timedelta(seconds=self.retry_delay_seconds * 2 ** (event.attempts - 1))
+                retried.append(event)
+        OutboxEvent.objects.bulk_update(
+            events, ['status', 'attempts', 'available_at', 'last_error', 'processed_at'], batch_size=self.batch_size
+        )
+        return delivered, retried, dead
+
+    @classmethod
+    def get_dead_letters(cls):
+        return OutboxEvent.objects.filter(status=OutboxEventStatus.DEAD).order_by('id')
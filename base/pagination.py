@@ -1,6 +1,171 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 class CustomPagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = 'page_size'
-    max_page_size = 100
\ No newline at end of file
+    max_page_size = 100
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        ``paginate_queryset`` for async views, counting and fetching the page
+        with the async ORM.
+        """
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            number = paginator.validate_number(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+        bottom = (number - 1) * page_size
+        rows = [row async for row in queryset[bottom:bottom + page_size]]
+        self.page = paginator._get_page(rows, number, paginator)
+        return rows
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset pagination over ``(created_at, id)``, newest first, which is the
+    ``BaseModel`` ordering. Pages are fetched with a range condition instead
+    of an offset, so a deep page costs the same as the first one.
+
+    The total is skipped unless asked for: ``?count=exact`` counts every row
+    and ``?count=estimate`` stops counting at ``max_count``.
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    max_count = 1000
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.count, self.count_is_estimate = self.get_count(queryset, request)
+        direction, position, queryset = self.get_page_queryset(queryset, request)
+        return self.set_page(list(queryset[:self.page_size + 1]), direction, position)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.count, self.count_is_estimate = await self.aget_count(queryset, request)
+        direction, position, queryset = self.get_page_queryset(queryset, request)
+        return self.set_page([row async for row in queryset[:self.page_size + 1]], direction, position)
+
+    def get_page_queryset(self, queryset, request):
+        direction, position = self.decode_cursor(request)
+        if direction == 'previous':
+            queryset = queryset.order_by('created_at', 'id')
+            if position:
+                queryset = queryset.filter(
+                    Q(created_at__gt=position[0]) | Q(created_at=position[0], id__gt=position[1])
+                )
+        else:
+            queryset = queryset.order_by('-created_at', '-id')
+            if position:
+                queryset = queryset.filter(
+                    Q(created_at__lt=position[0]) | Q(created_at=position[0], id__lt=position[1])
+                )
+        return direction, position, queryset
+
+    def set_page(self, rows, direction, position):
+        has_more = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        if direction == 'previous':
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param], strict=True, cutoff=self.max_page_size
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param)
+        if mode == 'exact':
+            return queryset.count(), False
+        if mode == 'estimate':
+            count = queryset.order_by()[:self.max_count + 1].count()
+            return min(count, self.max_count), count > self.max_count
+        return None, False
+
+    async def aget_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param)
+        if mode == 'exact':
+            return await queryset.acount(), False
+        if mode == 'estimate':
+            count = await queryset.order_by()[:self.max_count + 1].acount()
+            return min(count, self.max_count), count > self.max_count
+        return None, False
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return 'next', None
+        try:
+            direction, created_at, pk = base64.urlsafe_b64decode(encoded.encode()).decode().split('|')
+            position = (parse_datetime(created_at), int(pk))
+        except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if direction not in ('next', 'previous') or position[0] is None:
+            raise NotFound(self.invalid_cursor_message)
+        return direction, position
+
+    def encode_cursor(self, direction, instance):
+        cursor = f'{direction}|{instance.created_at.isoformat()}|{instance.pk}'
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, base64.urlsafe_b64encode(cursor.encode()).decode())
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor('next', self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor('previous', self.page[0])
+
+    def get_paginated_response(self, data):
+        response = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+        if self.count is not None:
+            response.update({'count': self.count, 'count_is_estimate': self.count_is_estimate})
+        return Response(response)
+
+
+def get_paginator(view, request):
+    """
+    Returns the paginator for a list view: keyset pagination when the client
+    asks for ``?pagination=keyset``, the view's ``pagination_class`` otherwise.
+    """
+    if request.query_params.get('pagination') == 'keyset':
+        return KeysetPagination()
+    return view.pagination_class()
@@ -0,0 +1,103 @@
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from base.request_cache import RequestCache
+from base.routers import primary_reads
+
+
+class ReferenceDataCache:
+    """
+    Process-wide in-memory copy of a small, rarely changing table.
+
+    Active rows are kept for ``REFERENCE_DATA_CACHE_TTL`` seconds and are
+    reloaded early when the version stamp shared through Django's cache moves
+    on, which the owning app does on every save or soft delete. The stamp is
+    read once per request (see ``RequestCache``), so lookups within a request
+    cost no round trip to a shared cache.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.version_key = f'reference-data:{model._meta.label_lower}:version'
+        self._lock = threading.Lock()
+        self._rows = None
+        self._version = None
+        self._expires_at = 0
+
+    def __deepcopy__(self, memo):
+        # Shared by design; serializer fields deep copy their arguments.
+        return self
+
+    def _read_version(self):
+        version = cache.get(self.version_key)
+        if version is None:
+            cache.add(self.version_key, uuid.uuid4().hex, timeout=None)
+            version = cache.get(self.version_key)
+        return version
+
+    async def _aread_version(self):
+        version = await cache.aget(self.version_key)
+        if version is None:
+            await cache.aadd(self.version_key, uuid.uuid4().hex, timeout=None)
+            version = await cache.aget(self.version_key)
+        return version
+
+    def _current_version(self):
+        return RequestCache.get_or_load('reference_data_version', self.version_key, self._read_version)
+
+    async def _acurrent_version(self):
+        return await RequestCache.aget_or_load('reference_data_version', self.version_key, self._aread_version)
+
+    def _is_stale(self, version):
+        return self._rows is None or version != self._version or time.monotonic() >= self._expires_at
+
+    def _load(self):
+        version = self._current_version()
+        if self._is_stale(version):
+            with self._lock:
+                if self._is_stale(version):
+                    with primary_reads():
+                        self._rows = {row.pk: row for row in self.model.active_objects.all()}
+                    self._version = version
+                    self._expires_at = time.monotonic() + settings.REFERENCE_DATA_CACHE_TTL
+        return self._rows
+
+    async def _aload(self):
+        version = await self._acurrent_version()
+        if self._is_stale(version):
+            # The lock cannot be held across an await; a concurrent reload
+            # just stores the same rows.
+            with primary_reads():
+                rows = {row.pk: row async for row in self.model.active_objects.all()}
+            with self._lock:
+                self._rows = rows
+                self._version = version
+                self._expires_at = time.monotonic() + settings.REFERENCE_DATA_CACHE_TTL
+        return self._rows
+
+    def all(self):
+        return list(self._load().values())
+
+    def get(self, pk):
+        try:
+            return self._load().get(int(pk))
+        except (TypeError, ValueError):
+            return None
+
+    async def aall(self):
+        return list((await self._aload()).values())
+
+    async def aget(self, pk):
+        try:
+            pk = int(pk)
+        except (TypeError, ValueError):
+            return None
+        return (await self._aload()).get(pk)
+
+    def invalidate(self):
+        cache.set(self.version_key, uuid.uuid4().hex, timeout=None)
+        RequestCache.discard('reference_data_version', self.version_key)
@@ -0,0 +1,61 @@
+from contextvars import ContextVar
+
+_request_cache = ContextVar('request_cache', default=None)
+
+
+class RequestCache:
+    """
+    Identity map for lookups repeated within a single request.
+
+    The map only exists between ``start`` and ``end`` (see
+    ``base.middleware.RequestCacheMiddleware``); outside a request every
+    lookup goes straight to its loader.
+    """
+
+    @classmethod
+    def start(cls):
+        return _request_cache.set({})
+
+    @classmethod
+    def end(cls, token):
+        _request_cache.reset(token)
+
+    @classmethod
+    def get_or_load(cls, namespace, key, loader):
+        store = _request_cache.get()
+        if store is None:
+            return loader()
+        if (namespace, key) not in store:
+            store[(namespace, key)] = loader()
+        return store[(namespace, key)]
+
+    @classmethod
+    async def aget_or_load(cls, namespace, key, loader):
+        """
+        Same as ``get_or_load`` for a coroutine function ``loader``.
+        """
+        store = _request_cache.get()
+        if store is None:
+            return await loader()
+        if (namespace, key) not in store:
+            store[(namespace, key)] = await loader()
+        return store[(namespace, key)]
+
+    @classmethod
+    def peek(cls, namespace, key):
+        store = _request_cache.get()
+        if store is None:
+            return None
+        return store.get((namespace, key))
+
+    @classmethod
+    def set(cls, namespace, key, value):
+        store = _request_cache.get()
+        if store is not None:
+            store[(namespace, key)] = value
+
+    @classmethod
+    def discard(cls, namespace, key):
+        store = _request_cache.get()
+        if store is not None:
+            store.pop((namespace, key), None)
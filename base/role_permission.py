@@ -1,30 +1,55 @@
 from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
 from rest_framework.response import Response
 from rest_framework import status
 
+from accounts.services import AccountService
+
+
+def _is_forbidden(user, role, allowed_roles, allowed_positions):
+    return (allowed_roles and role and role.name not in allowed_roles) and \
+        (allowed_positions and user.position not in allowed_positions)
+
+
+def _forbidden_response():
+    return Response(
+        {"detail": "You do not have permission to perform this action."},
+        status=status.HTTP_403_FORBIDDEN
+    )
+
+
 def role_position_required(allowed_roles=None, allowed_positions=None):
     """
     Decorator to check if the user has the required role or position.
+    Works on both sync and async view methods.
     :param allowed_roles: List of roles that are allowed to access the view
     :param allowed_positions: List of positions that are allowed to access the view
     """
     def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def _async_wrapped_view(self, request, *args, **kwargs):
+                user = request.user
+                if not user.is_authenticated:
+                    return _forbidden_response()
+                role = await AccountService.aget_user_role(user)
+                if _is_forbidden(user, role, allowed_roles, allowed_positions):
+                    return _forbidden_response()
+                return await view_func(self, request, *args, **kwargs)
+
+            return _async_wrapped_view
+
         @wraps(view_func)
         def _wrapped_view(self, request, *args, **kwargs):
             user = request.user
             if user.is_authenticated:
-                if (allowed_roles and user.role and user.role.name not in allowed_roles) and \
-                   (allowed_positions and user.position not in allowed_positions):
-                    return Response(
-                        {"detail": "You do not have permission to perform this action."},
-                        status=status.HTTP_403_FORBIDDEN
-                    )
+                role = AccountService.get_user_role(user)
+                if _is_forbidden(user, role, allowed_roles, allowed_positions):
+                    return _forbidden_response()
                 return view_func(self, request, *args, **kwargs)
 
-            return Response(
-                {"detail": "You do not have permission to perform this action."},
-                status=status.HTTP_403_FORBIDDEN
-            )
+            return _forbidden_response()
 
         return _wrapped_view
 
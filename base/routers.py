@@ -0,0 +1,91 @@
+import hashlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+_read_database = ContextVar('read_database', default=None)
+
+
+@contextmanager
+def reads_from(alias):
+    """
+    Sends the reads of the current context to ``alias`` (``None`` for the
+    default routing). Context variables follow ``sync_to_async``, so this
+    also covers the queries of async views.
+    """
+    token = _read_database.set(alias)
+    try:
+        yield
+    finally:
+        _read_database.reset(token)
+
+
+def primary_reads():
+    """
+    For reads whose result outlives the request, such as cache fills keyed
+    by a version the primary has already moved on: a lagging replica would
+    pin stale rows under the new version.
+    """
+    return reads_from(DEFAULT_DB_ALIAS)
+
+
+class ReplicaRouter:
+    """
+    Read/write splitting: reads go wherever ``reads_from`` points them
+    (``ReplicaRoutingMiddleware`` points safe requests at the replica),
+    every write goes to the primary. Reads outside a request, such as
+    management commands and the outbox worker, stay on the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _read_database.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Without this, saving an instance read from the replica would write to it.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary.
+        return True
+
+
+class RecentWrites:
+    """
+    Remembers for ``REPLICA_STICKY_SECONDS`` that a client has just sent a
+    write request, so its next reads go to the primary and see their own
+    changes before the replica has caught up. Clients are told apart by a
+    hash of their ``Authorization`` header, or of their session cookie.
+    """
+    key = 'db:recent-write:{client}'
+
+    @classmethod
+    def get_key(cls, request):
+        credentials = request.headers.get('Authorization') or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        if not credentials:
+            return None
+        return cls.key.format(client=hashlib.sha256(credentials.encode()).hexdigest())
+
+    @classmethod
+    def mark(cls, request):
+        key = cls.get_key(request)
+        if key:
+            cache.set(key, True, timeout=settings.REPLICA_STICKY_SECONDS)
+
+    @classmethod
+    async def amark(cls, request):
+        key = cls.get_key(request)
+        if key:
+            await cache.aset(key, True, timeout=settings.REPLICA_STICKY_SECONDS)
+
+    @classmethod
+    def is_recent(cls, request):
+        key = cls.get_key(request)
+        return bool(key and cache.get(key))
+
+    @classmethod
+    async def ais_recent(cls, request):
+        key = cls.get_key(request)
+        return bool(key and await cache.aget(key))
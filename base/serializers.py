@@ -0,0 +1,43 @@
+from rest_framework import serializers
+
+
+class ReferenceDataRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Primary key field resolved against a ``ReferenceDataCache`` instead of a
+    query per validation.
+    """
+
+    def __init__(self, reference_data, **kwargs):
+        self.reference_data = reference_data
+        if not kwargs.get('read_only'):
+            kwargs.setdefault('queryset', reference_data.model.active_objects.all())
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        instance = self.reference_data.get(data)
+        if instance is None:
+            try:
+                int(data)
+            except (TypeError, ValueError):
+                self.fail('incorrect_type', data_type=type(data).__name__)
+            self.fail('does_not_exist', pk_value=data)
+        return instance
+
+
+class EagerLoadingMixin:
+    """
+    Lets a serializer declare the relations it reads, so that views can
+    shape their querysets with ``setup_eager_loading`` before serializing.
+    """
+    select_related_fields = ()
+    prefetch_related_fields = ()
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        if cls.select_related_fields:
+            queryset = queryset.select_related(*cls.select_related_fields)
+        if cls.prefetch_related_fields:
+            queryset = queryset.prefetch_related(*cls.prefetch_related_fields)
+        return queryset
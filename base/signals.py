@@ -0,0 +1,11 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from base.instrumentation import install_query_dispatcher
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    if settings.INSTRUMENTATION_ENABLED:
+        install_query_dispatcher(connection)
@@ -1,3 +1,315 @@
-from django.test import TestCase
+import io
+import unittest
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from accounts.models import ReportingHierarchy, Role, User
+from accounts.services import AccountService
+from base.constants import ApprovalQueueStatus, EmployeeRoles, LeaveApprovalStatus, OutboxEventStatus
+from base.instrumentation import QueryBudgetExceeded, QueryRecorder, fingerprint, metrics
+from base.management.commands.run_benchmarks import PASSWORD, Command as RunBenchmarksCommand
+from base.middleware import ReplicaRoutingMiddleware
+from base.models import OutboxEvent
+from base.outbox import OutboxService, OutboxWorker
+from base.reference_data import ReferenceDataCache
+from base.request_cache import RequestCache
+from base.routers import ReplicaRouter, primary_reads
+from leave_management.models import LeaveApprovalQueue, LeaveRequest
+
+
+class RequestCacheTest(SimpleTestCase):
+
+    def test_lookups_are_memoized_within_a_request(self):
+        calls = []
+        token = RequestCache.start()
+        try:
+            for _ in range(3):
+                RequestCache.get_or_load('role', 1, lambda: calls.append(1) or 'role')
+        finally:
+            RequestCache.end(token)
+        self.assertEqual(len(calls), 1)
+
+    def test_lookups_are_not_memoized_outside_a_request(self):
+        calls = []
+        for _ in range(3):
+            RequestCache.get_or_load('role', 1, lambda: calls.append(1) or 'role')
+        self.assertEqual(len(calls), 3)
+        self.assertIsNone(RequestCache.peek('role', 1))
+
+
+class ReferenceDataCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.reference_data = ReferenceDataCache(Role)
+
+    def test_rows_are_loaded_once(self):
+        role = Role.active_objects.create(name='CEO')
+        with self.assertNumQueries(1):
+            self.assertEqual(self.reference_data.get(role.id), role)
+            self.assertEqual(self.reference_data.all(), [role])
+            self.assertIsNone(self.reference_data.get('not-a-pk'))
+
+    def test_invalidation_reloads_rows(self):
+        self.assertEqual(self.reference_data.all(), [])
+        role = Role.active_objects.create(name='CEO')
+        self.reference_data.invalidate()
+        self.assertEqual(self.reference_data.get(role.id), role)
+
+    def test_version_is_read_once_per_request(self):
+        role = Role.active_objects.create(name='CEO')
+        token = RequestCache.start()
+        try:
+            with mock.patch('base.reference_data.cache.get', wraps=cache.get) as cache_get:
+                for _ in range(3):
+                    self.assertEqual(self.reference_data.get(role.id), role)
+                self.reference_data.all()
+            self.assertEqual(cache_get.call_count, 1)
+
+            renamed = Role.active_objects.get(pk=role.pk)
+            renamed.name = 'Chief Executive Officer'
+            renamed.save()
+            self.reference_data.invalidate()
+            self.assertEqual(self.reference_data.get(role.id).name, 'Chief Executive Officer')
+        finally:
+            RequestCache.end(token)
+
+    def test_rows_expire_after_ttl(self):
+        with override_settings(REFERENCE_DATA_CACHE_TTL=0):
+            self.reference_data.all()
+        with self.assertNumQueries(1):
+            self.reference_data.all()
+
+
+class DatabaseProfileTest(TestCase):
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', 'SQLite profile')
+    def test_sqlite_connections_are_tuned_for_concurrent_writers(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], connection.settings_dict['OPTIONS']['timeout'] * 1000)
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+
+
+@override_settings(REPLICA_DATABASE='replica', REPLICA_STICKY_SECONDS=10)
+class ReplicaRoutingTest(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+        self.routed_to = []
+
+    def get_response(self, request):
+        self.routed_to.append(self.router.db_for_read(User))
+        with primary_reads():
+            self.routed_to.append(self.router.db_for_read(User))
+        return HttpResponse()
+
+    async def aget_response(self, request):
+        return self.get_response(request)
+
+    def send(self, method, token='user-token'):
+        request = getattr(self.factory, method)('/api/employees/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        ReplicaRoutingMiddleware(self.get_response)(request)
+        routed_to, self.routed_to = self.routed_to, []
+        return routed_to[0]
+
+    def test_reads_of_safe_requests_go_to_the_replica(self):
+        self.assertEqual(self.send('get'), 'replica')
+        self.assertEqual(self.send('head'), 'replica')
+        self.assertEqual(self.send('post'), 'default')
+        self.assertEqual(self.router.db_for_read(User), 'default')
+
+    def test_cache_fills_read_from_the_primary(self):
+        ReplicaRoutingMiddleware(self.get_response)(self.factory.get('/api/employees/'))
+        self.assertEqual(self.routed_to, ['replica', 'default'])
+
+    def test_writes_always_go_to_the_primary(self):
+        user = User(id=1)
+        user._state.db = 'replica'
+        self.assertEqual(self.router.db_for_write(User, instance=user), 'default')
+
+    def test_reads_stick_to_the_primary_after_a_write(self):
+        self.send('put')
+        self.assertEqual(self.send('get'), 'default')
+        self.assertEqual(self.send('get', token='other-token'), 'replica')
+        with self.settings(REPLICA_STICKY_SECONDS=0):
+            self.send('put')
+        self.assertEqual(self.send('get'), 'replica')
+
+    async def test_async_requests_are_routed_the_same_way(self):
+        middleware = ReplicaRoutingMiddleware(self.aget_response)
+        await middleware(self.factory.post('/api/employees/', HTTP_AUTHORIZATION='Bearer user-token'))
+        await middleware(self.factory.get('/api/employees/', HTTP_AUTHORIZATION='Bearer user-token'))
+        await middleware(self.factory.get('/api/employees/', HTTP_AUTHORIZATION='Bearer other-token'))
+        self.assertEqual(self.routed_to[::2], ['default', 'default', 'replica'])
+
+
+class OutboxWorkerTest(TestCase):
+
+    def setUp(self):
+        self.delivered = []
+        OutboxService.publish_many([('test.ok', {'n': 1}), ('test.fail', {'n': 2}), ('test.ok', {'n': 3})])
+
+    def sink(self, event):
+        if event['topic'] == 'test.fail':
+            raise RuntimeError('sink is down')
+        self.delivered.append(event['payload']['n'])
+
+    def test_batch_delivers_and_schedules_retries(self):
+        worker = OutboxWorker(sinks=[self.sink], max_attempts=3)
+        delivered, retried, dead = worker.process_batch()
+        self.assertEqual(sorted(self.delivered), [1, 3])
+        self.assertEqual((len(delivered), len(retried), len(dead)), (2, 1, 0))
+
+        failed = OutboxEvent.objects.get(topic='test.fail')
+        self.assertEqual((failed.status, failed.attempts), (OutboxEventStatus.PENDING, 1))
+        self.assertEqual(failed.last_error, 'RuntimeError: sink is down')
+        # The retry is backed off, so the next batch is empty.
+        self.assertEqual(worker.process_batch(), ([], [], []))
+
+    def test_events_that_keep_failing_become_dead_letters(self):
+        worker = OutboxWorker(sinks=[self.sink], max_attempts=2, retry_delay_seconds=0)
+        worker.process_batch()
+        _, _, dead = worker.process_batch()
+        self.assertEqual([event.topic for event in dead], ['test.fail'])
+        self.assertEqual(list(OutboxWorker.get_dead_letters()), dead)
+
+    def test_expired_lease_is_claimed_again(self):
+        worker = OutboxWorker(sinks=[self.sink], lease_seconds=0)
+        self.assertEqual(len(worker.claim_batch()), 3)
+        self.assertEqual(len(worker.claim_batch()), 3)
+        self.assertEqual(len(OutboxWorker(sinks=[self.sink]).claim_batch()), 3)
+        self.assertEqual(OutboxWorker(sinks=[self.sink]).claim_batch(), [])
+
+
+class InstrumentationMiddlewareTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='user@email.com', username='user@email.com', position='CEO')
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('role-list'))
+        self.assertRegex(response['Server-Timing'], r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="1 queries"$')
+
+    def test_metrics_are_recorded_per_view(self):
+        self.client.get(reverse('role-list'))
+        self.client.get(reverse('role-list'))
+        response = self.client.get(reverse('metrics'))
+        body = response.content.decode()
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        self.assertIn('http_view_requests_total{view="RoleListAPIView.get"} 2', body)
+        self.assertIn('http_view_db_queries_total{view="RoleListAPIView.get"} 1', body)
+        self.assertIn('http_view_duration_seconds_count{view="RoleListAPIView.get"} 2', body)
+
+    @override_settings(INSTRUMENTATION_METRICS_TOKEN='secret')
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        response = self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer secret'})
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(QUERY_BUDGETS={'RoleListAPIView.get': 0})
+    def test_budget_exceeded_fails_under_tests(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'RoleListAPIView.get ran 1 queries, its budget is 0.'):
+            self.client.get(reverse('role-list'))
+        self.assertIn(
+            'http_view_query_budget_exceeded_total{view="RoleListAPIView.get"} 1', metrics.render_prometheus()
+        )
+
+    @override_settings(QUERY_BUDGETS={'RoleListAPIView.get': 0}, QUERY_BUDGET_ACTION='log')
+    def test_budget_exceeded_is_logged(self):
+        with self.assertLogs('base.instrumentation', 'WARNING'):
+            response = self.client.get(reverse('role-list'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_fingerprint_ignores_in_list_length(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s)'),
+            fingerprint('SELECT *  FROM t\nWHERE id IN (%s)'),
+        )
+
+    def test_repeated_queries_are_counted(self):
+        recorder = QueryRecorder()
+        with recorder.record():
+            for user_ids in ([self.user.id], [self.user.id, 0], [0]):
+                list(User.objects.filter(id__in=user_ids))
+        self.assertEqual(recorder.count, 3)
+        self.assertEqual(recorder.duplicate_count, 2)
+
+
+class SyntheticOrgBenchmarkTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        call_command(
+            'seed_synthetic_org', employees=40, depth=4, leave_per_employee=3, password=PASSWORD, stdout=io.StringIO()
+        )
+
+    def test_seeded_reporting_lines_follow_the_supervisor_rules(self):
+        users = {user.id: user for user in User.active_objects.select_related('role')}
+        self.assertEqual(len(users), 41)
+        self.assertEqual([user.role.name for user in users.values() if not user.supervisor_id], [EmployeeRoles.CEO])
+        for user in users.values():
+            if user.supervisor_id:
+                self.assertIn(
+                    users[user.supervisor_id].role.name, AccountService.supervisor_allowed_roles[user.role.name]
+                )
+        self.assertEqual(ReportingHierarchy.objects.filter(depth=0).count(), len(users))
+        self.assertEqual(max(ReportingHierarchy.objects.values_list('depth', flat=True)), 3)
+
+    def test_seeded_leave_history_has_an_inbox_entry_per_pending_request(self):
+        self.assertEqual(LeaveRequest.active_objects.count(), 40 * 3)
+        pending_ids = set(
+            LeaveRequest.active_objects.filter(approval_status=LeaveApprovalStatus.PENDING).values_list('id', flat=True)
+        )
+        self.assertTrue(pending_ids)
+        self.assertEqual(
+            set(
+                LeaveApprovalQueue.objects.filter(status=ApprovalQueueStatus.PENDING, step=1)
+                .values_list('leave_request_id', flat=True)
+            ),
+            pending_ids,
+        )
+
+    def test_seeding_twice_into_the_same_domain_fails(self):
+        with self.assertRaises(CommandError):
+            call_command('seed_synthetic_org', employees=5, stdout=io.StringIO())
+
+    def test_every_scenario_succeeds_and_regressions_are_reported(self):
+        command = RunBenchmarksCommand()
+        results = {
+            name: command.measure(name, before, send, iterations=2, warmup=0)
+            for name, (before, send) in command.get_scenarios(requests=2).items()
+        }
+        self.assertGreater(results['employee list']['max_queries'], 0)
+        options = {'tolerance': 0.25}
+        baseline = dict(results['leave list'])
+        self.assertEqual(command.get_regressions(results['leave list'], baseline, options), [])
+        baseline.update(p95_ms=results['leave list']['p95_ms'] / 2, max_queries=1)
+        self.assertEqual(len(command.get_regressions(results['leave list'], baseline, options)), 2)
+
+    def test_hot_queries_are_explained(self):
+        stdout = io.StringIO()
+        call_command('explain_hot_queries', stdout=stdout)
+        output = stdout.getvalue()
+        for name in ('LeaveCalendarService.get_calendar', 'LeaveBalanceService.get_balances',
+                     'LeaveApprovalQueueService.get_inbox', 'LeaveTypeService.delete_leave_type'):
+            self.assertIn(name, output)
@@ -0,0 +1,10 @@
+from django.db.models.base import DEFERRED
+
+
+def loaded_field_values(instance, fields):
+    """
+    The values of ``fields`` on a model instance, ``DEFERRED`` for the ones
+    not loaded. Read from ``__dict__`` so deferred fields are not loaded just
+    to be tracked.
+    """
+    return {field: instance.__dict__.get(field, DEFERRED) for field in fields}
@@ -1,3 +1,87 @@
-from django.shortcuts import render
+import inspect
 
-# Create your views here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.views import View
+from rest_framework import exceptions
+from rest_framework.views import APIView
+
+from base.instrumentation import metrics
+
+
+class AsyncAPIView(APIView):
+    """
+    ``APIView`` whose handlers are coroutines, served natively under ASGI.
+
+    Authentication uses an authenticator's ``aauthenticate`` when it has one
+    and runs ``authenticate`` in a thread otherwise. Permission and throttle
+    checks run inline, so they must not query the database. The response is
+    rendered before it is returned, leaving nothing for the handler to do in
+    a thread.
+    """
+
+    async def options(self, request, *args, **kwargs):
+        return super().options(request, *args, **kwargs)
+
+    async def perform_authentication(self, request):
+        for authenticator in request.authenticators:
+            authenticate = getattr(authenticator, 'aauthenticate', None) or sync_to_async(authenticator.authenticate)
+            try:
+                user_auth_tuple = await authenticate(request)
+            except exceptions.APIException:
+                request._not_authenticated()
+                raise
+            if user_auth_tuple is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth_tuple
+                return
+        request._not_authenticated()
+
+    async def initial(self, request, *args, **kwargs):
+        self.format_kwarg = self.get_format_suffix(**kwargs)
+        request.accepted_renderer, request.accepted_media_type = self.perform_content_negotiation(request)
+        request.version, request.versioning_scheme = self.determine_version(request, *args, **kwargs)
+        await self.perform_authentication(request)
+        self.check_permissions(request)
+        self.check_throttles(request)
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await self.initial(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            if inspect.isawaitable(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        if hasattr(self.response, 'render'):
+            self.response.render()
+        return self.response
+
+
+class MetricsView(View):
+    """
+    The totals of ``InstrumentationMiddleware`` in the Prometheus text
+    format, for this worker process only.
+    """
+
+    def get(self, request):
+        if not settings.INSTRUMENTATION_ENABLED:
+            raise Http404
+        token = settings.INSTRUMENTATION_METRICS_TOKEN
+        if token and not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return HttpResponse(status=401)
+        return HttpResponse(metrics.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class LeaveManagementConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'leave_management'
+
+    def ready(self):
+        from leave_management import signals  # noqa: F401
@@ -0,0 +1,8 @@
+from django.urls import path
+
+from leave_management.views import AsyncLeaveRequestListAPIView
+
+
+urlpatterns = [
+    path('', AsyncLeaveRequestListAPIView.as_view(), name='async-leave-request-list'),
+]
@@ -0,0 +1,4 @@
+from base.reference_data import ReferenceDataCache
+from leave_management.models import LeaveType
+
+leave_type_cache = ReferenceDataCache(LeaveType)
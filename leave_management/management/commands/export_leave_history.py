@@ -0,0 +1,38 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from base.exports import ExportWriter
+from leave_management.services import LeaveHistoryExportService
+
+
+class Command(BaseCommand):
+    help = 'Export the leave requests and their approval flows as CSV or JSON lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=ExportWriter.file_formats, default='csv')
+        parser.add_argument('--output', help='File to write to, standard output by default')
+        parser.add_argument('--start-date', type=datetime.date.fromisoformat, help='Requests ending on or after')
+        parser.add_argument('--end-date', type=datetime.date.fromisoformat, help='Requests starting on or before')
+        parser.add_argument('--employee-id', type=int)
+        parser.add_argument('--chunk-size', type=int, default=LeaveHistoryExportService.chunk_size)
+
+    def handle(self, *args, **options):
+        rows = LeaveHistoryExportService.iter_rows(
+            chunk_size=options['chunk_size'],
+            start_date=options['start_date'],
+            end_date=options['end_date'],
+            employee_id=options['employee_id'],
+        )
+        lines = ExportWriter.lines(
+            options['format'], LeaveHistoryExportService.columns, rows, LeaveHistoryExportService.csv_formatters()
+        )
+        if not options['output']:
+            for piece in lines:
+                self.stdout.write(piece, ending='')
+            return
+
+        with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+            for piece in lines:
+                output.write(piece)
+        self.stderr.write(self.style.SUCCESS(f"Leave history written to {options['output']}."))
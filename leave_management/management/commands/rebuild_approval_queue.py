@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from leave_management.services import LeaveApprovalQueueService
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the approval queue of the pending leave requests from the reporting lines and approval flows'
+
+    def handle(self, *args, **kwargs):
+        entries = LeaveApprovalQueueService.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Approval queue rebuilt with {entries} entries.'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from leave_management.services import LeaveBalanceService
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the leave balance ledger from the approved leave requests'
+
+    def handle(self, *args, **kwargs):
+        balances = LeaveBalanceService.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Leave balances rebuilt with {balances} balance rows.'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from leave_management.services import LeaveCalendarService
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-day leave calendar from the approved leave requests'
+
+    def handle(self, *args, **kwargs):
+        leave_days = LeaveCalendarService.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Leave calendar rebuilt with {leave_days} leave days.'))
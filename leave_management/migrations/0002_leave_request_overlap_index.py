@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leave_management', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='leaverequest',
+            name='leave_req_overlap_idx',
+        ),
+        migrations.AddIndex(
+            model_name='leaverequest',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['employee', 'approval_status', 'end_date', 'start_date'], name='leave_req_overlap_idx'),
+        ),
+    ]
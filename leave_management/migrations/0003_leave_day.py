@@ -0,0 +1,56 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:10
+
+import datetime
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_leave_days(apps, schema_editor):
+    LeaveRequest = apps.get_model('leave_management', 'LeaveRequest')
+    LeaveDay = apps.get_model('leave_management', 'LeaveDay')
+    approved_requests = LeaveRequest._default_manager.filter(
+        is_active=True,
+        approval_status='Approved',
+        employee__isnull=False,
+        start_date__isnull=False,
+        end_date__isnull=False,
+    ).values_list('id', 'employee_id', 'start_date', 'end_date')
+    LeaveDay.objects.bulk_create(
+        (
+            LeaveDay(
+                leave_request_id=leave_request_id,
+                employee_id=employee_id,
+                date=start_date + datetime.timedelta(days=offset),
+            )
+            for leave_request_id, employee_id, start_date, end_date in approved_requests.iterator()
+            for offset in range((end_date - start_date).days + 1)
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leave_management', '0002_leave_request_overlap_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaveDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leave_days', to=settings.AUTH_USER_MODEL)),
+                ('leave_request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leave_days', to='leave_management.leaverequest')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date', 'employee'], name='leave_day_date_employee_idx')],
+                'constraints': [models.UniqueConstraint(fields=('leave_request', 'date'), name='unique_leave_day')],
+            },
+        ),
+        migrations.RunPython(backfill_leave_days, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:12
+
+import datetime
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_leave_balances(apps, schema_editor):
+    LeaveRequest = apps.get_model('leave_management', 'LeaveRequest')
+    LeaveBalance = apps.get_model('leave_management', 'LeaveBalance')
+    totals = {}
+    approved_requests = LeaveRequest._default_manager.filter(
+        is_active=True,
+        approval_status='Approved',
+        employee__isnull=False,
+        leave_type__isnull=False,
+        start_date__isnull=False,
+        end_date__isnull=False,
+    ).values_list('employee_id', 'leave_type_id', 'start_date', 'end_date')
+    for employee_id, leave_type_id, start_date, end_date in approved_requests.iterator():
+        while start_date <= end_date:
+            year_end = min(end_date, datetime.date(start_date.year, 12, 31))
+            key = (employee_id, leave_type_id, start_date.year)
+            totals[key] = totals.get(key, 0) + (year_end - start_date).days + 1
+            start_date = year_end + datetime.timedelta(days=1)
+    LeaveBalance.objects.bulk_create(
+        [
+            LeaveBalance(employee_id=employee_id, leave_type_id=leave_type_id, year=year, days_used=days_used)
+            for (employee_id, leave_type_id, year), days_used in totals.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leave_management', '0003_leave_day'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='leavetype',
+            name='annual_entitlement',
+            field=models.PositiveIntegerField(blank=True, help_text='Days per employee per calendar year; empty for unlimited.', null=True),
+        ),
+        migrations.CreateModel(
+            name='LeaveBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('days_used', models.IntegerField(default=0)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leave_balances', to=settings.AUTH_USER_MODEL)),
+                ('leave_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leave_balances', to='leave_management.leavetype')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('employee', 'year', 'leave_type'), name='unique_leave_balance')],
+            },
+        ),
+        migrations.RunPython(backfill_leave_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leave_management', '0004_leave_balance'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaveApprovalQueue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('step', models.PositiveSmallIntegerField()),
+                ('status', models.CharField(choices=[('Waiting', 'Waiting'), ('Pending', 'Pending'), ('Actioned', 'Actioned'), ('Closed', 'Closed')], default='Pending', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('approver', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='approval_queue', to=settings.AUTH_USER_MODEL)),
+                ('leave_request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='approval_queue', to='leave_management.leaverequest')),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['approver', 'status', '-created_at', '-id'], name='approval_queue_inbox_idx')],
+                'constraints': [models.UniqueConstraint(fields=('leave_request', 'approver'), name='unique_approval_queue_approver')],
+            },
+        ),
+    ]
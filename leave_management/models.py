@@ -1,12 +1,15 @@
 from django.db import models
 from accounts.models import User
-from base.constants import LeaveApprovalStatus, EmployeeRoles
+from base.constants import ApprovalQueueStatus, LeaveApprovalStatus, EmployeeRoles
 from base.models import BaseModel
 
 # Create your models here.
 class LeaveType(BaseModel):
     name = models.CharField(max_length=255)
     description = models.TextField(null=True, blank=True)
+    annual_entitlement = models.PositiveIntegerField(
+        null=True, blank=True, help_text='Days per employee per calendar year; empty for unlimited.'
+    )
 
     def __str__(self):
         return self.name
@@ -26,6 +29,25 @@ class LeaveRequest(BaseModel):
     action_on = models.DateTimeField(null=True, blank=True)
     reason = models.TextField(null=True, blank=True)
 
+    class Meta(BaseModel.Meta):
+        indexes = [
+            models.Index(
+                fields=['-created_at', '-id'], name='leave_req_active_created_idx', condition=models.Q(is_active=True)
+            ),
+            models.Index(
+                fields=['employee', '-created_at'], name='leave_req_employee_created_idx',
+                condition=models.Q(is_active=True)
+            ),
+            models.Index(
+                fields=['employee', 'approval_status', 'end_date', 'start_date'], name='leave_req_overlap_idx',
+                condition=models.Q(is_active=True)
+            ),
+            models.Index(
+                fields=['leave_type', 'approval_status'], name='leave_req_type_status_idx',
+                condition=models.Q(is_active=True)
+            ),
+        ]
+
     def __str__(self):
         return f'{self.leave_type.name} - {self.start_date} - {self.end_date}'
 
@@ -39,6 +61,18 @@ class LeaveApprovalFlow(BaseModel):
     comment = models.TextField(null=True, blank=True)
     action_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta(BaseModel.Meta):
+        indexes = [
+            models.Index(
+                fields=['leave_request', 'approval_officer', 'approval_status'], name='approval_flow_officer_idx',
+                condition=models.Q(is_active=True)
+            ),
+            models.Index(
+                fields=['leave_request', 'role', 'approval_status'], name='approval_flow_role_idx',
+                condition=models.Q(is_active=True)
+            ),
+        ]
+
     def __str__(self):
         return f'{self.leave_request} - {self.approval_status}'
 
@@ -49,3 +83,72 @@ class LeaveApprovalFlow(BaseModel):
 
 
 
+
+
+class LeaveDay(models.Model):
+    """
+    One row per employee per calendar day covered by an approved leave
+    request, so "who is out on these days" is a single indexed range read
+    instead of expanding every request. Maintained by
+    ``leave_management.services.LeaveCalendarService``.
+    """
+    leave_request = models.ForeignKey(LeaveRequest, on_delete=models.CASCADE, related_name='leave_days')
+    employee = models.ForeignKey(User, on_delete=models.CASCADE, related_name='leave_days')
+    date = models.DateField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['leave_request', 'date'], name='unique_leave_day'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'employee'], name='leave_day_date_employee_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.employee_id} - {self.date}'
+
+
+class LeaveBalance(models.Model):
+    """
+    Days of approved leave an employee has used per leave type and calendar
+    year, so a balance is a single row read. Maintained by
+    ``leave_management.services.LeaveBalanceService``.
+    """
+    employee = models.ForeignKey(User, on_delete=models.CASCADE, related_name='leave_balances')
+    leave_type = models.ForeignKey(LeaveType, on_delete=models.CASCADE, related_name='leave_balances')
+    year = models.PositiveSmallIntegerField()
+    days_used = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['employee', 'year', 'leave_type'], name='unique_leave_balance'),
+        ]
+
+    def __str__(self):
+        return f'{self.employee_id} - {self.leave_type_id} - {self.year}: {self.days_used}'
+
+
+class LeaveApprovalQueue(models.Model):
+    """
+    The approvers of each leave request in reporting line order, with whether
+    the request is waiting on them, so an approver's inbox is a single indexed
+    read. Maintained by ``leave_management.services.LeaveApprovalQueueService``.
+    """
+    leave_request = models.ForeignKey(LeaveRequest, on_delete=models.CASCADE, related_name='approval_queue')
+    approver = models.ForeignKey(User, on_delete=models.CASCADE, related_name='approval_queue')
+    step = models.PositiveSmallIntegerField()
+    status = models.CharField(max_length=20, choices=ApprovalQueueStatus.choices, default=ApprovalQueueStatus.PENDING)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        constraints = [
+            models.UniqueConstraint(fields=['leave_request', 'approver'], name='unique_approval_queue_approver'),
+        ]
+        indexes = [
+            models.Index(fields=['approver', 'status', '-created_at', '-id'], name='approval_queue_inbox_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.leave_request_id} - {self.approver_id} ({self.status})'
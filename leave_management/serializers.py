@@ -1,9 +1,15 @@
 from random import choices
 
+from django.db import transaction
 from rest_framework import serializers
 
-from base.constants import LeaveApprovalStatus
-from leave_management.models import LeaveType, LeaveRequest
+from base.constants import LeaveApprovalStatus, LeaveEventTopics
+from base.exports import ExportWriter
+from base.outbox import OutboxService
+from base.serializers import EagerLoadingMixin, ReferenceDataRelatedField
+from leave_management.cache import leave_type_cache
+from leave_management.models import LeaveType, LeaveRequest, LeaveApprovalQueue
+from leave_management.services import LeaveOverlapService, LeaveBalanceService, LeaveRequestService
 
 
 class LeaveTypeSerializer(serializers.ModelSerializer):
@@ -12,10 +18,10 @@ class LeaveTypeSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class LeaveRequestSerializer(serializers.ModelSerializer):
-    employee_id = serializers.IntegerField(source='employee.id', read_only=True)
+class LeaveRequestSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    employee_id = serializers.IntegerField(read_only=True)
     approval_status = serializers.ChoiceField(choices=LeaveApprovalStatus.choices, read_only=True)
-    leave_type = serializers.PrimaryKeyRelatedField(queryset=LeaveType.active_objects.all(), required=True)
+    leave_type = ReferenceDataRelatedField(leave_type_cache, required=True)
 
     class Meta:
         model = LeaveRequest
@@ -28,22 +34,84 @@ class LeaveRequestSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Start date must be before the end date.")
 
         employee = self.context['request'].user
-        overlapping_requests = LeaveRequest.active_objects.filter(
-            employee=employee,
-            start_date__lte=start_date,
-            end_date__gte=end_date,
-            approval_status__in=[LeaveApprovalStatus.PENDING, LeaveApprovalStatus.APPROVED]
-        )
-        if overlapping_requests.exists():
+        exclude_ids = [self.instance.id] if self.instance else None
+        if LeaveOverlapService.has_overlap(employee.id, start_date, end_date, exclude_ids):
             raise serializers.ValidationError(
                 "You already have an approved or pending leave request within this time frame."
             )
+        LeaveBalanceService.validate_available_days(employee.id, data['leave_type'], start_date, end_date)
         data.update({
             "employee": employee,
         })
         return data
 
+    def create(self, validated_data):
+        with transaction.atomic():
+            leave_request = super().create(validated_data)
+            OutboxService.publish(LeaveEventTopics.SUBMITTED, LeaveRequestService.get_event_payload(leave_request))
+        return leave_request
+
+
+class LeaveRequestBatchItemSerializer(serializers.Serializer):
+    leave_type = ReferenceDataRelatedField(leave_type_cache, required=True)
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+    reason = serializers.CharField(required=False, allow_null=True, allow_blank=True)
+
+    def validate(self, data):
+        if data['start_date'] >= data['end_date']:
+            raise serializers.ValidationError("Start date must be before the end date.")
+        return data
+
+
+class LeaveRequestBatchSerializer(serializers.Serializer):
+    leave_requests = LeaveRequestBatchItemSerializer(many=True, min_length=1, max_length=50)
+
+
+class LeaveApprovalQueueSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('leave_request',)
+
+    leave_request = LeaveRequestSerializer(read_only=True)
+
+    class Meta:
+        model = LeaveApprovalQueue
+        fields = ['id', 'leave_request', 'step', 'status', 'created_at']
+
 
 class LeaveRequestApprovalSerializer(serializers.Serializer):
     approval_status = serializers.ChoiceField(choices=LeaveApprovalStatus.choices)
     comment = serializers.CharField(allow_blank=True, required=False)
+
+
+class LeaveRequestBatchApprovalSerializer(LeaveRequestApprovalSerializer):
+    leave_request_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), min_length=1, max_length=500
+    )
+
+
+class LeaveCalendarQuerySerializer(serializers.Serializer):
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+    department_id = serializers.IntegerField(required=False)
+    supervisor_id = serializers.IntegerField(required=False)
+
+    def validate(self, data):
+        if data.get('department_id') and data.get('supervisor_id'):
+            raise serializers.ValidationError("Filter by either a department or a supervisor, not both.")
+        return data
+
+
+class LeaveHistoryExportQuerySerializer(serializers.Serializer):
+    file_format = serializers.ChoiceField(choices=ExportWriter.file_formats, default='csv')
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+    employee_id = serializers.IntegerField(required=False)
+
+    def validate(self, data):
+        if data.get('start_date') and data.get('end_date') and data['start_date'] > data['end_date']:
+            raise serializers.ValidationError("Start date must not be after the end date.")
+        return data
+
+
+class LeaveBalanceQuerySerializer(serializers.Serializer):
+    year = serializers.IntegerField(required=False, min_value=1900, max_value=9999)
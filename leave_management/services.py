@@ -1,10 +1,31 @@
-from django.db.models import Q
+import datetime
+from bisect import bisect_right
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.base import DEFERRED
 from django.utils import timezone
-from rest_framework.exceptions import ValidationError
-
-from accounts.services import AccountService
-from base.constants import LeaveApprovalStatus, EmployeeRoles
-from leave_management.models import LeaveType, LeaveRequest, LeaveApprovalFlow
+from rest_framework.exceptions import PermissionDenied, ValidationError
+
+from accounts.cache import role_cache
+from accounts.models import ReportingHierarchy, User
+from accounts.services import AccountService, ReportingHierarchyService, VisibilityScopeService
+from base.constants import ApprovalQueueStatus, LeaveApprovalStatus, LeaveEventTopics, EmployeeRoles, EmployeePositions
+from base.exports import chunked
+from base.outbox import OutboxService
+from base.request_cache import RequestCache
+from base.utils import loaded_field_values
+from leave_management.cache import leave_type_cache
+from leave_management.models import (
+    LeaveType,
+    LeaveRequest,
+    LeaveApprovalFlow,
+    LeaveApprovalQueue,
+    LeaveDay,
+    LeaveBalance,
+)
 
 
 class LeaveTypeService:
@@ -39,100 +60,243 @@ class LeaveTypeService:
         leave_type.save()
         return leave_type
 
+    @classmethod
+    def get_open_leave_requests(cls, leave_type_id):
+        return LeaveRequest.active_objects.filter(
+            leave_type_id=leave_type_id,
+            approval_status__in=[LeaveApprovalStatus.APPROVED, LeaveApprovalStatus.PENDING]
+        )
+
     @classmethod
     def delete_leave_type(cls, leave_type_id):
         leave_type = cls.get_leave_types(leave_type_id)
-        if LeaveRequest.active_objects.filter(
-                leave_type_id=leave_type_id,
-                approval_status__in=[LeaveApprovalStatus.APPROVED, LeaveApprovalStatus.PENDING]
-            ).exists():
+        if cls.get_open_leave_requests(leave_type_id).exists():
             raise ValidationError(f"Cannot delete!, there are active leave requests on this leave type")
         leave_type.soft_delete()
 
 
+class LeaveOverlapService:
+    blocking_statuses = (LeaveApprovalStatus.PENDING, LeaveApprovalStatus.APPROVED)
+
+    @classmethod
+    def _overlap_filter(cls, start_date, end_date):
+        # Two inclusive ranges intersect when each one starts before the other ends.
+        return Q(start_date__lte=end_date, end_date__gte=start_date)
+
+    @classmethod
+    def _get_blocking_requests(cls, employee_id, exclude_ids=None):
+        queryset = LeaveRequest.active_objects.filter(
+            employee_id=employee_id,
+            approval_status__in=cls.blocking_statuses
+        )
+        if exclude_ids:
+            queryset = queryset.exclude(id__in=exclude_ids)
+        return queryset
+
+    @classmethod
+    def get_overlapping_requests(cls, employee_id, start_date, end_date, exclude_ids=None):
+        return cls._get_blocking_requests(employee_id, exclude_ids).filter(cls._overlap_filter(start_date, end_date))
+
+    @classmethod
+    def has_overlap(cls, employee_id, start_date, end_date, exclude_ids=None):
+        return cls.get_overlapping_requests(employee_id, start_date, end_date, exclude_ids).exists()
+
+    @classmethod
+    def find_overlaps(cls, employee_id, date_ranges, exclude_ids=None):
+        """
+        Check several (start_date, end_date) ranges of one employee with a single query.
+        Returns, for each range in order, ``{'requests': [...], 'ranges': [...]}``:
+        the existing requests it intersects and the positions of the other
+        ranges of the batch it intersects.
+        """
+        date_ranges = list(date_ranges)
+        if not date_ranges:
+            return []
+
+        query_filter = reduce(or_, (cls._overlap_filter(start, end) for start, end in date_ranges))
+        existing = list(
+            cls._get_blocking_requests(employee_id, exclude_ids)
+            .filter(query_filter)
+            .only('id', 'employee_id', 'leave_type_id', 'start_date', 'end_date', 'approval_status', 'is_active')
+            .order_by('start_date', 'id')
+        )
+        start_dates = [leave_request.start_date for leave_request in existing]
+        by_start = sorted(range(len(date_ranges)), key=lambda position: date_ranges[position][0])
+        proposed_start_dates = [date_ranges[position][0] for position in by_start]
+
+        overlaps = []
+        for position, (start_date, end_date) in enumerate(date_ranges):
+            # Only the ranges starting on or before end_date can intersect the range.
+            candidates = existing[:bisect_right(start_dates, end_date)]
+            proposed = by_start[:bisect_right(proposed_start_dates, end_date)]
+            overlaps.append({
+                'requests': [leave_request for leave_request in candidates if leave_request.end_date >= start_date],
+                'ranges': sorted(
+                    other for other in proposed if other != position and date_ranges[other][1] >= start_date
+                ),
+            })
+        return overlaps
+
+
 class LeaveRequestService(AccountService):
 
     @classmethod
     def get_leave_request(cls, request_id):
+        return RequestCache.get_or_load('leave_request', request_id, lambda: cls._load_leave_request(request_id))
+
+    @classmethod
+    def _get_leave_request_queryset(cls, request_id):
+        return LeaveRequest.active_objects.filter(id=request_id)
+
+    @classmethod
+    def _load_leave_request(cls, request_id):
         try:
-            return LeaveRequest.active_objects.get(id=request_id)
+            return cls._get_leave_request_queryset(request_id).get()
         except LeaveRequest.DoesNotExist:
             raise ValidationError(f'Request with ID {request_id} does not exists')
 
     @classmethod
     def get_leave_requests(cls, request):
-        user = request.user
-        user_role_name = cls._get_role(user.role.id).name
-        role_access_filters = {
-            EmployeeRoles.CEO: Q(),
-            EmployeeRoles.MANAGER: Q(employee__supervisor_id=user.id),
-            EmployeeRoles.DIRECTOR: Q(employee__supervisor_id=user.id) | Q(employee__supervisor__supervisor_id=user.id),
-            EmployeeRoles.EMPLOYEE: Q(employee_id=user.id),
-        }
-        query_filter = role_access_filters.get(user_role_name, Q(employee_id=user.id))
-        query_filter |= Q(employee_id=user.id)
-        return LeaveRequest.active_objects.filter(query_filter)
+        return LeaveRequest.active_objects.filter(VisibilityScopeService.get_scope_filter(request.user))
 
     @classmethod
-    def _validate_approval_status(cls, approval_status, leave_request_id, request):
-        if LeaveApprovalFlow.active_objects.filter(
-                leave_request_id=leave_request_id,
-                approval_status=approval_status,
-                approval_officer_id=request.user.id
-        ).exists():
-            raise ValidationError(f'You have already {approval_status} this leave request')
+    async def aget_leave_requests(cls, request):
+        return LeaveRequest.active_objects.filter(await VisibilityScopeService.aget_scope_filter(request.user))
 
     @classmethod
-    def _validate_manager_approval(cls, leave_request_id):
-        manager_approval_exists = LeaveApprovalFlow.active_objects.filter(
-            leave_request_id=leave_request_id,
-            role=EmployeeRoles.MANAGER,
-            approval_status=LeaveApprovalStatus.APPROVED
-        ).exists()
-        if not manager_approval_exists:
-            raise ValidationError("Pending Employee Manager Approval")
+    def submit_leave_requests(cls, employee, payloads):
+        """
+        Submits several leave requests of one employee, all or none. The
+        ranges are checked against the employee's requests and against each
+        other with a single query. Errors are keyed by the 0-based position
+        of the payload, as DRF keys the errors of a list.
+        """
+        overlaps = LeaveOverlapService.find_overlaps(
+            employee.id, [(payload['start_date'], payload['end_date']) for payload in payloads]
+        )
+        errors = {}
+        for position, overlap in enumerate(overlaps):
+            if overlap['requests']:
+                errors[position] = ['You already have an approved or pending leave request within this time frame.']
+            elif overlap['ranges']:
+                errors[position] = [f'This time frame overlaps item {overlap["ranges"][0]} of the batch.']
+        if errors:
+            raise ValidationError({'leave_requests': errors})
+
+        date_ranges = {}
+        for payload in payloads:
+            date_ranges.setdefault(payload['leave_type'], []).append((payload['start_date'], payload['end_date']))
+        for leave_type, leave_type_ranges in date_ranges.items():
+            LeaveBalanceService.validate_available_days_for_ranges(employee.id, leave_type, leave_type_ranges)
+
+        # bulk_create skips the post_save signal, so the calendar and the
+        # approval queue are written here, once for the whole batch.
+        leave_requests = [LeaveRequest(employee=employee, **payload) for payload in payloads]
+        with transaction.atomic():
+            LeaveRequest.active_objects.bulk_create(leave_requests)
+            LeaveCalendarService.sync_many_leave_days(leave_requests, created=True)
+            LeaveApprovalQueueService.enqueue_many(leave_requests)
+            OutboxService.publish_many(
+                [(LeaveEventTopics.SUBMITTED, cls.get_event_payload(leave_request)) for leave_request in leave_requests]
+            )
+        return leave_requests
 
     @classmethod
-    def _process_leave_approval(cls, payload, leave_request_id, request):
-        leave_request = cls.get_leave_request(leave_request_id)
-        requester = cls.get_user(leave_request.employee_id)
-        if requester.role.name == EmployeeRoles.EMPLOYEE:
-            if request.user.role.name == EmployeeRoles.MANAGER and request.user.id == request.supervisor_id:
-                cls.get_or_created_new_approval_flow(leave_request_id, request, payload)
-
-            elif request.user.role.name in [EmployeeRoles.DIRECTOR, EmployeeRoles.CEO]:
-                if request.user.role.name == EmployeeRoles.DIRECTOR and request.user.id == requester.supervisor.supervisor_id if requester.supervisor.supervisor_id else None:
-                    cls._validate_manager_approval(leave_request_id)
-                cls.get_or_created_new_approval_flow(leave_request_id, request, payload, influence_req_obj=True)
-
-        elif requester.role.name == EmployeeRoles.MANAGER:
-            if request.user.role.name in [EmployeeRoles.DIRECTOR, EmployeeRoles.CEO]:
-                if  request.user.role.name == EmployeeRoles.DIRECTOR and not request.user.id == requester.supervisor.id:
+    def get_event_payload(cls, leave_request, **extra):
+        return {
+            'leave_request_id': leave_request.id,
+            'employee_id': leave_request.employee_id,
+            'leave_type_id': leave_request.leave_type_id,
+            'start_date': leave_request.start_date,
+            'end_date': leave_request.end_date,
+            'approval_status': leave_request.approval_status,
+            **extra,
+        }
+
+    @classmethod
+    def _get_decision_events(cls, leave_request, approver, approver_role_name, payload, influence_req_obj):
+        events = [(
+            LeaveEventTopics.DECISION_RECORDED,
+            cls.get_event_payload(
+                leave_request,
+                approval_officer_id=approver.id,
+                role=approver_role_name,
+                decision=payload['approval_status'],
+                comment=payload.get('comment', None),
+            ),
+        )]
+        final_topic = {
+            LeaveApprovalStatus.APPROVED: LeaveEventTopics.APPROVED,
+            LeaveApprovalStatus.DECLINED: LeaveEventTopics.DECLINED,
+        }.get(payload['approval_status'])
+        if influence_req_obj and final_topic:
+            events.append((final_topic, cls.get_event_payload(leave_request, approval_officer_id=approver.id)))
+        return events
+
+    @classmethod
+    def decide_approval(cls, approval_status, approver, approver_role_name, requester, requester_role_name,
+                        requester_grand_supervisor_id, approval_flows):
+        """
+        Applies the approval rules to already loaded data, without touching the
+        database. Returns whether the decision also sets the status of the leave
+        request, or raises ValidationError when the approver cannot take it.
+        """
+        if any(
+            flow.approval_officer_id == approver.id and flow.approval_status == approval_status
+            for flow in approval_flows
+        ):
+            raise ValidationError(f'You have already {approval_status} this leave request')
+
+        if requester_role_name == EmployeeRoles.EMPLOYEE:
+            if approver_role_name == EmployeeRoles.MANAGER and approver.id == requester.supervisor_id:
+                return False
+            if approver_role_name in [EmployeeRoles.DIRECTOR, EmployeeRoles.CEO]:
+                if approver_role_name == EmployeeRoles.DIRECTOR and approver.id == requester_grand_supervisor_id:
+                    if not any(
+                        flow.role == EmployeeRoles.MANAGER and flow.approval_status == LeaveApprovalStatus.APPROVED
+                        for flow in approval_flows
+                    ):
+                        raise ValidationError("Pending Employee Manager Approval")
+                return True
+            raise ValidationError(f"You cannot approve this leave request")
+
+        if requester_role_name == EmployeeRoles.MANAGER:
+            if approver_role_name in [EmployeeRoles.DIRECTOR, EmployeeRoles.CEO]:
+                if approver_role_name == EmployeeRoles.DIRECTOR and not approver.id == requester.supervisor_id:
                     raise ValidationError(f"You cannot approve this leave request")
-                cls.get_or_created_new_approval_flow(leave_request_id, request, payload, influence_req_obj=True)
+                return True
+            raise ValidationError(f"You cannot approve this leave request")
 
-        elif requester.role.name == EmployeeRoles.DIRECTOR and request.user.role.name == EmployeeRoles.CEO:
-            cls.get_or_created_new_approval_flow(leave_request_id, request, payload, influence_req_obj=True)
+        if requester_role_name == EmployeeRoles.DIRECTOR and approver_role_name == EmployeeRoles.CEO:
+            return True
 
-        else:
-            raise ValidationError(f"Invalid request, Kindly reset requester reporting line")
+        raise ValidationError(f"Invalid request, Kindly reset requester reporting line")
 
     @classmethod
-    def get_or_created_new_approval_flow(cls, leave_request_id, request, payload, influence_req_obj=False):
-        approval_flow, created = LeaveApprovalFlow.active_objects.get_or_create(
-            leave_request_id=leave_request_id,
-            approval_officer_id=request.user.id,
-            role=request.user.role.name
+    def _build_approval_flow(cls, leave_request, approver, approver_role_name, payload, approval_flows):
+        approval_flow = next(
+            (
+                flow for flow in approval_flows
+                if flow.approval_officer_id == approver.id and flow.role == approver_role_name
+            ),
+            None,
+        ) or LeaveApprovalFlow(
+            leave_request_id=leave_request.id, approval_officer_id=approver.id, role=approver_role_name
         )
         approval_flow.comment = payload.get('comment', None)
         approval_flow.approval_status = payload['approval_status']
-        approval_flow.save()
+        return approval_flow
 
-        if influence_req_obj:
-            leave_request = cls.get_leave_request(leave_request_id)
-            leave_request.approval_status = payload['approval_status']
-            leave_request.action_on = timezone.now()
-            leave_request.save()
+    @classmethod
+    def _get_approval_flow_queryset(cls, leave_request_ids):
+        return LeaveApprovalFlow.active_objects.filter(leave_request_id__in=leave_request_ids)
+
+    @classmethod
+    def _get_approval_flows(cls, leave_request_ids):
+        approval_flows = {}
+        for approval_flow in cls._get_approval_flow_queryset(leave_request_ids):
+            approval_flows.setdefault(approval_flow.leave_request_id, []).append(approval_flow)
+        return approval_flows
 
     @classmethod
     def approve_leave_request(cls, payload, leave_request_id, request):
@@ -140,16 +304,699 @@ class LeaveRequestService(AccountService):
         if leave_request.employee_id == request.user.id:
             raise ValidationError('Invalid request!, you cannot approve your own leave request.')
 
-        cls._validate_approval_status(payload['approval_status'], leave_request_id, request)
-        cls._process_leave_approval(payload, leave_request_id, request)
-
+        approver = request.user
+        approver_role = cls.get_user_role(approver)
+        approver_role_name = approver_role.name if approver_role else None
+        requester = cls.get_user(leave_request.employee_id)
+        requester_role_name = requester.role.name if requester.role else None
+        requester_grand_supervisor_id = None
+        # Only a director's decision on an employee's request depends on it.
+        if requester_role_name == EmployeeRoles.EMPLOYEE and approver_role_name == EmployeeRoles.DIRECTOR \
+                and requester.supervisor_id:
+            requester_grand_supervisor_id = cls.get_user(requester.supervisor_id).supervisor_id
+        approval_flows = cls._get_approval_flows([leave_request.id]).get(leave_request.id, [])
+
+        influence_req_obj = cls.decide_approval(
+            payload['approval_status'], approver, approver_role_name, requester, requester_role_name,
+            requester_grand_supervisor_id, approval_flows
+        )
+        approval_flow = cls._build_approval_flow(leave_request, approver, approver_role_name, payload, approval_flows)
+        with transaction.atomic():
+            approval_flow.save()
+            if influence_req_obj:
+                previous_status = leave_request.approval_status
+                leave_request.approval_status = payload['approval_status']
+                leave_request.action_on = timezone.now()
+                leave_request.save()
+                LeaveBalanceService.apply_status_changes([(leave_request, previous_status)])
+            LeaveApprovalQueueService.record_decisions(
+                approver.id, [(leave_request.id, payload['approval_status'], influence_req_obj)]
+            )
+            OutboxService.publish_many(
+                cls._get_decision_events(leave_request, approver, approver_role_name, payload, influence_req_obj)
+            )
         return leave_request
 
+    @classmethod
+    def approve_leave_requests(cls, payload, leave_request_ids, request):
+        """
+        Takes the same decision on many leave requests with a fixed number of
+        queries. Each request is checked on its own; the ones that pass are
+        saved together in one transaction. Returns a result per request.
+        """
+        leave_request_ids = list(dict.fromkeys(leave_request_ids))
+        approver = request.user
+        approver_role = cls.get_user_role(approver)
+        approver_role_name = approver_role.name if approver_role else None
+
+        leave_requests = LeaveRequest.active_objects.in_bulk(leave_request_ids)
+        requesters = {
+            user.id: cls.attach_reference_data(user)
+            for user in User.active_objects.filter(
+                id__in={leave_request.employee_id for leave_request in leave_requests.values()}
+            )
+        }
+        grand_supervisor_ids = dict(
+            User.active_objects.filter(
+                id__in={requester.supervisor_id for requester in requesters.values() if requester.supervisor_id}
+            ).values_list('id', 'supervisor_id')
+        )
+        approval_flows = cls._get_approval_flows(list(leave_requests))
+        ledger = LeaveBalanceService.get_ledger(leave_requests.values())
+
+        results = []
+        flows_to_save = []
+        decisions = []
+        status_changes = []
+        events = []
+        now = timezone.now()
+        for leave_request_id in leave_request_ids:
+            leave_request = leave_requests.get(leave_request_id)
+            try:
+                if leave_request is None:
+                    raise ValidationError(f'Request with ID {leave_request_id} does not exists')
+                if leave_request.employee_id == approver.id:
+                    raise ValidationError('Invalid request!, you cannot approve your own leave request.')
+                requester = requesters.get(leave_request.employee_id)
+                if requester is None:
+                    raise ValidationError(f'User with ID {leave_request.employee_id} does not exist')
+
+                request_flows = approval_flows.get(leave_request_id, [])
+                influence_req_obj = cls.decide_approval(
+                    payload['approval_status'], approver, approver_role_name, requester,
+                    requester.role.name if requester.role else None,
+                    grand_supervisor_ids.get(requester.supervisor_id), request_flows
+                )
+                if influence_req_obj:
+                    LeaveBalanceService.reserve_days(ledger, leave_request, payload['approval_status'])
+            except ValidationError as exc:
+                results.append({'id': leave_request_id, 'success': False, 'errors': exc.detail})
+                continue
+
+            flows_to_save.append(
+                cls._build_approval_flow(leave_request, approver, approver_role_name, payload, request_flows)
+            )
+            decisions.append((leave_request_id, payload['approval_status'], influence_req_obj))
+            if influence_req_obj:
+                status_changes.append((leave_request, leave_request.approval_status))
+                leave_request.approval_status = payload['approval_status']
+                leave_request.action_on = now
+                leave_request.updated_at = now
+            events.extend(
+                cls._get_decision_events(leave_request, approver, approver_role_name, payload, influence_req_obj)
+            )
+            results.append({'id': leave_request_id, 'success': True, 'approval_status': leave_request.approval_status})
+
+        new_flows = [flow for flow in flows_to_save if flow.pk is None]
+        existing_flows = [flow for flow in flows_to_save if flow.pk is not None]
+        for flow in existing_flows:
+            flow.updated_at = now
+        with transaction.atomic():
+            LeaveApprovalFlow.active_objects.bulk_create(new_flows)
+            LeaveApprovalFlow.active_objects.bulk_update(existing_flows, ['comment', 'approval_status', 'updated_at'])
+            changed_requests = [leave_request for leave_request, _ in status_changes]
+            LeaveRequest.active_objects.bulk_update(changed_requests, ['approval_status', 'action_on', 'updated_at'])
+            # bulk_update does not send post_save, so keep the calendar in step here.
+            LeaveCalendarService.sync_many_leave_days(changed_requests)
+            LeaveBalanceService.apply_status_changes(status_changes)
+            LeaveApprovalQueueService.record_decisions(approver.id, decisions)
+            OutboxService.publish_many(events)
+
+        return {
+            'total': len(leave_request_ids),
+            'processed': len(flows_to_save),
+            'failed': len(leave_request_ids) - len(flows_to_save),
+            'results': results,
+        }
 
 
+class LeaveCalendarService(AccountService):
+    """
+    Maintains the ``LeaveDay`` occupancy table and serves the team calendar
+    from it.
+    """
+    occupying_statuses = (LeaveApprovalStatus.APPROVED,)
+    tracked_fields = ('employee_id', 'start_date', 'end_date', 'approval_status', 'is_active')
+    max_range_days = 366
+    batch_size = 1000
 
+    @classmethod
+    def tracked_values(cls, leave_request):
+        return loaded_field_values(leave_request, cls.tracked_fields)
 
+    @classmethod
+    def _occupies_calendar(cls, values):
+        return bool(
+            values['is_active']
+            and values['approval_status'] in cls.occupying_statuses
+            and values['employee_id']
+            and values['start_date']
+            and values['end_date']
+        )
 
+    @classmethod
+    def _build_leave_days(cls, leave_request):
+        if not cls._occupies_calendar(cls.tracked_values(leave_request)):
+            return []
+        days = (leave_request.end_date - leave_request.start_date).days + 1
+        return [
+            LeaveDay(
+                leave_request_id=leave_request.id,
+                employee_id=leave_request.employee_id,
+                date=leave_request.start_date + datetime.timedelta(days=offset),
+            )
+            for offset in range(days)
+        ]
 
+    @classmethod
+    def sync_leave_days(cls, leave_request, previous_values=None):
+        """
+        Rewrites the days of a saved leave request. ``previous_values`` are its
+        tracked values before the save (None for a new request) and let the
+        common transitions skip the delete or the insert.
+        """
+        leave_days = cls._build_leave_days(leave_request)
+        had_leave_days = previous_values is not None and (
+            DEFERRED in previous_values.values() or cls._occupies_calendar(previous_values)
+        )
+        if not had_leave_days:
+            return LeaveDay.objects.bulk_create(leave_days, batch_size=cls.batch_size)
+        if not leave_days:
+            return LeaveDay.objects.filter(leave_request_id=leave_request.id).delete()
+        with transaction.atomic():
+            LeaveDay.objects.filter(leave_request_id=leave_request.id).delete()
+            LeaveDay.objects.bulk_create(leave_days, batch_size=cls.batch_size)
 
+    @classmethod
+    def sync_many_leave_days(cls, leave_requests, created=False):
+        """
+        Rewrites the days of many leave requests. New requests (``created``)
+        have no days to delete yet.
+        """
+        if not leave_requests:
+            return
+        leave_days = [day for leave_request in leave_requests for day in cls._build_leave_days(leave_request)]
+        if created:
+            LeaveDay.objects.bulk_create(leave_days, batch_size=cls.batch_size)
+        else:
+            with transaction.atomic():
+                LeaveDay.objects.filter(
+                    leave_request_id__in=[leave_request.id for leave_request in leave_requests]
+                ).delete()
+                LeaveDay.objects.bulk_create(leave_days, batch_size=cls.batch_size)
+        for leave_request in leave_requests:
+            leave_request._calendar_values = cls.tracked_values(leave_request)
 
+    @classmethod
+    def rebuild(cls):
+        leave_requests = LeaveRequest.active_objects.filter(approval_status__in=cls.occupying_statuses).only(
+            'id', *cls.tracked_fields
+        )
+        leave_days = [day for leave_request in leave_requests.iterator() for day in cls._build_leave_days(leave_request)]
+        with transaction.atomic():
+            LeaveDay.objects.all().delete()
+            LeaveDay.objects.bulk_create(leave_days, batch_size=cls.batch_size)
+        return len(leave_days)
+
+    @classmethod
+    def _validate_date_range(cls, start_date, end_date):
+        if start_date > end_date:
+            raise ValidationError('Start date must not be after the end date.')
+        if (end_date - start_date).days >= cls.max_range_days:
+            raise ValidationError(f'The calendar range cannot exceed {cls.max_range_days} days.')
+
+    @classmethod
+    def _can_view_any_team(cls, user):
+        user_role = cls.get_user_role(user)
+        return (user_role and user_role.name == EmployeeRoles.CEO) or \
+            user.position == EmployeePositions.Human_Resources_Manager
+
+    @classmethod
+    def get_scope_filter(cls, request, department_id=None, supervisor_id=None):
+        """
+        Employees shown on the calendar: a department (CEO and HR only) or the
+        reporting subtree of ``supervisor_id``, which defaults to the caller.
+        """
+        user = request.user
+        if department_id:
+            if not cls._can_view_any_team(user):
+                raise PermissionDenied('You cannot view the calendar of a department.')
+            return Q(employee__department_id=department_id)
+
+        supervisor_id = supervisor_id or user.id
+        if supervisor_id != user.id and not cls._can_view_any_team(user) and \
+                not ReportingHierarchyService.is_in_subtree(supervisor_id, user.id):
+            raise PermissionDenied('You can only view the calendar of your own reporting line.')
+        return Q(employee_id__in=ReportingHierarchy.objects.filter(ancestor_id=supervisor_id).values('descendant_id'))
+
+    @classmethod
+    def get_calendar_rows(cls, scope_filter, start_date, end_date):
+        return LeaveDay.objects.filter(
+            scope_filter,
+            date__range=(start_date, end_date),
+            employee__is_active=True,
+        ).values_list(
+            'date', 'employee_id', 'employee__first_name', 'employee__last_name', 'employee__email'
+        ).order_by('date', 'employee_id').distinct()
+
+    @classmethod
+    def get_calendar(cls, request, start_date, end_date, department_id=None, supervisor_id=None):
+        cls._validate_date_range(start_date, end_date)
+        scope_filter = cls.get_scope_filter(request, department_id, supervisor_id)
+        rows = cls.get_calendar_rows(scope_filter, start_date, end_date)
+
+        employees = {}
+        rosters = {}
+        for date, employee_id, first_name, last_name, email in rows:
+            rosters.setdefault(date, []).append(employee_id)
+            employees.setdefault(employee_id, {
+                'id': employee_id, 'first_name': first_name, 'last_name': last_name, 'email': email,
+            })
+
+        days = []
+        for offset in range((end_date - start_date).days + 1):
+            date = start_date + datetime.timedelta(days=offset)
+            roster = rosters.get(date, [])
+            days.append({'date': date, 'count': len(roster), 'employee_ids': roster})
+        return {'start_date': start_date, 'end_date': end_date, 'employees': employees, 'days': days}
+
+
+class LeaveBalanceService:
+    """
+    Keeps the ``LeaveBalance`` ledger of approved days per employee, leave
+    type and year, and answers balance questions from it.
+    """
+    consuming_statuses = (LeaveApprovalStatus.APPROVED,)
+    batch_size = 1000
+
+    @classmethod
+    def days_by_year(cls, start_date, end_date):
+        """
+        Splits an inclusive date range into the number of days in each year.
+        """
+        days = {}
+        while start_date <= end_date:
+            year_end = min(end_date, datetime.date(start_date.year, 12, 31))
+            days[start_date.year] = (year_end - start_date).days + 1
+            start_date = year_end + datetime.timedelta(days=1)
+        return days
+
+    @classmethod
+    def _get_request_days(cls, leave_request):
+        """
+        The days of a leave request, keyed by (employee_id, leave_type_id, year).
+        """
+        if not (
+            leave_request.employee_id and leave_request.leave_type_id
+            and leave_request.start_date and leave_request.end_date
+        ):
+            return {}
+        return {
+            (leave_request.employee_id, leave_request.leave_type_id, year): days
+            for year, days in cls.days_by_year(leave_request.start_date, leave_request.end_date).items()
+        }
+
+    @classmethod
+    def _validate_entitlement(cls, leave_type, year, days_used, days):
+        if days <= 0 or leave_type is None or leave_type.annual_entitlement is None:
+            return
+        days_remaining = leave_type.annual_entitlement - days_used
+        if days > days_remaining:
+            raise ValidationError(
+                f'Not enough {leave_type.name} days left in {year}: {days} requested, {days_remaining} remaining.'
+            )
+
+    @classmethod
+    def get_ledger(cls, leave_requests):
+        """
+        The days used on every (employee_id, leave_type_id, year) the leave
+        requests fall on, with one query.
+        """
+        keys = {key for leave_request in leave_requests for key in cls._get_request_days(leave_request)}
+        if not keys:
+            return {}
+        balances = LeaveBalance.objects.filter(
+            employee_id__in={employee_id for employee_id, _, _ in keys},
+            leave_type_id__in={leave_type_id for _, leave_type_id, _ in keys},
+            year__in={year for _, _, year in keys},
+        ).values_list('employee_id', 'leave_type_id', 'year', 'days_used')
+        return {(employee_id, leave_type_id, year): days_used for employee_id, leave_type_id, year, days_used in balances}
+
+    @classmethod
+    def reserve_days(cls, ledger, leave_request, approval_status):
+        """
+        Checks that moving ``leave_request`` to ``approval_status`` fits in the
+        entitlement left in ``ledger`` (see ``get_ledger``) and counts its
+        days there, so the next request of a batch sees them.
+        """
+        if approval_status not in cls.consuming_statuses or leave_request.approval_status in cls.consuming_statuses:
+            return
+        request_days = cls._get_request_days(leave_request)
+        for key, days in request_days.items():
+            cls._validate_entitlement(leave_type_cache.get(leave_request.leave_type_id), key[2], ledger.get(key, 0), days)
+        for key, days in request_days.items():
+            ledger[key] = ledger.get(key, 0) + days
+
+    @classmethod
+    def apply_status_changes(cls, status_changes):
+        """
+        Updates the ledger for ``(leave_request, previous_status)`` pairs whose
+        status moved into or out of Approved, or that were deactivated while
+        Approved, with a fixed number of queries. Raises ``ValidationError``
+        when an approval would take a balance past its entitlement.
+        """
+        deltas = {}
+        for leave_request, previous_status in status_changes:
+            was_consuming = previous_status in cls.consuming_statuses
+            is_consuming = leave_request.is_active and leave_request.approval_status in cls.consuming_statuses
+            if was_consuming == is_consuming:
+                continue
+            sign = 1 if is_consuming else -1
+            for key, days in cls._get_request_days(leave_request).items():
+                deltas[key] = deltas.get(key, 0) + sign * days
+        if not deltas:
+            return
+
+        with transaction.atomic():
+            # Make sure every row exists, then lock and adjust them.
+            LeaveBalance.objects.bulk_create(
+                [
+                    LeaveBalance(employee_id=employee_id, leave_type_id=leave_type_id, year=year)
+                    for employee_id, leave_type_id, year in deltas
+                ],
+                ignore_conflicts=True,
+                batch_size=cls.batch_size,
+            )
+            key_filter = reduce(or_, (
+                Q(employee_id=employee_id, leave_type_id=leave_type_id, year=year)
+                for employee_id, leave_type_id, year in deltas
+            ))
+            balances = list(
+                LeaveBalance.objects.select_for_update(of=('self',)).select_related('leave_type').filter(key_filter)
+            )
+            for balance in balances:
+                key = (balance.employee_id, balance.leave_type_id, balance.year)
+                # Pending requests are not counted at submission, so the
+                # entitlement is enforced here, under the row lock.
+                cls._validate_entitlement(balance.leave_type, balance.year, balance.days_used, deltas[key])
+                balance.days_used += deltas[key]
+            LeaveBalance.objects.bulk_update(balances, ['days_used'], batch_size=cls.batch_size)
+
+    @classmethod
+    def _format_balance(cls, leave_type, year, days_used):
+        entitlement = leave_type.annual_entitlement
+        return {
+            'leave_type': leave_type.id,
+            'leave_type_name': leave_type.name,
+            'year': year,
+            'entitlement': entitlement,
+            'days_used': days_used,
+            'days_remaining': None if entitlement is None else entitlement - days_used,
+        }
+
+    @classmethod
+    def get_days_used(cls, employee_id, year):
+        return LeaveBalance.objects.filter(employee_id=employee_id, year=year).values_list('leave_type_id', 'days_used')
+
+    @classmethod
+    def get_balances(cls, employee_id, year):
+        days_used = dict(cls.get_days_used(employee_id, year))
+        return [
+            cls._format_balance(leave_type, year, days_used.get(leave_type.id, 0))
+            for leave_type in leave_type_cache.all()
+        ]
+
+    @classmethod
+    def validate_available_days(cls, employee_id, leave_type, start_date, end_date):
+        cls.validate_available_days_for_ranges(employee_id, leave_type, [(start_date, end_date)])
+
+    @classmethod
+    def validate_available_days_for_ranges(cls, employee_id, leave_type, date_ranges):
+        """
+        Checks that the days of all ``date_ranges`` together fit in what is
+        left of the leave type's entitlement, year by year.
+        """
+        if leave_type.annual_entitlement is None:
+            return
+        requested_days = {}
+        for start_date, end_date in date_ranges:
+            for year, days in cls.days_by_year(start_date, end_date).items():
+                requested_days[year] = requested_days.get(year, 0) + days
+        days_used = dict(
+            LeaveBalance.objects.filter(
+                employee_id=employee_id, leave_type_id=leave_type.id, year__in=list(requested_days)
+            ).values_list('year', 'days_used')
+        )
+        for year, days in requested_days.items():
+            cls._validate_entitlement(leave_type, year, days_used.get(year, 0), days)
+
+    @classmethod
+    def rebuild(cls):
+        totals = {}
+        approved_requests = LeaveRequest.active_objects.filter(
+            approval_status__in=cls.consuming_statuses,
+            employee__isnull=False,
+            leave_type__isnull=False,
+            start_date__isnull=False,
+            end_date__isnull=False,
+        ).values_list('employee_id', 'leave_type_id', 'start_date', 'end_date')
+        for employee_id, leave_type_id, start_date, end_date in approved_requests.iterator():
+            for year, days in cls.days_by_year(start_date, end_date).items():
+                key = (employee_id, leave_type_id, year)
+                totals[key] = totals.get(key, 0) + days
+
+        balances = [
+            LeaveBalance(employee_id=employee_id, leave_type_id=leave_type_id, year=year, days_used=days_used)
+            for (employee_id, leave_type_id, year), days_used in totals.items()
+        ]
+        with transaction.atomic():
+            LeaveBalance.objects.all().delete()
+            LeaveBalance.objects.bulk_create(balances, batch_size=cls.batch_size)
+        return len(balances)
+
+
+class LeaveApprovalQueueService(AccountService):
+    """
+    Maintains the ``LeaveApprovalQueue`` of each leave request: its approvers
+    along the requester's reporting line, in the order the approval rules
+    expect them to act.
+    """
+    open_statuses = (ApprovalQueueStatus.PENDING, ApprovalQueueStatus.WAITING)
+    final_approver_roles = (EmployeeRoles.DIRECTOR, EmployeeRoles.CEO)
+    batch_size = 1000
+
+    @classmethod
+    def _get_reporting_chains(cls, employee_ids):
+        """
+        Returns ``{employee_id: {depth: (user_id, role_name)}}`` for the
+        employees and their two nearest supervisors.
+        """
+        chains = {}
+        links = ReportingHierarchy.objects.filter(
+            descendant_id__in=employee_ids,
+            depth__lte=2,
+            ancestor__is_active=True,
+        ).values_list('descendant_id', 'depth', 'ancestor_id', 'ancestor__role_id')
+        for employee_id, depth, user_id, role_id in links:
+            role = role_cache.get(role_id)
+            chains.setdefault(employee_id, {})[depth] = (user_id, role.name if role else None)
+        return chains
+
+    @classmethod
+    def _build_entries(cls, leave_request, chain):
+        requester_role_name = chain.get(0, (None, None))[1]
+        supervisor_id, supervisor_role_name = chain.get(1, (None, None))
+        grand_supervisor_id, grand_supervisor_role_name = chain.get(2, (None, None))
+
+        approvers = []
+        if requester_role_name == EmployeeRoles.EMPLOYEE:
+            if supervisor_role_name == EmployeeRoles.MANAGER:
+                approvers.append((supervisor_id, ApprovalQueueStatus.PENDING))
+                # The next level decides once the manager has approved.
+                if grand_supervisor_role_name in cls.final_approver_roles:
+                    approvers.append((grand_supervisor_id, ApprovalQueueStatus.WAITING))
+            elif supervisor_role_name in cls.final_approver_roles:
+                approvers.append((supervisor_id, ApprovalQueueStatus.PENDING))
+        elif requester_role_name == EmployeeRoles.MANAGER and supervisor_role_name in cls.final_approver_roles:
+            approvers.append((supervisor_id, ApprovalQueueStatus.PENDING))
+        elif requester_role_name == EmployeeRoles.DIRECTOR and supervisor_role_name == EmployeeRoles.CEO:
+            approvers.append((supervisor_id, ApprovalQueueStatus.PENDING))
+
+        return [
+            LeaveApprovalQueue(
+                leave_request_id=leave_request.id, approver_id=approver_id, step=step, status=queue_status,
+            )
+            for step, (approver_id, queue_status) in enumerate(approvers, start=1)
+        ]
+
+    @classmethod
+    def enqueue(cls, leave_request):
+        return cls.enqueue_many([leave_request])
+
+    @classmethod
+    def enqueue_many(cls, leave_requests):
+        leave_requests = [
+            leave_request for leave_request in leave_requests
+            if leave_request.employee_id and leave_request.approval_status == LeaveApprovalStatus.PENDING
+        ]
+        if not leave_requests:
+            return []
+        chains = cls._get_reporting_chains({leave_request.employee_id for leave_request in leave_requests})
+        entries = [
+            entry for leave_request in leave_requests
+            for entry in cls._build_entries(leave_request, chains.get(leave_request.employee_id, {}))
+        ]
+        return LeaveApprovalQueue.objects.bulk_create(entries, batch_size=cls.batch_size)
+
+    @classmethod
+    def record_decisions(cls, approver_id, decisions):
+        """
+        Advances the queue after ``approver_id`` recorded a decision on each
+        ``(leave_request_id, approval_status, influence_req_obj)``.
+        """
+        if not decisions:
+            return
+        now = timezone.now()
+        LeaveApprovalQueue.objects.filter(
+            leave_request_id__in=[leave_request_id for leave_request_id, _, _ in decisions],
+            approver_id=approver_id,
+            status__in=cls.open_statuses,
+        ).update(status=ApprovalQueueStatus.ACTIONED, updated_at=now)
+
+        decided_ids = [leave_request_id for leave_request_id, _, influence_req_obj in decisions if influence_req_obj]
+        approved_ids = [
+            leave_request_id for leave_request_id, approval_status, influence_req_obj in decisions
+            if not influence_req_obj and approval_status == LeaveApprovalStatus.APPROVED
+        ]
+        declined_ids = [
+            leave_request_id for leave_request_id, approval_status, influence_req_obj in decisions
+            if not influence_req_obj and approval_status != LeaveApprovalStatus.APPROVED
+        ]
+        if decided_ids:
+            LeaveApprovalQueue.objects.filter(
+                leave_request_id__in=decided_ids, status__in=cls.open_statuses
+            ).update(status=ApprovalQueueStatus.CLOSED, updated_at=now)
+        if approved_ids:
+            LeaveApprovalQueue.objects.filter(
+                leave_request_id__in=approved_ids, status=ApprovalQueueStatus.WAITING
+            ).update(status=ApprovalQueueStatus.PENDING, updated_at=now)
+        if declined_ids:
+            LeaveApprovalQueue.objects.filter(
+                leave_request_id__in=declined_ids, step__gt=1, status=ApprovalQueueStatus.PENDING
+            ).update(status=ApprovalQueueStatus.WAITING, updated_at=now)
+
+    @classmethod
+    def close(cls, leave_request_id):
+        LeaveApprovalQueue.objects.filter(
+            leave_request_id=leave_request_id, status__in=cls.open_statuses
+        ).update(status=ApprovalQueueStatus.CLOSED, updated_at=timezone.now())
+
+    @classmethod
+    def get_inbox(cls, user):
+        return LeaveApprovalQueue.objects.filter(approver_id=user.id, status=ApprovalQueueStatus.PENDING)
+
+    @classmethod
+    def rebuild(cls):
+        """
+        Recomputes the queue of every pending leave request from the current
+        reporting lines and the decisions already recorded on it.
+        """
+        leave_requests = list(
+            LeaveRequest.active_objects.filter(approval_status=LeaveApprovalStatus.PENDING).only('id', 'employee_id')
+        )
+        chains = cls._get_reporting_chains({leave_request.employee_id for leave_request in leave_requests})
+        flows = {}
+        for leave_request_id, approval_officer_id, approval_status in LeaveApprovalFlow.active_objects.filter(
+            leave_request_id__in=[leave_request.id for leave_request in leave_requests]
+        ).values_list('leave_request_id', 'approval_officer_id', 'approval_status'):
+            flows.setdefault(leave_request_id, {})[approval_officer_id] = approval_status
+
+        entries = []
+        for leave_request in leave_requests:
+            request_entries = cls._build_entries(leave_request, chains.get(leave_request.employee_id, {}))
+            decisions = flows.get(leave_request.id, {})
+            first_step_approved = False
+            for entry in request_entries:
+                if entry.approver_id in decisions:
+                    entry.status = ApprovalQueueStatus.ACTIONED
+                    if entry.step == 1:
+                        first_step_approved = decisions[entry.approver_id] == LeaveApprovalStatus.APPROVED
+                elif entry.status == ApprovalQueueStatus.WAITING and first_step_approved:
+                    entry.status = ApprovalQueueStatus.PENDING
+            entries.extend(request_entries)
+
+        with transaction.atomic():
+            LeaveApprovalQueue.objects.all().delete()
+            LeaveApprovalQueue.objects.bulk_create(entries, batch_size=cls.batch_size)
+        return len(entries)
+
+
+class LeaveHistoryExportService:
+    """
+    Leave requests with their approval flows, for payroll extracts.
+
+    Requests are read with a chunked iterator over plain values, and the
+    flows of each chunk are fetched with one extra query, so memory stays
+    flat and the query count grows with the number of chunks only.
+    """
+    columns = (
+        'id', 'employee_id', 'employee_email', 'employee_first_name', 'employee_last_name', 'leave_type_name',
+        'start_date', 'end_date', 'approval_status', 'action_on', 'reason', 'created_at', 'approvals',
+    )
+    chunk_size = 2000
+
+    @classmethod
+    def get_leave_requests(cls, start_date=None, end_date=None, employee_id=None):
+        leave_requests = LeaveRequest.active_objects.all()
+        if start_date:
+            leave_requests = leave_requests.filter(end_date__gte=start_date)
+        if end_date:
+            leave_requests = leave_requests.filter(start_date__lte=end_date)
+        if employee_id:
+            leave_requests = leave_requests.filter(employee_id=employee_id)
+        return leave_requests.order_by('id').values(
+            'id', 'employee_id', 'start_date', 'end_date', 'approval_status', 'action_on', 'reason', 'created_at',
+            employee_email=F('employee__email'),
+            employee_first_name=F('employee__first_name'),
+            employee_last_name=F('employee__last_name'),
+            leave_type_name=F('leave_type__name'),
+        )
+
+    @classmethod
+    def _get_approvals(cls, leave_request_ids):
+        approvals = {}
+        flows = LeaveApprovalFlow.active_objects.filter(leave_request_id__in=leave_request_ids).order_by(
+            'action_at', 'id'
+        ).values(
+            'leave_request_id', 'role', 'approval_status', 'approval_officer_id', 'comment', 'action_at',
+            approval_officer_email=F('approval_officer__email'),
+        )
+        for flow in flows:
+            approvals.setdefault(flow.pop('leave_request_id'), []).append(flow)
+        return approvals
+
+    @classmethod
+    def iter_rows(cls, chunk_size=None, **filters):
+        chunk_size = chunk_size or cls.chunk_size
+        leave_requests = cls.get_leave_requests(**filters).iterator(chunk_size=chunk_size)
+        for chunk in chunked(leave_requests, chunk_size):
+            approvals = cls._get_approvals([leave_request['id'] for leave_request in chunk])
+            for leave_request in chunk:
+                leave_request['approvals'] = approvals.get(leave_request['id'], [])
+                yield leave_request
+
+    @classmethod
+    def format_approvals(cls, approvals):
+        """
+        Flattens the approvals of a request into one CSV cell:
+        ``role:status:officer email:action time`` entries separated by ``; ``.
+        """
+        return '; '.join(
+            f"{approval['role']}:{approval['approval_status']}:{approval['approval_officer_email'] or ''}:"
+            f"{approval['action_at'].isoformat()}"
+            for approval in approvals
+        )
+
+    @classmethod
+    def csv_formatters(cls):
+        return {'approvals': cls.format_approvals}
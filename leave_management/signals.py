@@ -0,0 +1,37 @@
+from django.db.models.base import DEFERRED
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from leave_management.cache import leave_type_cache
+from leave_management.models import LeaveType, LeaveRequest
+from leave_management.services import LeaveApprovalQueueService, LeaveBalanceService, LeaveCalendarService
+
+
+@receiver(post_save, sender=LeaveType)
+@receiver(post_delete, sender=LeaveType)
+def invalidate_leave_type_cache(sender, **kwargs):
+    leave_type_cache.invalidate()
+
+
+@receiver(post_init, sender=LeaveRequest)
+def remember_calendar_values(sender, instance, **kwargs):
+    instance._calendar_values = LeaveCalendarService.tracked_values(instance)
+
+
+@receiver(post_save, sender=LeaveRequest)
+def sync_leave_days_on_save(sender, instance, created, **kwargs):
+    values = LeaveCalendarService.tracked_values(instance)
+    if created:
+        LeaveCalendarService.sync_leave_days(instance)
+        LeaveApprovalQueueService.enqueue(instance)
+    elif values != instance._calendar_values:
+        LeaveCalendarService.sync_leave_days(instance, instance._calendar_values)
+        if not values['is_active'] and instance._calendar_values['is_active']:
+            LeaveApprovalQueueService.close(instance.id)
+            # A deleted Approved request gives its days back, as rebuild
+            # only counts active requests.
+            previous_status = instance._calendar_values['approval_status']
+            if previous_status is DEFERRED:
+                previous_status = instance.approval_status
+            LeaveBalanceService.apply_status_changes([(instance, previous_status)])
+    instance._calendar_values = values
@@ -1,3 +1,787 @@
-from django.test import TestCase
+import csv
+import datetime
+import io
+import json
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.test import AsyncClient, TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from accounts.authentication import ClaimsJWTAuthentication
+from accounts.cache import role_cache
+from accounts.models import User, Department
+from accounts.org_graph import org_graph
+from accounts.services import ReportingHierarchyService
+from accounts.tests import AccountTestMixin
+from base.constants import EmployeeRoles, LeaveApprovalStatus, LeaveEventTopics
+from base.models import OutboxEvent
+from base.pagination import KeysetPagination
+from leave_management.cache import leave_type_cache
+from leave_management.models import (
+    LeaveType,
+    LeaveRequest,
+    LeaveApprovalFlow,
+    LeaveApprovalQueue,
+    LeaveDay,
+    LeaveBalance,
+)
+from leave_management.services import (
+    LeaveOverlapService,
+    LeaveCalendarService,
+    LeaveBalanceService,
+    LeaveApprovalQueueService,
+    LeaveHistoryExportService,
+)
+
+
+class LeaveTestMixin(AccountTestMixin):
+
+    @classmethod
+    def create_organization(cls):
+        cls.roles = cls.create_roles()
+        cls.ceo = cls.create_ceo(cls.roles)
+        cls.director = cls.create_employee('director@email.com', cls.roles[EmployeeRoles.DIRECTOR], cls.ceo)
+        cls.manager = cls.create_employee('manager@email.com', cls.roles[EmployeeRoles.MANAGER], cls.director)
+        cls.employee = cls.create_employee('employee@email.com', cls.roles[EmployeeRoles.EMPLOYEE], cls.manager)
+        cls.leave_type = LeaveType.active_objects.create(name='Annual Leave')
+
+    @classmethod
+    def create_leave_request(cls, employee, start_date, end_date, approval_status=LeaveApprovalStatus.PENDING):
+        return LeaveRequest.active_objects.create(
+            employee=employee,
+            leave_type=cls.leave_type,
+            start_date=start_date,
+            end_date=end_date,
+            approval_status=approval_status,
+        )
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(User.active_objects.get(pk=user.pk))
+        return client
+
+
+class LeaveEndpointQueryCountTest(LeaveTestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_organization()
+        start_date = datetime.date(2025, 1, 6)
+        for week in range(3):
+            cls.create_leave_request(
+                cls.employee,
+                start_date + datetime.timedelta(weeks=week),
+                start_date + datetime.timedelta(weeks=week, days=2),
+            )
+        cls.manager_request = cls.create_leave_request(
+            cls.manager, datetime.date(2025, 3, 3), datetime.date(2025, 3, 5)
+        )
+
+    def test_leave_request_list(self):
+        client = self.client_for(self.director)
+        client.get(reverse('leave-request-create'))
+        # The role and the director's visibility scope are cached by now.
+        with self.assertNumQueries(2):
+            response = client.get(reverse('leave-request-create'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 4)
+
+    def test_leave_request_create(self):
+        client = self.client_for(self.employee)
+        payload = {'leave_type': self.leave_type.id, 'start_date': '2025-05-05', 'end_date': '2025-05-07'}
+        role_cache.all()
+        # Saving the request also queues it for the employee's manager and
+        # records the submitted event, in one transaction.
+        with self.assertNumQueries(8):
+            response = client.post(reverse('leave-request-create'), payload)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_leave_request_approval(self):
+        client = self.client_for(self.director)
+        # One transaction also writes the calendar days, the employee's balance row, the approval queue
+        # and the outbox events.
+        with self.assertNumQueries(17):
+            response = client.put(
+                reverse('leave-request-approval', args=[self.manager_request.id]),
+                {'approval_status': LeaveApprovalStatus.APPROVED},
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['approval_status'], LeaveApprovalStatus.APPROVED)
+
+    def test_leave_type_list(self):
+        client = self.client_for(self.employee)
+        client.get(reverse('leave-type-list'))
+        with self.assertNumQueries(0):
+            response = client.get(reverse('leave-type-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_leave_type_create(self):
+        client = self.client_for(self.ceo)
+        with self.assertNumQueries(3):
+            response = client.post(reverse('leave-type-list'), {'name': 'Sick Leave'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class LeaveRequestListQueryCountRegressionTest(LeaveTestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_organization()
+        start_date = datetime.date(2024, 1, 1)
+        for week in range(30):
+            cls.create_leave_request(
+                cls.employee,
+                start_date + datetime.timedelta(weeks=week),
+                start_date + datetime.timedelta(weeks=week, days=1),
+            )
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        client = self.client_for(self.director)
+        client.get(reverse('leave-request-create'))
+        for page_size in (5, 30):
+            with self.assertNumQueries(2):
+                response = client.get(reverse('leave-request-create'), {'page_size': page_size})
+            self.assertEqual(len(response.data['results']), page_size)
+
+
+class AsyncLeaveRequestListTest(LeaveTestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_organization()
+        start_date = datetime.date(2025, 1, 6)
+        for week in range(3):
+            cls.create_leave_request(
+                cls.employee,
+                start_date + datetime.timedelta(weeks=week),
+                start_date + datetime.timedelta(weeks=week, days=2),
+            )
+        cls.create_leave_request(cls.director, datetime.date(2025, 3, 3), datetime.date(2025, 3, 5))
+
+    def setUp(self):
+        super().setUp()
+        self.tokens = {
+            user.id: ClaimsJWTAuthentication.get_token(user).access_token for user in (self.ceo, self.manager)
+        }
+
+    async def get(self, user, data=None):
+        return await AsyncClient().get(
+            reverse('async-leave-request-list'), data, headers={'Authorization': f'Bearer {self.tokens[user.id]}'}
+        )
+
+    async def test_list_is_limited_to_the_reporting_line(self):
+        response = await self.get(self.manager)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['count'], 3)
+        self.assertEqual({row['employee_id'] for row in response.json()['results']}, {self.employee.id})
+
+    async def test_ceo_sees_every_request(self):
+        response = await self.get(self.ceo, {'pagination': 'keyset', 'page_size': 2})
+        self.assertEqual(len(response.json()['results']), 2)
+        response = await AsyncClient().get(
+            response.json()['next'], headers={'Authorization': f'Bearer {self.tokens[self.ceo.id]}'}
+        )
+        self.assertEqual(len(response.json()['results']), 2)
+        self.assertIsNone(response.json()['next'])
+
+    async def test_invalid_page_is_not_found(self):
+        response = await self.get(self.manager, {'page': 5})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class KeysetPaginationTest(LeaveTestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_organization()
+        start_date = datetime.date(2023, 1, 2)
+        for week in range(25):
+            cls.create_leave_request(
+                cls.employee,
+                start_date + datetime.timedelta(weeks=week),
+                start_date + datetime.timedelta(weeks=week, days=1),
+            )
+        # Same creation time for several rows, so the id has to break ties.
+        tied_ids = list(LeaveRequest.active_objects.order_by('id').values_list('id', flat=True)[:6])
+        LeaveRequest.active_objects.filter(id__in=tied_ids).update(
+            created_at=datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+        )
+        cls.expected_ids = list(
+            LeaveRequest.active_objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.client_for(self.employee)
+        role_cache.all()
+
+    def walk(self, url, params=None, link='next'):
+        ids = []
+        response = self.client.get(url, params)
+        while True:
+            ids.append([row['id'] for row in response.data['results']])
+            if not response.data[link]:
+                return ids, response
+            response = self.client.get(response.data[link])
+
+    def test_next_links_cover_every_row_once(self):
+        pages, last_page = self.walk(reverse('leave-request-create'), {'pagination': 'keyset', 'page_size': 4})
+        self.assertEqual([row_id for page in pages for row_id in page], self.expected_ids)
+        self.assertNotIn('count', last_page.data)
+
+        pages, _ = self.walk(last_page.data['previous'], link='previous')
+        self.assertEqual([row_id for page in reversed(pages) for row_id in page], self.expected_ids[:24])
+
+    def test_deep_page_costs_the_same_as_first_page(self):
+        response = self.client.get(reverse('leave-request-create'), {'pagination': 'keyset', 'page_size': 2})
+        with self.assertNumQueries(1):
+            response = self.client.get(response.data['next'])
+        for _ in range(8):
+            response = self.client.get(response.data['next'])
+        with self.assertNumQueries(1):
+            self.client.get(response.data['next'])
+
+    def test_count_modes(self):
+        url = reverse('leave-request-create')
+        response = self.client.get(url, {'pagination': 'keyset', 'count': 'exact'})
+        self.assertEqual((response.data['count'], response.data['count_is_estimate']), (25, False))
+
+        with mock.patch.object(KeysetPagination, 'max_count', 10):
+            response = self.client.get(url, {'pagination': 'keyset', 'count': 'estimate'})
+        self.assertEqual((response.data['count'], response.data['count_is_estimate']), (10, True))
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(reverse('leave-request-create'), {'pagination': 'keyset', 'cursor': 'garbage'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class LeaveOverlapServiceTest(LeaveTestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_organization()
+        cls.existing = cls.create_leave_request(cls.employee, datetime.date(2025, 3, 10), datetime.date(2025, 3, 14))
+        cls.create_leave_request(
+            cls.employee, datetime.date(2025, 3, 17), datetime.date(2025, 3, 18), LeaveApprovalStatus.DECLINED
+        )
+        cls.create_leave_request(cls.manager, datetime.date(2025, 3, 10), datetime.date(2025, 3, 14))
+        # Years of history that a new request must not have to scan through.
+        for week in range(50):
+            start_date = datetime.date(2023, 1, 2) + datetime.timedelta(weeks=week)
+            cls.create_leave_request(
+                cls.employee, start_date, start_date + datetime.timedelta(days=1), LeaveApprovalStatus.APPROVED
+            )
+
+    def test_detects_every_kind_of_intersection(self):
+        ranges = {
+            'contains new range': (datetime.date(2025, 3, 11), datetime.date(2025, 3, 12)),
+            'contained in new range': (datetime.date(2025, 3, 1), datetime.date(2025, 3, 31)),
+            'overlaps the start': (datetime.date(2025, 3, 5), datetime.date(2025, 3, 10)),
+            'overlaps the end': (datetime.date(2025, 3, 14), datetime.date(2025, 3, 20)),
+        }
+        for label, (start_date, end_date) in ranges.items():
+            with self.subTest(label):
+                self.assertEqual(
+                    list(LeaveOverlapService.get_overlapping_requests(self.employee.id, start_date, end_date)),
+                    [self.existing],
+                )
+
+    def test_ignores_adjacent_declined_and_excluded_requests(self):
+        self.assertFalse(
+            LeaveOverlapService.has_overlap(self.employee.id, datetime.date(2025, 3, 15), datetime.date(2025, 3, 19))
+        )
+        self.assertFalse(
+            LeaveOverlapService.has_overlap(
+                self.employee.id, datetime.date(2025, 3, 10), datetime.date(2025, 3, 14), exclude_ids=[self.existing.id]
+            )
+        )
+
+    def test_find_overlaps_checks_all_ranges_in_one_query(self):
+        ranges = [
+            (datetime.date(2025, 3, 1), datetime.date(2025, 3, 3)),
+            (datetime.date(2025, 3, 12), datetime.date(2025, 3, 20)),
+            (datetime.date(2023, 1, 3), datetime.date(2023, 1, 10)),
+        ]
+        with self.assertNumQueries(1):
+            overlaps = LeaveOverlapService.find_overlaps(self.employee.id, ranges)
+        self.assertEqual(overlaps[0], {'requests': [], 'ranges': []})
+        self.assertEqual(overlaps[1], {'requests': [self.existing], 'ranges': []})
+        self.assertEqual(
+            [(leave.start_date, leave.end_date) for leave in overlaps[2]['requests']],
+            [(datetime.date(2023, 1, 2), datetime.date(2023, 1, 3)), (datetime.date(2023, 1, 9), datetime.date(2023, 1, 10))],
+        )
+
+    def test_find_overlaps_checks_the_ranges_against_each_other(self):
+        ranges = [
+            (datetime.date(2025, 6, 10), datetime.date(2025, 6, 12)),
+            (datetime.date(2025, 6, 1), datetime.date(2025, 6, 3)),
+            (datetime.date(2025, 6, 3), datetime.date(2025, 6, 10)),
+            (datetime.date(2025, 6, 20), datetime.date(2025, 6, 21)),
+        ]
+        overlaps = LeaveOverlapService.find_overlaps(self.employee.id, ranges)
+        self.assertEqual([overlap['ranges'] for overlap in overlaps], [[2], [2], [0, 1], []])
+
+    def test_batch_submission_creates_every_request(self):
+        client = self.client_for(self.employee)
+        payload = {'leave_requests': [
+            {'leave_type': self.leave_type.id, 'start_date': '2025-06-02', 'end_date': '2025-06-04'},
+            {'leave_type': self.leave_type.id, 'start_date': '2025-06-09', 'end_date': '2025-06-11', 'reason': 'Trip'},
+        ]}
+        response = client.post(reverse('leave-request-batch-submit'), payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([leave['start_date'] for leave in response.data], ['2025-06-02', '2025-06-09'])
+        self.assertEqual(
+            LeaveRequest.active_objects.filter(employee=self.employee, start_date__year=2025).count(), 4
+        )
+
+    def test_batch_submission_rejects_ranges_overlapping_each_other(self):
+        client = self.client_for(self.employee)
+        payload = {'leave_requests': [
+            {'leave_type': self.leave_type.id, 'start_date': '2025-06-02', 'end_date': '2025-06-06'},
+            {'leave_type': self.leave_type.id, 'start_date': '2025-06-05', 'end_date': '2025-06-09'},
+        ]}
+        response = client.post(reverse('leave-request-batch-submit'), payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.data['leave_requests']), {0, 1})
+        self.assertEqual(
+            response.data['leave_requests'][0], ['This time frame overlaps item 1 of the batch.']
+        )
+        self.assertFalse(LeaveRequest.active_objects.filter(start_date__year=2025, start_date__month=6).exists())
+
+    def test_batch_submission_rejects_ranges_overlapping_stored_requests(self):
+        client = self.client_for(self.employee)
+        payload = {'leave_requests': [
+            {'leave_type': self.leave_type.id, 'start_date': '2025-06-02', 'end_date': '2025-06-04'},
+            {'leave_type': self.leave_type.id, 'start_date': '2025-03-13', 'end_date': '2025-03-20'},
+        ]}
+        response = client.post(reverse('leave-request-batch-submit'), payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(list(response.data['leave_requests']), [1])
+        self.assertFalse(LeaveRequest.active_objects.filter(start_date__year=2025, start_date__month=6).exists())
+
+    def test_create_rejects_partially_overlapping_request(self):
+        client = self.client_for(self.employee)
+        payload = {'leave_type': self.leave_type.id, 'start_date': '2025-03-13', 'end_date': '2025-03-20'}
+        response = client.post(reverse('leave-request-create'), payload)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class LeaveCalendarTest(LeaveTestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_organization()
+        cls.department = Department.active_objects.create(name='Operations')
+        cls.other_manager = cls.create_employee(
+            'other.manager@email.com', cls.roles[EmployeeRoles.MANAGER], cls.director, department=cls.department
+        )
+        cls.other_employee = cls.create_employee(
+            'other.employee@email.com', cls.roles[EmployeeRoles.EMPLOYEE], cls.other_manager, department=cls.department
+        )
+        cls.employee_leave = cls.create_leave_request(
+            cls.employee, datetime.date(2025, 6, 2), datetime.date(2025, 6, 4), LeaveApprovalStatus.APPROVED
+        )
+        cls.create_leave_request(
+            cls.other_employee, datetime.date(2025, 6, 4), datetime.date(2025, 6, 5), LeaveApprovalStatus.APPROVED
+        )
+        cls.create_leave_request(cls.manager, datetime.date(2025, 6, 3), datetime.date(2025, 6, 6))
+
+    def get_calendar(self, user, **params):
+        params = {'start_date': '2025-06-01', 'end_date': '2025-06-07', **params}
+        return self.client_for(user).get(reverse('leave-calendar'), params)
+
+    def counts(self, response):
+        return [day['count'] for day in response.data['days']]
+
+    def test_leave_days_follow_approval_status(self):
+        self.assertEqual(LeaveDay.objects.filter(leave_request=self.employee_leave).count(), 3)
+
+        self.employee_leave.approval_status = LeaveApprovalStatus.DECLINED
+        self.employee_leave.save()
+        self.assertFalse(LeaveDay.objects.filter(leave_request=self.employee_leave).exists())
+
+        self.employee_leave.approval_status = LeaveApprovalStatus.APPROVED
+        self.employee_leave.end_date = datetime.date(2025, 6, 3)
+        self.employee_leave.save()
+        self.assertEqual(LeaveDay.objects.filter(leave_request=self.employee_leave).count(), 2)
+
+        self.employee_leave.soft_delete()
+        self.assertFalse(LeaveDay.objects.filter(leave_request=self.employee_leave).exists())
+
+    def test_subtree_calendar(self):
+        response = self.get_calendar(self.director)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.counts(response), [0, 1, 1, 2, 1, 0, 0])
+        self.assertEqual(
+            response.data['days'][3]['employee_ids'], sorted([self.employee.id, self.other_employee.id])
+        )
+        self.assertEqual(set(response.data['employees']), {self.employee.id, self.other_employee.id})
+
+        response = self.get_calendar(self.director, supervisor_id=self.other_manager.id)
+        self.assertEqual(self.counts(response), [0, 0, 0, 1, 1, 0, 0])
+
+    def test_department_calendar_is_one_query(self):
+        client = self.client_for(self.ceo)
+        role_cache.all()
+        params = {'start_date': '2025-06-01', 'end_date': '2025-08-29', 'department_id': self.department.id}
+        with self.assertNumQueries(1):
+            response = client.get(reverse('leave-calendar'), params)
+        self.assertEqual(len(response.data['days']), 90)
+        self.assertEqual(self.counts(response)[:7], [0, 0, 0, 1, 1, 0, 0])
+
+    def test_calendar_access_is_limited_to_own_reporting_line(self):
+        self.assertEqual(
+            self.get_calendar(self.manager, supervisor_id=self.other_manager.id).status_code,
+            status.HTTP_403_FORBIDDEN,
+        )
+        self.assertEqual(
+            self.get_calendar(self.manager, department_id=self.department.id).status_code,
+            status.HTTP_403_FORBIDDEN,
+        )
+        self.assertEqual(
+            self.get_calendar(self.manager, end_date='2026-12-31').status_code, status.HTTP_400_BAD_REQUEST
+        )
+
+    def test_calendar_access_follows_the_closure_table(self):
+        org_graph.get()
+        # A queryset update leaves updated_at alone, so the org graph of this
+        # process does not see the move until its next full load.
+        User.all_objects.filter(pk=self.other_manager.pk).update(supervisor_id=self.manager.pk)
+        ReportingHierarchyService.move_user(User.all_objects.get(pk=self.other_manager.pk))
+        self.assertFalse(org_graph.get().is_in_subtree(self.other_manager.id, self.manager.id))
+        response = self.get_calendar(self.manager, supervisor_id=self.other_manager.id)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_rebuild(self):
+        LeaveDay.objects.all().delete()
+        self.assertEqual(LeaveCalendarService.rebuild(), 5)
+
+
+class LeaveBalanceTest(LeaveTestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_organization()
+        cls.leave_type.annual_entitlement = 10
+        cls.leave_type.save()
+        cls.manager_request = cls.create_leave_request(cls.manager, datetime.date(2024, 12, 30), datetime.date(2025, 1, 3))
+
+    def approve(self, approval_status=LeaveApprovalStatus.APPROVED):
+        return self.client_for(self.director).put(
+            reverse('leave-request-approval', args=[self.manager_request.id]), {'approval_status': approval_status}
+        )
+
+    def balance(self, year):
+        return LeaveBalance.objects.get(employee=self.manager, leave_type=self.leave_type, year=year).days_used
+
+    def test_days_by_year_splits_at_new_year(self):
+        self.assertEqual(
+            LeaveBalanceService.days_by_year(datetime.date(2024, 12, 30), datetime.date(2025, 1, 3)), {2024: 2, 2025: 3}
+        )
+
+    def test_approval_and_reversal_update_the_ledger(self):
+        self.approve()
+        self.assertEqual((self.balance(2024), self.balance(2025)), (2, 3))
+
+        self.approve(LeaveApprovalStatus.DECLINED)
+        self.assertEqual((self.balance(2024), self.balance(2025)), (0, 0))
+
+    def test_balance_endpoint_is_one_query(self):
+        self.approve()
+        client = self.client_for(self.manager)
+        role_cache.all()
+        leave_type_cache.all()
+        with self.assertNumQueries(1):
+            response = client.get(reverse('leave-balances'), {'year': 2025})
+        self.assertEqual(
+            response.data,
+            [{
+                'leave_type': self.leave_type.id, 'leave_type_name': 'Annual Leave', 'year': 2025,
+                'entitlement': 10, 'days_used': 3, 'days_remaining': 7,
+            }],
+        )
+
+    def test_create_is_rejected_when_not_enough_days_left(self):
+        self.approve()
+        client = self.client_for(self.manager)
+        payload = {'leave_type': self.leave_type.id, 'start_date': '2025-02-03', 'end_date': '2025-02-10'}
+        response = client.post(reverse('leave-request-create'), payload)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        payload['end_date'] = '2025-02-09'
+        response = client.post(reverse('leave-request-create'), payload)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_approval_is_rejected_when_pending_requests_exceed_the_entitlement(self):
+        # Each request fits on its own at submission; together they do not.
+        first = self.create_leave_request(self.manager, datetime.date(2025, 2, 3), datetime.date(2025, 2, 7))
+        second = self.create_leave_request(self.manager, datetime.date(2025, 3, 3), datetime.date(2025, 3, 7))
+        client = self.client_for(self.director)
+        self.approve()
+        approval = {'approval_status': LeaveApprovalStatus.APPROVED}
+        response = client.put(reverse('leave-request-approval', args=[first.id]), approval)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = client.put(reverse('leave-request-approval', args=[second.id]), approval)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        second.refresh_from_db()
+        self.assertEqual(second.approval_status, LeaveApprovalStatus.PENDING)
+        self.assertEqual(self.balance(2025), 8)
+
+    def test_batch_approval_is_rejected_per_request_past_the_entitlement(self):
+        first = self.create_leave_request(self.manager, datetime.date(2025, 2, 3), datetime.date(2025, 2, 7))
+        second = self.create_leave_request(self.manager, datetime.date(2025, 3, 3), datetime.date(2025, 3, 7))
+        response = self.client_for(self.director).post(
+            reverse('leave-request-batch-approval'),
+            {'leave_request_ids': [self.manager_request.id, first.id, second.id], 'approval_status': LeaveApprovalStatus.APPROVED},
+            format='json',
+        )
+        self.assertEqual([result['success'] for result in response.data['results']], [True, True, False])
+        self.assertEqual(self.balance(2025), 8)
+
+    def test_deleting_an_approved_request_gives_its_days_back(self):
+        self.approve()
+        LeaveRequest.active_objects.get(pk=self.manager_request.pk).delete()
+        self.assertEqual((self.balance(2024), self.balance(2025)), (0, 0))
+        self.assertEqual(LeaveBalanceService.rebuild(), 0)
+
+    def test_rebuild(self):
+        self.approve()
+        LeaveBalance.objects.all().delete()
+        self.assertEqual(LeaveBalanceService.rebuild(), 2)
+        self.assertEqual((self.balance(2024), self.balance(2025)), (2, 3))
+
+
+class LeaveRequestBatchApprovalTest(LeaveTestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_organization()
+        cls.managers = [cls.manager] + [
+            cls.create_employee(f'manager{index}@email.com', cls.roles[EmployeeRoles.MANAGER], cls.director)
+            for index in range(11)
+        ]
+        start_date = datetime.date(2025, 7, 7)
+        cls.manager_requests = [
+            cls.create_leave_request(manager, start_date, start_date + datetime.timedelta(days=2))
+            for manager in cls.managers
+        ]
+        cls.employee_request = cls.create_leave_request(cls.employee, start_date, start_date + datetime.timedelta(days=1))
+        cls.own_request = cls.create_leave_request(cls.director, start_date, start_date + datetime.timedelta(days=1))
+
+    def batch_approve(self, user, leave_request_ids, approval_status=LeaveApprovalStatus.APPROVED):
+        return self.client_for(user).post(
+            reverse('leave-request-batch-approval'),
+            {'leave_request_ids': leave_request_ids, 'approval_status': approval_status, 'comment': 'Enjoy'},
+            format='json',
+        )
+
+    def test_per_item_results(self):
+        ids = [self.manager_requests[0].id, self.employee_request.id, self.own_request.id, 999999]
+        response = self.batch_approve(self.director, ids)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['processed'], response.data['failed']), (1, 3))
+        results = response.data['results']
+        self.assertEqual([result['id'] for result in results], ids)
+        self.assertEqual(results[0]['approval_status'], LeaveApprovalStatus.APPROVED)
+        self.assertEqual(results[1]['errors'], ['Pending Employee Manager Approval'])
+        self.assertFalse(results[2]['success'])
+        self.assertFalse(results[3]['success'])
+
+        self.manager_requests[0].refresh_from_db()
+        self.assertEqual(self.manager_requests[0].approval_status, LeaveApprovalStatus.APPROVED)
+        self.assertEqual(LeaveDay.objects.filter(leave_request=self.manager_requests[0]).count(), 3)
+        self.assertEqual(LeaveBalance.objects.get(employee=self.manager).days_used, 3)
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        role_cache.all()
+        leave_type_cache.all()
+        with self.assertNumQueries(22):
+            self.batch_approve(self.director, [leave_request.id for leave_request in self.manager_requests[:2]])
+        with self.assertNumQueries(22):
+            response = self.batch_approve(self.director, [leave_request.id for leave_request in self.manager_requests[2:]])
+        self.assertEqual(response.data['processed'], 10)
+        self.assertEqual(LeaveBalance.objects.filter(days_used=3).count(), 12)
+
+    def test_reversal_updates_existing_flows(self):
+        ids = [leave_request.id for leave_request in self.manager_requests[:3]]
+        self.batch_approve(self.director, ids)
+        response = self.batch_approve(self.director, ids, LeaveApprovalStatus.DECLINED)
+        self.assertEqual(response.data['processed'], 3)
+        self.assertEqual(
+            LeaveApprovalFlow.active_objects.filter(leave_request_id__in=ids, approval_status=LeaveApprovalStatus.DECLINED).count(), 3
+        )
+        self.assertFalse(LeaveDay.objects.filter(leave_request_id__in=ids).exists())
+        self.assertEqual(LeaveBalance.objects.get(employee=self.manager).days_used, 0)
+
+    def test_manager_approval_of_employee_request(self):
+        response = self.client_for(self.manager).put(
+            reverse('leave-request-approval', args=[self.employee_request.id]),
+            {'approval_status': LeaveApprovalStatus.APPROVED},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['approval_status'], LeaveApprovalStatus.PENDING)
+        self.assertTrue(
+            LeaveApprovalFlow.active_objects.filter(
+                leave_request=self.employee_request, role=EmployeeRoles.MANAGER
+            ).exists()
+        )
+
+        response = self.batch_approve(self.director, [self.employee_request.id])
+        self.assertEqual(response.data['results'][0]['approval_status'], LeaveApprovalStatus.APPROVED)
+
+
+class LeaveApprovalInboxTest(LeaveTestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_organization()
+        start_date = datetime.date(2025, 8, 4)
+        cls.employee_requests = [
+            cls.create_leave_request(
+                cls.employee, start_date + datetime.timedelta(weeks=week), start_date + datetime.timedelta(weeks=week, days=1)
+            )
+            for week in range(3)
+        ]
+        cls.manager_request = cls.create_leave_request(cls.manager, start_date, start_date + datetime.timedelta(days=2))
+
+    def inbox_ids(self, user):
+        response = self.client_for(user).get(reverse('leave-approval-inbox'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [entry['leave_request']['id'] for entry in response.data['results']]
+
+    def decide(self, user, leave_request, approval_status=LeaveApprovalStatus.APPROVED):
+        response = self.client_for(user).put(
+            reverse('leave-request-approval', args=[leave_request.id]), {'approval_status': approval_status}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_requests_move_along_the_reporting_line(self):
+        first, second, _ = self.employee_requests
+        self.assertEqual(self.inbox_ids(self.manager), [leave_request.id for leave_request in reversed(self.employee_requests)])
+        self.assertEqual(self.inbox_ids(self.director), [self.manager_request.id])
+
+        self.decide(self.manager, first)
+        self.assertNotIn(first.id, self.inbox_ids(self.manager))
+        self.assertEqual(self.inbox_ids(self.director), [self.manager_request.id, first.id])
+
+        self.decide(self.manager, first, LeaveApprovalStatus.DECLINED)
+        self.assertEqual(self.inbox_ids(self.director), [self.manager_request.id])
+
+        self.decide(self.ceo, second)
+        self.assertNotIn(second.id, self.inbox_ids(self.manager))
+
+        self.decide(self.director, self.manager_request)
+        self.assertEqual(self.inbox_ids(self.director), [])
+
+    def test_soft_deleted_request_leaves_the_inbox(self):
+        self.employee_requests[0].soft_delete()
+        self.assertNotIn(self.employee_requests[0].id, self.inbox_ids(self.manager))
+
+    def test_inbox_is_one_read_per_page(self):
+        client = self.client_for(self.manager)
+        role_cache.all()
+        leave_type_cache.all()
+        with self.assertNumQueries(1):
+            response = client.get(reverse('leave-approval-inbox'), {'pagination': 'keyset', 'page_size': 2})
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_rebuild_replays_recorded_decisions(self):
+        self.decide(self.manager, self.employee_requests[0])
+        expected = set(LeaveApprovalQueue.objects.values_list('leave_request_id', 'approver_id', 'step', 'status'))
+        self.assertEqual(LeaveApprovalQueueService.rebuild(), 7)
+        self.assertEqual(
+            set(LeaveApprovalQueue.objects.values_list('leave_request_id', 'approver_id', 'step', 'status')), expected
+        )
+
+
+class LeaveOutboxEventTest(LeaveTestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_organization()
+
+    def test_workflow_events_are_recorded_with_the_change(self):
+        client = self.client_for(self.manager)
+        payload = {'leave_type': self.leave_type.id, 'start_date': '2025-09-01', 'end_date': '2025-09-03'}
+        leave_request_id = client.post(reverse('leave-request-create'), payload).data['id']
+        self.client_for(self.director).put(
+            reverse('leave-request-approval', args=[leave_request_id]), {'approval_status': LeaveApprovalStatus.APPROVED}
+        )
+
+        events = list(OutboxEvent.objects.order_by('id').values_list('topic', 'payload'))
+        self.assertEqual(
+            [topic for topic, _ in events],
+            [LeaveEventTopics.SUBMITTED, LeaveEventTopics.DECISION_RECORDED, LeaveEventTopics.APPROVED],
+        )
+        self.assertEqual(events[0][1]['start_date'], '2025-09-01')
+        self.assertEqual(events[1][1]['approval_officer_id'], self.director.id)
+
+    def test_rejected_request_records_no_event(self):
+        client = self.client_for(self.manager)
+        payload = {'leave_type': self.leave_type.id, 'start_date': '2025-09-03', 'end_date': '2025-09-01'}
+        client.post(reverse('leave-request-create'), payload)
+        self.assertFalse(OutboxEvent.objects.exists())
+
+
+class LeaveHistoryExportTest(LeaveTestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_organization()
+        start_date = datetime.date(2025, 1, 6)
+        cls.leave_requests = [
+            cls.create_leave_request(
+                cls.employee,
+                start_date + datetime.timedelta(weeks=week),
+                start_date + datetime.timedelta(weeks=week, days=2),
+            )
+            for week in range(5)
+        ]
+        LeaveApprovalFlow.active_objects.create(
+            leave_request=cls.leave_requests[0],
+            approval_officer=cls.manager,
+            role=EmployeeRoles.MANAGER,
+            approval_status=LeaveApprovalStatus.APPROVED,
+        )
+
+    def export(self, user, **params):
+        response = self.client_for(user).get(reverse('leave-history-export'), params)
+        content = b''.join(response.streaming_content).decode() if response.streaming else None
+        return response, content
+
+    def test_csv_export(self):
+        response, content = self.export(self.ceo)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual([int(row['id']) for row in rows], [leave_request.id for leave_request in self.leave_requests])
+        self.assertEqual(rows[0]['employee_email'], self.employee.email)
+        self.assertTrue(rows[0]['approvals'].startswith(f'Manager:Approved:{self.manager.email}:'))
+        self.assertEqual(rows[1]['approvals'], '')
+
+    def test_jsonl_export(self):
+        response, content = self.export(self.ceo, file_format='jsonl', start_date='2025-01-13', end_date='2025-01-20')
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([row['id'] for row in rows], [self.leave_requests[1].id, self.leave_requests[2].id])
+        self.assertEqual(rows[0]['approvals'], [])
+
+    def test_queries_grow_with_chunks_only(self):
+        response = self.client_for(self.ceo).get(reverse('leave-history-export'))
+        # One streamed query for the requests, then one for the approvals of each chunk of three.
+        with mock.patch.object(LeaveHistoryExportService, 'chunk_size', 3), self.assertNumQueries(3):
+            content = b''.join(response.streaming_content)
+        self.assertEqual(len(content.decode().splitlines()), 6)
+
+    def test_export_requires_hr_or_ceo(self):
+        response, _ = self.export(self.employee)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_export_command(self):
+        stdout = io.StringIO()
+        call_command('export_leave_history', '--format', 'jsonl', '--chunk-size', '2', stdout=stdout)
+        rows = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]['approvals'][0]['approval_officer_id'], self.manager.id)
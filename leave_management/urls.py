@@ -1,8 +1,14 @@
 from django.urls import path
 
 from leave_management.views import (
+    LeaveApprovalInboxAPIView,
+    LeaveBalanceAPIView,
+    LeaveCalendarAPIView,
+    LeaveHistoryExportAPIView,
     LeaveRequestCreateAPIView,
     LeaveRequestApprovalAPIView,
+    LeaveRequestBatchApprovalAPIView,
+    LeaveRequestBatchSubmitAPIView,
     LeaveTypeCreateListAPIView
 )
 
@@ -10,6 +16,12 @@ from leave_management.views import (
 urlpatterns = [
     path('', LeaveRequestCreateAPIView.as_view(), name='leave-request-create'),
     path('<int:leave_request_id>/', LeaveRequestApprovalAPIView.as_view(), name='leave-request-approval'),
+    path('inbox/', LeaveApprovalInboxAPIView.as_view(), name='leave-approval-inbox'),
+    path('batch/', LeaveRequestBatchSubmitAPIView.as_view(), name='leave-request-batch-submit'),
+    path('approvals/', LeaveRequestBatchApprovalAPIView.as_view(), name='leave-request-batch-approval'),
     path('leave-types/', LeaveTypeCreateListAPIView.as_view(), name='leave-type-list'),
+    path('calendar/', LeaveCalendarAPIView.as_view(), name='leave-calendar'),
+    path('balances/', LeaveBalanceAPIView.as_view(), name='leave-balances'),
+    path('export/', LeaveHistoryExportAPIView.as_view(), name='leave-history-export'),
 
 ]
\ No newline at end of file
@@ -1,18 +1,34 @@
+from django.utils import timezone
 from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from base.constants import EmployeeRoles, EmployeePositions
-from base.pagination import CustomPagination
+from base.exports import ExportWriter
+from base.pagination import CustomPagination, get_paginator
 from base.role_permission import role_position_required
-from leave_management.models import LeaveType
+from base.views import AsyncAPIView
+from leave_management.cache import leave_type_cache
 from leave_management.serializers import (
+    LeaveApprovalQueueSerializer,
+    LeaveBalanceQuerySerializer,
+    LeaveCalendarQuerySerializer,
+    LeaveHistoryExportQuerySerializer,
     LeaveRequestApprovalSerializer,
+    LeaveRequestBatchApprovalSerializer,
+    LeaveRequestBatchSerializer,
     LeaveTypeSerializer,
     LeaveRequestSerializer
 )
-from leave_management.services import LeaveTypeService, LeaveRequestService
+from leave_management.services import (
+    LeaveTypeService,
+    LeaveRequestService,
+    LeaveCalendarService,
+    LeaveBalanceService,
+    LeaveApprovalQueueService,
+    LeaveHistoryExportService,
+)
 
 
 class LeaveTypeCreateListAPIView(APIView):
@@ -32,7 +48,7 @@ class LeaveTypeCreateListAPIView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def get(self, request):
-        leave_types = LeaveType.active_objects.all()
+        leave_types = leave_type_cache.all()
         paginator = self.pagination_class()
         paginated_employees = paginator.paginate_queryset(leave_types, request, view=self)
         serializer = self.serializer_class(paginated_employees, many=True)
@@ -80,13 +96,38 @@ class LeaveRequestCreateAPIView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def get(self, request):
-        qs = LeaveRequestService().get_leave_requests(request)
-        paginator = self.pagination_class()
+        qs = self.serializer_class.setup_eager_loading(LeaveRequestService().get_leave_requests(request))
+        paginator = get_paginator(self, request)
         paginated_employees = paginator.paginate_queryset(qs, request, view=self)
         serializer = self.serializer_class(paginated_employees, many=True)
         return paginator.get_paginated_response(serializer.data)
 
 
+class AsyncLeaveRequestListAPIView(AsyncAPIView):
+    serializer_class = LeaveRequestSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = CustomPagination
+
+    async def get(self, request):
+        qs = self.serializer_class.setup_eager_loading(await LeaveRequestService.aget_leave_requests(request))
+        paginator = get_paginator(self, request)
+        paginated_requests = await paginator.apaginate_queryset(qs, request, view=self)
+        serializer = self.serializer_class(paginated_requests, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+
+class LeaveApprovalInboxAPIView(APIView):
+    serializer_class = LeaveApprovalQueueSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = CustomPagination
+
+    def get(self, request):
+        qs = self.serializer_class.setup_eager_loading(LeaveApprovalQueueService().get_inbox(request.user))
+        paginator = get_paginator(self, request)
+        paginated_entries = paginator.paginate_queryset(qs, request, view=self)
+        serializer = self.serializer_class(paginated_entries, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
 
 class LeaveRequestApprovalAPIView(APIView):
     serializer_class = LeaveRequestApprovalSerializer
@@ -100,11 +141,74 @@ class LeaveRequestApprovalAPIView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class LeaveRequestBatchApprovalAPIView(APIView):
+    serializer_class = LeaveRequestBatchApprovalSerializer
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = self.serializer_class(data=request.data)
+        if serializer.is_valid():
+            leave_request_ids = serializer.validated_data.pop('leave_request_ids')
+            data = LeaveRequestService().approve_leave_requests(serializer.validated_data, leave_request_ids, request)
+            return Response(data=data, status=status.HTTP_200_OK)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class LeaveRequestBatchSubmitAPIView(APIView):
+    serializer_class = LeaveRequestBatchSerializer
+    permission_classes = [IsAuthenticated]
 
+    def post(self, request):
+        serializer = self.serializer_class(data=request.data)
+        if serializer.is_valid():
+            leave_requests = LeaveRequestService().submit_leave_requests(
+                request.user, serializer.validated_data['leave_requests']
+            )
+            return Response(data=LeaveRequestSerializer(leave_requests, many=True).data, status=status.HTTP_201_CREATED)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class LeaveCalendarAPIView(APIView):
+    serializer_class = LeaveCalendarQuerySerializer
+    permission_classes = [IsAuthenticated]
 
+    def get(self, request):
+        serializer = self.serializer_class(data=request.query_params)
+        if serializer.is_valid():
+            calendar = LeaveCalendarService().get_calendar(request, **serializer.validated_data)
+            return Response(data=calendar, status=status.HTTP_200_OK)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class LeaveBalanceAPIView(APIView):
+    serializer_class = LeaveBalanceQuerySerializer
+    permission_classes = [IsAuthenticated]
 
+    def get(self, request):
+        serializer = self.serializer_class(data=request.query_params)
+        if serializer.is_valid():
+            year = serializer.validated_data.get('year', timezone.localdate().year)
+            balances = LeaveBalanceService().get_balances(request.user.id, year)
+            return Response(data=balances, status=status.HTTP_200_OK)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class LeaveHistoryExportAPIView(APIView):
+    serializer_class = LeaveHistoryExportQuerySerializer
+    permission_classes = [IsAuthenticated]
 
+    @role_position_required(
+        allowed_roles=[EmployeeRoles.CEO],
+        allowed_positions=[EmployeePositions.Human_Resources_Manager]
+    )
+    def get(self, request):
+        serializer = self.serializer_class(data=request.query_params)
+        if serializer.is_valid():
+            filters = dict(serializer.validated_data)
+            file_format = filters.pop('file_format')
+            return ExportWriter.streaming_response(
+                file_format, 'leave-history',
+                LeaveHistoryExportService.columns, LeaveHistoryExportService.iter_rows(**filters),
+                LeaveHistoryExportService.csv_formatters(),
+            )
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
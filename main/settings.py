@@ -9,7 +9,9 @@ https://docs.djangoproject.com/en/5.1/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
+import importlib.util
 import os
+import sys
 from datetime import timedelta
 from dotenv import load_dotenv
 from pathlib import Path
@@ -27,7 +29,9 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = os.environ.get("SECRET_KEY")
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get('DEBUG', 'True').lower() in ('1', 'true', 'yes')
+
+TESTING = sys.argv[1:2] == ['test']
 
 ALLOWED_HOSTS = []
 
@@ -48,6 +52,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'base.middleware.InstrumentationMiddleware',
+    'base.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -55,6 +61,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'base.middleware.RequestCacheMiddleware',
 ]
 
 ROOT_URLCONF = 'main.urls'
@@ -77,7 +84,7 @@ TEMPLATES = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.ClaimsJWTAuthentication',
     ),
 }
 
@@ -96,13 +103,168 @@ AUTH_USER_MODEL = 'accounts.User'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
+# DATABASE_ENGINE picks the profile: sqlite (the default) or postgresql.
+DATABASE_ENGINE = os.environ.get('DATABASE_ENGINE', 'sqlite')
+
+if DATABASE_ENGINE == 'postgresql':
+    # DATABASE_POOL uses Django's psycopg connection pool (needs
+    # psycopg[pool]); without it connections persist for CONN_MAX_AGE.
+    # Pooled connections cannot also be persistent.
+    DATABASE_POOL = os.environ.get('DATABASE_POOL', 'True').lower() in ('1', 'true', 'yes') \
+        and importlib.util.find_spec('psycopg_pool') is not None
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DATABASE_NAME', 'employee_management'),
+            'USER': os.environ.get('DATABASE_USER', ''),
+            'PASSWORD': os.environ.get('DATABASE_PASSWORD', ''),
+            'HOST': os.environ.get('DATABASE_HOST', ''),
+            'PORT': os.environ.get('DATABASE_PORT', ''),
+            'CONN_MAX_AGE': 0 if DATABASE_POOL else int(os.environ.get('DATABASE_CONN_MAX_AGE', 600)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.environ.get('DATABASE_POOL_MIN_SIZE', 2)),
+                    'max_size': int(os.environ.get('DATABASE_POOL_MAX_SIZE', 10)),
+                    'timeout': int(os.environ.get('DATABASE_POOL_TIMEOUT', 10)),
+                },
+            } if DATABASE_POOL else {},
+        }
+    }
+else:
+    # WAL lets readers run alongside the writer, and BEGIN IMMEDIATE takes
+    # the write lock up front, so a transaction that reads before it writes
+    # waits out the busy timeout instead of failing with "database is locked".
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DATABASE_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': int(os.environ.get('DATABASE_CONN_MAX_AGE', 600)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'init_command': ';'.join([
+                    'PRAGMA journal_mode=WAL',
+                    'PRAGMA synchronous=NORMAL',
+                    f"PRAGMA mmap_size={int(os.environ.get('SQLITE_MMAP_SIZE', 128 * 1024 * 1024))}",
+                ]),
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 20)),
+            },
+        }
+    }
+
+# DATABASE_REPLICA_NAME (SQLite) or DATABASE_REPLICA_HOST (PostgreSQL) adds a
+# read replica with the same settings otherwise. The reads of GET requests go
+# to it, except for clients that wrote in the last REPLICA_STICKY_SECONDS.
+_REPLICA_SETTING = 'HOST' if DATABASE_ENGINE == 'postgresql' else 'NAME'
+_REPLICA = os.environ.get(f'DATABASE_REPLICA_{_REPLICA_SETTING}')
+REPLICA_DATABASE = 'replica' if _REPLICA else None
+if REPLICA_DATABASE:
+    DATABASES[REPLICA_DATABASE] = {
+        **DATABASES['default'],
+        _REPLICA_SETTING: _REPLICA,
+        'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+        # Test databases are only created for the primary.
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_ROUTERS = ['base.routers.ReplicaRouter']
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 10))
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# The default per-process cache only suits a single process: the hierarchy
+# version, visibility scopes and token states must be shared by every worker
+# (`check --deploy` reports accounts.E001 otherwise), e.g.
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# CACHE_LOCATION=redis://127.0.0.1:6379/1
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'employee-management'),
     }
 }
 
+HIERARCHY_CACHE_TIMEOUT = int(os.environ.get('HIERARCHY_CACHE_TIMEOUT', 60 * 60))
+REFERENCE_DATA_CACHE_TTL = int(os.environ.get('REFERENCE_DATA_CACHE_TTL', 5 * 60))
+TOKEN_STATE_CACHE_TTL = int(os.environ.get('TOKEN_STATE_CACHE_TTL', 60))
+ORG_GRAPH_TTL = int(os.environ.get('ORG_GRAPH_TTL', 60 * 60))
+# Visibility scopes decide who may see what: they are rebuilt, and the org
+# graph they come from checked for changes, at least this often.
+VISIBILITY_SCOPE_CACHE_TTL = int(os.environ.get('VISIBILITY_SCOPE_CACHE_TTL', 60))
+
+# Outbox
+# Comma separated dotted paths of the callables every outbox event is delivered to.
+
+OUTBOX_SINKS = [
+    sink.strip() for sink in os.environ.get('OUTBOX_SINKS', 'base.outbox.console_sink').split(',') if sink.strip()
+]
+OUTBOX_FILE_SINK_PATH = os.environ.get('OUTBOX_FILE_SINK_PATH', BASE_DIR / 'outbox.jsonl')
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', 5))
+
+
+# Instrumentation
+# Per-view wall time, database time and query counts, reported in a
+# Server-Timing header and at /api/_metrics. Always on under tests.
+INSTRUMENTATION_ENABLED = TESTING or os.environ.get('INSTRUMENTATION_ENABLED', '').lower() in ('1', 'true', 'yes')
+# When set, /api/_metrics requires an "Authorization: Bearer <token>" header.
+INSTRUMENTATION_METRICS_TOKEN = os.environ.get('INSTRUMENTATION_METRICS_TOKEN')
+# Most queries a single request of a view may run. Going over is logged, or
+# fails the request when QUERY_BUDGET_ACTION is 'raise', as under tests.
+QUERY_BUDGET_ACTION = os.environ.get('QUERY_BUDGET_ACTION', 'raise' if TESTING else 'log')
+QUERY_BUDGETS = {
+    'LoginAPIView.post': 3,
+    'EmployeeListCreateView.get': 3,
+    'EmployeeListCreateView.post': 10,
+    'EmployeeImportAPIView.post': 11,
+    'EmployeeReportingLineAPIView.get': 3,
+    'CompanyHierarchyView.get': 2,
+    'LeaveRequestCreateAPIView.get': 5,
+    'LeaveRequestCreateAPIView.post': 9,
+    'LeaveRequestApprovalAPIView.put': 17,
+    'LeaveRequestBatchApprovalAPIView.post': 23,
+    'LeaveRequestBatchSubmitAPIView.post': 9,
+    'LeaveApprovalInboxAPIView.get': 2,
+    'LeaveCalendarAPIView.get': 4,
+    'LeaveBalanceAPIView.get': 1,
+    'AsyncEmployeeListAPIView.get': 3,
+    'AsyncEmployeeDetailAPIView.get': 2,
+    'AsyncEmployeeReportingLineAPIView.get': 3,
+    'AsyncCompanyHierarchyView.get': 2,
+    'AsyncLeaveRequestListAPIView.get': 5,
+}
+
+# Password hashing
+# PASSWORD_HASHER picks the hasher for new hashes: argon2 (the default; needs
+# argon2-cffi, falls back to scrypt without it), scrypt or pbkdf2. Hashes made
+# by the others are still accepted and upgraded on the next login. Logins are
+# kept fast by the hashing pool below, not by lowering these costs.
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'argon2')
+if PASSWORD_HASHER == 'argon2' and importlib.util.find_spec('argon2') is None:
+    PASSWORD_HASHER = 'scrypt'
+_PASSWORD_HASHER_PATHS = {
+    'argon2': 'accounts.hashers.TunedArgon2PasswordHasher',
+    'scrypt': 'accounts.hashers.TunedScryptPasswordHasher',
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+}
+PASSWORD_HASHERS = [_PASSWORD_HASHER_PATHS[PASSWORD_HASHER]] + [
+    path for name, path in _PASSWORD_HASHER_PATHS.items() if name != PASSWORD_HASHER
+] + ['django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher']
+PASSWORD_SCRYPT_WORK_FACTOR = int(os.environ.get('PASSWORD_SCRYPT_WORK_FACTOR', 2 ** 14))
+PASSWORD_SCRYPT_BLOCK_SIZE = int(os.environ.get('PASSWORD_SCRYPT_BLOCK_SIZE', 8))
+PASSWORD_SCRYPT_PARALLELISM = int(os.environ.get('PASSWORD_SCRYPT_PARALLELISM', 5))
+PASSWORD_ARGON2_TIME_COST = int(os.environ.get('PASSWORD_ARGON2_TIME_COST', 2))
+PASSWORD_ARGON2_MEMORY_COST = int(os.environ.get('PASSWORD_ARGON2_MEMORY_COST', 19 * 1024))
+PASSWORD_ARGON2_PARALLELISM = int(os.environ.get('PASSWORD_ARGON2_PARALLELISM', 1))
+
+# Threads per process that may hash passwords at once, how many logins may
+# queue behind them, and how long a queued login waits before a 429.
+PASSWORD_HASHING_WORKERS = int(os.environ.get('PASSWORD_HASHING_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+PASSWORD_HASHING_MAX_PENDING = int(os.environ.get('PASSWORD_HASHING_MAX_PENDING', 32))
+PASSWORD_HASHING_QUEUE_TIMEOUT = float(os.environ.get('PASSWORD_HASHING_QUEUE_TIMEOUT', 5))
+
+AUTHENTICATION_BACKENDS = ['accounts.backends.PooledModelBackend']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
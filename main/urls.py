@@ -16,11 +16,17 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from accounts.views import CompanyHierarchyView
+from accounts.views import AsyncCompanyHierarchyView, CompanyHierarchyView
+from base.views import MetricsView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/employees/', include('accounts.urls')),
     path('api/leave-requests/', include('leave_management.urls')),
     path('api/company-hierarchy/', CompanyHierarchyView.as_view(), name='company_hierarchy' ),
+    # Native async variants of the read endpoints, for ASGI deployments.
+    path('api/async/employees/', include('accounts.async_urls')),
+    path('api/async/leave-requests/', include('leave_management.async_urls')),
+    path('api/async/company-hierarchy/', AsyncCompanyHierarchyView.as_view(), name='async_company_hierarchy'),
+    path('api/_metrics', MetricsView.as_view(), name='metrics'),
 ]